@@ -203,4 +203,19 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / "media"
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Configurator evaluation results; switch to {"BACKEND": "django", "ALIAS": "default"}
+# once a shared cache is configured
+MODULAR_CALC_RESULT_CACHE = {"BACKEND": "local", "MAXSIZE": 1024}
+# Cutlist layouts keyed by part multiset; set PATH to a directory to keep them across restarts
+MODULAR_CALC_CUTLIST_CACHE = {"MAXSIZE": 256, "PATH": None}
+# Saw and edgebander rates for the machine-time estimate (see MachineRates for
+# every key); labour is priced into sheet CP once the costs per hour are set
+MODULAR_CALC_MACHINE_RATES = {
+    "SAW_FEED_M_PER_MIN": 20,
+    "SAW_CYCLE_S": 6,
+    "EDGEBANDER_FEED_M_PER_MIN": 12,
+    "SAW_COST_PER_HOUR": 0,
+    "EDGEBANDER_COST_PER_HOUR": 0,
+}
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_globalvariable_options_alter_tenant_options_and_more'),
+        ('material', '0004_woodmaterial_cost_price_panel_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WoodRemnant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('width_mm', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('length_mm', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_available', models.BooleanField(default=True)),
+                ('source', models.CharField(blank=True, help_text='Cut job that produced it, e.g. a quote number', max_length=100)),
+                ('consumed_by', models.CharField(blank=True, max_length=100)),
+                ('consumed_at', models.DateTimeField(blank=True, null=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='remnants', to='material.woodmaterial')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to='accounts.tenant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tenant', 'material', 'is_available'], name='material_remnant_stock_idx')],
+            },
+        ),
+    ]
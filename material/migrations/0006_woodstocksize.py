@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_globalvariable_options_alter_tenant_options_and_more'),
+        ('material', '0005_woodremnant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WoodStockSize',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('width_mm', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('length_mm', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cost_price_panel', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('sell_price_panel', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_sizes', to='material.woodmaterial')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to='accounts.tenant')),
+            ],
+            options={
+                'unique_together': {('tenant', 'material', 'width_mm', 'length_mm')},
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
 from .units import MeasurementUnit, BillingUnit
 from .wood import WoodMaterial
+from .remnant import WoodRemnant
+from .stock_size import WoodStockSize
 from .category import Category, CategoryTypes, CategoryModel
 from .edgeband import EdgebandName, EdgeBand
 from .hardware import HardwareGroup, Hardware
@@ -0,0 +1,32 @@
+from django.db import models
+from accounts.models.base import TenantModel
+from accounts.mixins import TenantSafeMixin
+from .wood import WoodMaterial
+
+
+class WoodRemnant(TenantSafeMixin, TenantModel):
+    """
+    A usable offcut of a board kept in stock. Width runs along the board
+    width and length along its length, as on WoodMaterial. Cut jobs
+    consume remnants and record the new ones they leave behind.
+    """
+    material = models.ForeignKey(
+        WoodMaterial,
+        on_delete=models.CASCADE,
+        related_name="remnants"
+    )
+    width_mm = models.DecimalField(max_digits=10, decimal_places=2)
+    length_mm = models.DecimalField(max_digits=10, decimal_places=2)
+
+    is_available = models.BooleanField(default=True)
+    source = models.CharField(max_length=100, blank=True, help_text="Cut job that produced it, e.g. a quote number")
+    consumed_by = models.CharField(max_length=100, blank=True)
+    consumed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "material", "is_available"], name="material_remnant_stock_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.material.name} offcut {self.width_mm}x{self.length_mm}"
@@ -0,0 +1,28 @@
+from django.db import models
+from accounts.models.base import TenantModel
+from accounts.mixins import TenantSafeMixin
+from .wood import WoodMaterial
+
+
+class WoodStockSize(TenantSafeMixin, TenantModel):
+    """
+    A further size a board is sold in, next to the one on WoodMaterial,
+    with its own panel price. Width runs across the board and length
+    along it, as on WoodMaterial. Cutlists pick the cheapest mix of sizes.
+    """
+    material = models.ForeignKey(
+        WoodMaterial,
+        on_delete=models.CASCADE,
+        related_name="stock_sizes"
+    )
+    width_mm = models.DecimalField(max_digits=10, decimal_places=2)
+    length_mm = models.DecimalField(max_digits=10, decimal_places=2)
+    cost_price_panel = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    sell_price_panel = models.DecimalField(max_digits=10, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ("tenant", "material", "width_mm", "length_mm")
+
+    def __str__(self):
+        return f"{self.material.name} {self.width_mm}x{self.length_mm}"
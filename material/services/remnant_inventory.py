@@ -0,0 +1,60 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from material.models import WoodRemnant
+from modular_calc.evaluation.remnants import Remnant, RemnantStore
+
+
+class RemnantInventoryService:
+    """
+    Offcut stock per WoodMaterial. The cutlist optimizer reads it as a
+    RemnantStore; a released cut job consumes the offcuts it used and
+    stores the usable ones it leaves.
+    """
+
+    @staticmethod
+    def store_for(tenant, material_ids) -> RemnantStore:
+        rows = (
+            WoodRemnant.objects
+            .filter(tenant=tenant, material_id__in=list(material_ids), is_available=True)
+            .values_list("id", "material_id", "width_mm", "length_mm")
+        )
+        return RemnantStore(
+            Remnant(id=pk, material_id=material_id, width=width, height=length)
+            for pk, material_id, width, length in rows
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def record_cut_job(tenant, cutlist: dict, source: str = "") -> dict:
+        """
+        Marks the offcuts a cutlist used as consumed and stocks its new
+        offcuts. Fails if another job consumed one of them in the meantime.
+        """
+        used = list(cutlist.get("remnants_used", []))
+        if used:
+            available = list(
+                WoodRemnant.objects
+                .select_for_update()
+                .filter(tenant=tenant, id__in=used, is_available=True)
+                .values_list("id", flat=True)
+            )
+            gone = sorted(set(used) - set(available))
+            if gone:
+                raise ValidationError(f"Offcuts no longer in stock: {gone}")
+            WoodRemnant.objects.filter(id__in=used).update(
+                is_available=False, consumed_by=source, consumed_at=timezone.now(),
+            )
+
+        created = WoodRemnant.objects.bulk_create([
+            WoodRemnant(
+                tenant=tenant,
+                material_id=offcut["material_id"],
+                width_mm=offcut["w"],
+                length_mm=offcut["h"],
+                source=source,
+            )
+            for offcut in cutlist.get("offcuts", [])
+        ])
+        return {"consumed": used, "created": [r.id for r in created]}
@@ -0,0 +1,32 @@
+from material.models import WoodStockSize
+from modular_calc.evaluation.stock_sizes import StockCatalog, StockSize
+
+
+class StockSizeService:
+    """Sizes each WoodMaterial is sold in, as the StockCatalog the cutlist optimizer buys boards from."""
+
+    @staticmethod
+    def catalog_for(tenant, materials) -> StockCatalog:
+        """
+        `materials` maps id to WoodMaterial. A material's own size and panel
+        price is one offer; its active WoodStockSize rows are the others.
+        Materials without extra sizes are left out and keep their one size.
+        """
+        rows = (
+            WoodStockSize.objects
+            .filter(tenant=tenant, material_id__in=list(materials), is_active=True)
+            .values_list("id", "material_id", "width_mm", "length_mm", "sell_price_panel")
+        )
+        catalog = StockCatalog()
+        listed = set()
+        for pk, material_id, width, length, price in rows:
+            catalog.add(StockSize(material_id=material_id, width=width, height=length, price=price, id=pk))
+            listed.add(material_id)
+        for material_id in listed:
+            material = materials[material_id]
+            if material.width_mm and material.length_mm and material.sell_price_panel is not None:
+                catalog.add(StockSize(
+                    material_id=material_id, width=material.width_mm, height=material.length_mm,
+                    price=material.sell_price_panel,
+                ))
+        return catalog
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ModularCalcConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'modular_calc'
+
+    def ready(self):
+        # Cache invalidation hooks for compiled equations
+        import modular_calc.signals
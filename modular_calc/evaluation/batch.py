@@ -0,0 +1,101 @@
+# modular_calc/evaluation/batch.py
+import itertools
+from decimal import Decimal
+from typing import Any, Dict, List
+
+# Upper bound for one batch request; price lists are split client side
+MAX_BATCH_CONFIGURATIONS = 5000
+
+DIMENSIONS = ("length", "width", "height")
+
+
+def _steps(spec) -> List[float]:
+    """[300, 600] as is, or {"start": 300, "stop": 1200, "step": 50} inclusive of stop."""
+    if isinstance(spec, dict):
+        start = Decimal(str(spec["start"]))
+        stop = Decimal(str(spec["stop"]))
+        step = Decimal(str(spec.get("step", 1)))
+        if step <= 0:
+            raise ValueError("Grid step must be positive")
+        values = []
+        value = start
+        while value <= stop:
+            values.append(float(value))
+            value += step
+            if len(values) > MAX_BATCH_CONFIGURATIONS:
+                raise ValueError(f"Grid exceeds {MAX_BATCH_CONFIGURATIONS} configurations")
+        return values
+    if isinstance(spec, (list, tuple)):
+        return [float(v) for v in spec]
+    return [float(spec)]
+
+
+def expand_grid(grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Cartesian product of a grid, last axis varying fastest so neighbouring
+    configurations differ by one value (what incremental re-evaluation wants).
+
+    {"product_width": {"start": 300, "stop": 1200, "step": 50},
+     "product_height": [720, 900, 2100],
+     "parameters": {"GAP": [2, 3]}}
+    """
+    axes = []
+    for key, spec in grid.items():
+        if key == "parameters":
+            for abbr, param_spec in (spec or {}).items():
+                axes.append((("parameters", str(abbr)), _steps(param_spec)))
+        else:
+            axes.append(((key,), _steps(spec)))
+
+    total = 1
+    for _, values in axes:
+        total *= len(values)
+    if total > MAX_BATCH_CONFIGURATIONS:
+        raise ValueError(f"Grid expands to {total} configurations (max {MAX_BATCH_CONFIGURATIONS})")
+
+    configurations = []
+    for combo in itertools.product(*(values for _, values in axes)):
+        config: Dict[str, Any] = {}
+        for (path, _), value in zip(axes, combo):
+            if path[0] == "parameters":
+                config.setdefault("parameters", {})[path[1]] = value
+            else:
+                config[path[0]] = value
+        configurations.append(config)
+    return configurations
+
+
+def configure_payload(base_payload: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Engine payload for one configuration: dims given as product_length or
+    L/W/H and a "parameters" dict override the base payload; everything
+    else (product, graph, material) is shared.
+    """
+    payload = dict(base_payload)
+    dims = dict(base_payload.get("product_dims", {}))
+    for dim in DIMENSIONS:
+        value = config.get(f"product_{dim}", config.get(dim[0].upper()))
+        if value is not None:
+            value = float(value)
+            dims[f"product_{dim}"] = dims[dim] = dims[dim[0].upper()] = value
+    if config.get("quantity") is not None:
+        dims["quantity"] = int(config["quantity"])
+        payload["quantities"] = [dims["quantity"]]
+    payload["product_dims"] = dims
+    payload["parameters"] = {**base_payload.get("parameters", {}), **(config.get("parameters") or {})}
+    return payload
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The price-list view of one engine run."""
+    pricing = result.get("pricing") or {}
+    recommended = pricing.get("recommended")
+    option = (pricing.get("pricing_options") or {}).get(recommended, {})
+    return {
+        "recommended": recommended,
+        "cp": option.get("cp"),
+        "sp": option.get("sp"),
+        "total_sheets": (result.get("cutlist") or {}).get("total_sheets"),
+        "part_count": len((result.get("bom") or {}).get("parts", [])),
+    }
+
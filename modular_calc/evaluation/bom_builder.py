@@ -2,32 +2,44 @@ from typing import Dict, List, Optional, Any
 from decimal import Decimal
 from .part_evaluator import PartEvaluator
 from .hardware_evaluator import HardwareEvaluator
+from .evaluator import ExpressionEvaluator
 from .context import ExpressionContext
 from material.services.wood_pricing import WoodPricingService
 from material.services.unit_conversion import UnitConversionService
-from material.models.units import MeasurementUnit
-from material.models.edgeband import EdgeBand
+from .product_graph import ProductGraph, ProductGraphLoader, TemplateNode
 class BOMBuilder:
     """
     Generate full BOM. Separates technical quantity from financial calculations.
     """
 
     def __init__(self, product,product_dims: Dict[str, Decimal], parameters: Dict[str, Decimal],quantity: int, material_id: Optional[int] = None,
-        material_selections: Optional[Dict] = None,stateful_context: Optional[Any] = None,**kwargs):
+        material_selections: Optional[Dict] = None,stateful_context: Optional[Any] = None,
+        graph: Optional[ProductGraph] = None, previous_parts: Optional[Dict[Any, Dict]] = None,
+        reevaluate: Optional[set] = None, **kwargs):
         if quantity < 1:
             raise ValueError("[BOM_FATAL] Invalid Quantity: Handshake requires at least 1 unit.")
         self.product = product
+        # Everything below reads the product definition from this snapshot
+        self.graph = graph or ProductGraphLoader(product).load()
         self.product_dims = product_dims
         self.parameters = parameters
         self.selected_material_id = material_id
         self.material_selections = material_selections or {}
-        self.eb_map = self._build_edgeband_price_map()
+        self.eb_map = self.graph.edgeband_prices
         self.stateful_context = stateful_context
         self.quantity = Decimal(str(quantity))
+        # Incremental mode: parts of an earlier run keyed by template id,
+        # and the template ids whose inputs changed since that run
+        self.previous_parts = previous_parts or {}
+        self.reevaluate = reevaluate
+        self.reevaluated: List[Any] = []
         
         self.kerf = Decimal("4.0")   # Saw blade width
         self.trim = Decimal("10.0")
 
+        # One asteval backend per engine run, shared by every hardware rule
+        self.hw_evaluator = ExpressionEvaluator()
+
     def build_bom(self) -> Dict:
         """The Main Orchestrator called by ProductEngine."""
         
@@ -47,54 +59,42 @@ class BOMBuilder:
             "total_sp": total_sp.quantize(Decimal("1.00")),
             "max_discount": max_discount.quantize(Decimal("1.00")),
         }
-    def _get_effective_material(self, part_template, material_id: Optional[int]):
+    def _get_effective_material(self, node: TemplateNode, material_id: Optional[int]):
         """Helper to get the actual material object for a part."""
-        query = part_template.material_whitelist.select_related('material')
-        if material_id:
-            link = query.filter(material_id=material_id).first()
-        else:
-            link = query.filter(is_default=True).first()
+        link = node.link_for(material_id) if material_id else node.default_link()
         return link.material if link else None
-    def _build_edgeband_price_map(self):
+
+    def _get_part_board(self, node: TemplateNode, material_id: Optional[int]):
         """
-        Build a dictionary:
-        {
-            edgeband_id: {
-                "cost_price": Decimal,
-                "sell_price": Decimal
-            }
-        }
+        The board a part is cut from: the selected material when the part
+        whitelists it, else the part's own default (or first) board, the
+        same rule the product context uses for thickness.
         """
-
-        eb_map = {}
-        
-        # You may filter by tenant if required
-        edgebands = EdgeBand.objects.filter(
-            tenant=self.product.tenant,
-            is_active=True
-        )
-
-        for eb in edgebands:
-            eb_map[eb.id] = {
-                "cost_price": Decimal(str(eb.cost_price)),
-                "sell_price": Decimal(str(eb.sell_price)),
-            }
-
-        return eb_map
+        link = node.link_for(material_id) if material_id else None
+        if not link:
+            link = node.default_link() or node.first_link()
+        return link.material if link else None
     def build_parts(self) -> List[Dict]:
         parts = []
-        all_templates = list(self.product.part_templates.all().order_by('id')) 
         exp_engine = ExpressionContext(self.stateful_context.get_context())
         batch_multiplier = self.quantity
-        for part_template in all_templates:
-            
+        # Dependency order: a part always follows the parts whose size it reads
+        for node in self.graph.ordered_templates():
+            part_template = node.template
+            previous = self.previous_parts.get(node.id)
+            if previous is not None and self.reevaluate is not None and node.id not in self.reevaluate:
+                parts.append(previous)
+                dims = previous["finished_dims"]
+                self.stateful_context.update_calculated_part(part_template.name, dims["l"], dims["w"])
+                continue
+            self.reevaluated.append(node.id)
             try:
                 for key, value in self.stateful_context.get_context().items():
                     exp_engine.update_context(key, value)
                 # 1. MATERIAL TAG RESOLUTION
                 tag = getattr(part_template, 'material_tag', 'carcass')
                 selected_material_id = self.material_selections.get(tag) or self.material_selections.get('default')
-                material_obj = self._get_effective_material(part_template, selected_material_id)
+                material_obj = self._get_part_board(node, selected_material_id)
                 
                 # 2. EVALUATE GEOMETRY (Finished Size)
                 f_length = Decimal(str(exp_engine.evaluate(part_template.part_length_equation)))
@@ -105,7 +105,7 @@ class BOMBuilder:
                 # 3. EDGEBAND DEDUCTION (The Offset Killer)
                 # If we have 2mm EB, the cut must be 4mm smaller to reach the finished size
                 eb_mat_id = self.material_selections.get(f"eb_{tag}")
-                eb_obj = self._get_effective_material(part_template, eb_mat_id)
+                eb_obj = self._get_effective_material(node, eb_mat_id)
                 eb_thickness = Decimal(str(getattr(eb_obj, 'thickness_mm', 0)))
                 deduct_l = Decimal("0")
                 if getattr(part_template, 'eb_top', False): deduct_l += eb_thickness
@@ -116,6 +116,7 @@ class BOMBuilder:
 
                 cut_l = f_length - deduct_l
                 cut_w = f_width - deduct_w
+                eb_edges = sum(bool(getattr(part_template, side, False)) for side in ("eb_top", "eb_bottom", "eb_left", "eb_right"))
 
                 # 4. SKU & METADATA
                 part_sku = f"{self.product.id}-{part_template.id}-{tag[:3].upper()}"
@@ -123,6 +124,7 @@ class BOMBuilder:
                 has_grain_effect = mat_grain_code != "NONE"
                 part_data = {
                     "sku": part_sku,
+                    "part_template_id": part_template.id,
                     "name": part_template.name,
                     "material_id": material_obj.id if material_obj else None,
                     "tag": tag,
@@ -131,12 +133,15 @@ class BOMBuilder:
                     "unit_qty": float(local_qty),
                     "quantity": float(total_batch_qty),
 
-                    # "running_metrics": {
-                    #     # LABOR_MODEL_HOOK: Total perimeter to be cut by saw/CNC
-                    #     "total_cut_mm": float(running_feet_cutting * qty),
-                    #     # LABOR_MODEL_HOOK: Total edge length to be processed by edgebander
-                    #     "total_eb_mm": float(self._calculate_eb_linear_mm(part_template, f_length, f_width) * qty)
-                    # },
+                    # Labour inputs for MachineTimeEstimator
+                    "running_metrics": {
+                        # Total perimeter to be cut by saw/CNC
+                        "total_cut_mm": float(2 * (cut_l + cut_w) * total_batch_qty),
+                        # Total edge length to be processed by edgebander
+                        "total_eb_mm": float(self._calculate_eb_linear_mm(part_template, f_length, f_width) * total_batch_qty),
+                        "eb_edges": float(eb_edges * total_batch_qty),
+                        "edgeband_id": eb_obj.id if eb_obj else None,
+                    },
                     "grain": {
                         "has_grain": has_grain_effect,
                         "direction": mat_grain_code,
@@ -146,8 +151,8 @@ class BOMBuilder:
 
                 # 5. FINANCIALS (Use Finished Area for Sales, but track Cutting Area for Waste)
                 mat_cost = self._compute_material_cost(part_template, part_data, material_obj)
-                eb_cost = self._compute_edgeband_cost(part_template, part_data['finished_dims']['l'], part_data['finished_dims']['w'], part_data['quantity'])
-                hw_cost = self._compute_hardware_cost(part_template, total_batch_qty)
+                eb_cost = self._compute_edgeband_cost(node, part_data['finished_dims']['l'], part_data['finished_dims']['w'], part_data['quantity'])
+                hw_cost = self._compute_hardware_cost(node, total_batch_qty)
                 
                 pricing = self._compute_prices(part_data, mat_cost, eb_cost, hw_cost)
                 part_data.update({
@@ -189,21 +194,21 @@ class BOMBuilder:
         hardware_items = []
         product_context = {**self.product_dims, **self.parameters}
 
-        for rule in self.product.hardware_rules.all():
-            evaluator = HardwareEvaluator(rule, product_context)
+        for rule in self.graph.hardware_rules:
+            evaluator = HardwareEvaluator(rule, product_context, evaluator=self.hw_evaluator)
             tech_data = evaluator.evaluate()
             if tech_data:
                 hardware_items.append(self._format_hardware_item(tech_data))
 
         if parts_list:
             parts_map = {p.get("template_id"): p for p in parts_list}
-            for pt in self.product.part_templates.all():
-                part_data = parts_map.get(pt.id)
+            for node in self.graph.templates:
+                part_data = parts_map.get(node.id)
                 if not part_data: continue
                 
                 part_context = {**product_context, **part_data}
-                for rule in pt.hardware_rules.all():
-                    evaluator = HardwareEvaluator(rule, part_context)
+                for rule in node.hardware_rules:
+                    evaluator = HardwareEvaluator(rule, part_context, evaluator=self.hw_evaluator)
                     tech_data = evaluator.evaluate()
                     if tech_data:
                         hardware_items.append(self._format_hardware_item(tech_data))
@@ -239,7 +244,7 @@ class BOMBuilder:
         # 2. Master Sheet Dimensions resolution to MM
         # We pull raw values from model and convert to MM via Service
         try:
-            mm_unit = MeasurementUnit.objects.get(code="MM")
+            mm_unit = self.graph.mm_unit
             m_len = Decimal(str(UnitConversionService.convert(
                 value=mat.length_value, from_unit=mat.length_unit, to_unit=mm_unit
             )))
@@ -273,7 +278,7 @@ class BOMBuilder:
     from decimal import Decimal
 
 
-    def _compute_edgeband_cost(self, part_template, finished_l, finished_w, total_qty):
+    def _compute_edgeband_cost(self, node: TemplateNode, finished_l, finished_w, total_qty):
         """
         Compute edgeband cost per side using:
         - Selected material (wood_id)
@@ -295,35 +300,23 @@ class BOMBuilder:
         # 1️⃣ Resolve selected material
         material_id = getattr(self, "selected_material_id", None)
 
-        whitelist = part_template.material_whitelist.all()
-
         material_entry = None
 
         # Payload material
         if material_id:
-            material_entry = whitelist.filter(material_id=material_id).first()
+            material_entry = node.link_for(material_id)
 
         # Fallback to default material
         if not material_entry:
-            material_entry = whitelist.filter(is_default=True).first()
+            material_entry = node.default_link()
 
         if not material_entry:
             return fin  # No material = no EB
 
         # 2️⃣ Resolve edgeband entry
-        eb_whitelist = material_entry.edgeband_options.all()
-
+        # Payload EB (only if whitelisted), fallback to default EB
         selected_eb_id = getattr(self, "selected_eb_id", None)
-
-        eb_entry = None
-
-        # Payload EB (only if whitelisted)
-        if selected_eb_id:
-            eb_entry = eb_whitelist.filter(edgeband_id=selected_eb_id).first()
-
-        # Fallback to default EB
-        if not eb_entry:
-            eb_entry = eb_whitelist.filter(is_default=True).first()
+        eb_entry = material_entry.edgeband_option(selected_eb_id)
 
         if not eb_entry:
             return fin  # No EB applied
@@ -355,10 +348,14 @@ class BOMBuilder:
         return fin
 
 
-    def _compute_hardware_cost(self, part_template, total_qty: Decimal) -> Dict[str, Decimal]:
+    def _compute_hardware_cost(self, node: TemplateNode, total_qty: Decimal) -> Dict[str, Any]:
         fin = {"cp": Decimal("0"), "sp": Decimal("0")}
-        for rule in part_template.hardware_rules.select_related('hardware').all():
-            evaluator = HardwareEvaluator(rule, {**self.product_dims, **self.parameters})
+        # Per hardware item, for the QuotePartHardware rows of an expanded part
+        items: Dict[Any, Dict[str, Any]] = {}
+        # Built once per part so the shared evaluator binds it only once
+        hw_context = {**self.product_dims, **self.parameters}
+        for rule in node.hardware_rules:
+            evaluator = HardwareEvaluator(rule, hw_context, evaluator=self.hw_evaluator)
             tech_data = evaluator.evaluate()
             if tech_data:
                 # You defined this...
@@ -368,10 +365,13 @@ class BOMBuilder:
                 # ...but you were calling 'qty' here. Corrected to 'final_hw_qty':
                 fin["cp"] += final_hw_qty * hw.cost_price
                 fin["sp"] += final_hw_qty * hw.sell_price
-                
-                
-                
-        return {k: v.quantize(Decimal("1.00")) for k, v in fin.items()}
+                item = items.setdefault(hw.id, {
+                    "hardware_id": hw.id, "quantity": Decimal("0"),
+                    "unit_cp": Decimal(str(hw.cost_price)), "unit_sp": Decimal(str(hw.sell_price)),
+                })
+                item["quantity"] += final_hw_qty
+
+        return {**{k: v.quantize(Decimal("1.00")) for k, v in fin.items()}, "items": list(items.values())}
 
     def _compute_prices(self, part_data: Dict, mat: Dict, eb: Dict, hw: Dict) -> Dict[str, Decimal]:
         cp = mat["cp"] + eb["cp"] + hw["cp"]
@@ -97,7 +97,16 @@ class ProductContext:
 
 import math
 from decimal import Decimal
-from typing import Dict, Any, Optional
+from functools import reduce
+from typing import Dict, Any, List, Optional
+from .expression_cache import compile_expression
+
+try:
+    import numpy as np
+except ImportError:  # optional: only configuration sweeps evaluate arrays
+    np = None
+
+QUANTUM = Decimal("0.0001")
 
 class ExpressionContext:
     """
@@ -140,15 +149,17 @@ class ExpressionContext:
 
         try:
             # Restricted eval: No access to system builtins (__import__, etc.)
-            # only uses the context we provided.
+            # only uses the context we provided. The equation is parsed once
+            # per process and reused from the shared expression cache.
+            compiled = compile_expression(expression)
             result = eval(
-                str(expression), 
-                {"__builtins__": {}}, 
+                compiled.code,
+                {"__builtins__": {}},
                 self.context
             )
             
             # Convert back to Decimal for the high-precision SaaS core
-            return Decimal(str(result)).quantize(Decimal("0.0001"))
+            return Decimal(str(result)).quantize(QUANTUM)
             
         except NameError as e:
             # Specific error for when a variable (like SIDE_L) is missing
@@ -162,4 +173,108 @@ class ExpressionContext:
         Updates the engine's memory mid-calculation.
         Crucial for solving the 'Sequential Issue'.
         """
-        self.context[key] = float(value)
\ No newline at end of file
+        self.context[key] = float(value)
+
+
+class VectorExpressionContext(ExpressionContext):
+    """
+    Array mode of ExpressionContext for configuration sweeps. Any variable
+    may hold N values (one per configuration); each compiled equation is
+    evaluated once for all N with NumPy. Results are quantized exactly like
+    the scalar mode, so both modes produce the same Decimals.
+    """
+
+    def __init__(self, context_data: Dict[str, Any], size: Optional[int] = None):
+        if np is None:
+            raise ImportError("numpy is required for vectorized equation evaluation")
+        self.size = size
+        self.context = {}
+        for k, v in context_data.items():
+            self.update_context(k, v)
+
+        self.context.update({
+            "abs": np.abs,
+            "round": self._round,
+            "min": self._reducer(np.minimum),
+            "max": self._reducer(np.maximum),
+            "ceil": np.ceil,
+            "floor": np.floor,
+            "sqrt": np.sqrt,
+            "pow": np.float_power,
+            "_where": np.where,
+            "_and": np.logical_and,
+            "_or": np.logical_or,
+            "_not": np.logical_not,
+        })
+
+    @staticmethod
+    def _round(value, ndigits=None):
+        if ndigits is None:
+            # Both round half to even
+            return np.round(value)
+        # np.round(x, n) scales by 10**n and can differ from round() in the last digit
+        return np.vectorize(round, otypes=[float])(value, ndigits)
+
+    @staticmethod
+    def _reducer(ufunc):
+        def apply(*args):
+            if len(args) == 1:
+                args = tuple(args[0])
+            return reduce(ufunc, args)
+        return apply
+
+    def update_context(self, key: str, value: Any):
+        if isinstance(value, (list, tuple)) or (np is not None and isinstance(value, np.ndarray)):
+            array = np.asarray(value, dtype=float)
+            if self.size is None:
+                self.size = len(array)
+            elif len(array) != self.size:
+                raise ValueError(f"'{key}' has {len(array)} values, expected {self.size}")
+            self.context[key] = array
+        elif isinstance(value, (Decimal, int, float)):
+            self.context[key] = float(value)
+        else:
+            self.context[key] = value
+
+    @staticmethod
+    def quantize_array(values):
+        """Each value quantized the way ExpressionContext.evaluate does; NaN stays NaN."""
+        return np.array([float(Decimal(str(float(v))).quantize(QUANTUM)) for v in values])
+
+    def evaluate_array(self, expression: str, strict: bool = True):
+        """
+        Float64 array of N results. Division by zero or a math domain error
+        makes that configuration NaN; strict mode raises for it instead,
+        as the scalar mode would.
+        """
+        size = self.size or 1
+        if not expression or str(expression).strip() == "":
+            return np.zeros(size)
+
+        try:
+            compiled = compile_expression(expression)
+            with np.errstate(all="ignore"):
+                result = eval(
+                    compiled.vector_code,
+                    {"__builtins__": {}},
+                    self.context
+                )
+        except NameError as e:
+            raise NameError(f"Missing variable in formula: {e}")
+        except Exception as e:
+            raise ValueError(f"Calculation Error in '{expression}': {e}")
+
+        result = np.broadcast_to(np.asarray(result, dtype=float), (size,)).copy()
+        invalid = ~np.isfinite(result)
+        if invalid.any():
+            if strict:
+                raise ValueError(
+                    f"Calculation Error in '{expression}': no finite result for "
+                    f"configurations {np.flatnonzero(invalid).tolist()}"
+                )
+            result[invalid] = np.nan
+        return result
+
+    def evaluate(self, expression: str) -> List[Decimal]:
+        """Same quantization as ExpressionContext.evaluate, per configuration."""
+        return [Decimal(str(float(v))).quantize(QUANTUM) for v in self.evaluate_array(expression)]
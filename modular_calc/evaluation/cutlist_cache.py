@@ -0,0 +1,198 @@
+# modular_calc/evaluation/cutlist_cache.py
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict, deque
+from copy import deepcopy
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cutlist_optimizer import CutlistOptimizer, PartRect
+
+DEFAULT_MAXSIZE = 256
+
+
+def _part_class(width, height, grain, material_id) -> Tuple:
+    """Pieces of one class are interchangeable on a layout; only their names differ."""
+    return Decimal(str(width)), Decimal(str(height)), str(grain or "none").lower(), str(material_id)
+
+
+class CutlistCache:
+    """
+    Memoised CutlistOptimizer reports. A layout depends only on the
+    multiset of (w, h, grain, material, sheet size, trim) plus the
+    optimizer settings, so the key aggregates quantities per distinct
+    part and leaves names out: a repeat cabinet under other part names
+    still hits, and the cached layout is handed back with the caller's
+    names. Process-wide LRU, optionally backed by one pickle file per
+    key in `path` so layouts survive restarts.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[Dict, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(optimizer: CutlistOptimizer, parts: List[PartRect], time_budget_ms: Optional[float] = None) -> str:
+        quantities: Dict[Tuple, int] = defaultdict(int)
+        for p in parts:
+            quantities[(
+                *(str(v) for v in _part_class(p.width, p.height, p.grain, p.material_id)),
+                str(Decimal(str(p.sheet_width))), str(Decimal(str(p.sheet_height))), str(Decimal(str(p.trim_mm))),
+            )] += int(p.quantity)
+        document = {
+            "parts": sorted([*k, q] for k, q in quantities.items() if q > 0),
+            "kerf": str(optimizer.kerf),
+            "heuristic": optimizer.heuristic,
+            "mode": optimizer.mode,
+            "stages": getattr(optimizer, "stages", None),
+            "min_remnant": [str(v) for v in optimizer.min_remnant],
+            "remnants": optimizer.remnants.fingerprint() if optimizer.remnants is not None else None,
+            "stock": optimizer.stock.fingerprint() if optimizer.stock is not None else None,
+            "time_budget_ms": time_budget_ms,
+        }
+        raw = json.dumps(document, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def optimize(self, optimizer: CutlistOptimizer, parts: List[PartRect], progress=None,
+                 time_budget_ms: Optional[float] = None) -> Dict:
+        """Same report as optimizer.optimize(parts, ...), from the cache when the part multiset repeats."""
+        key = self.key_for(optimizer, parts, time_budget_ms)
+        names = self._names_by_class(parts)
+        entry = self._get(key)
+        if entry is not None:
+            report, cached_names = entry
+            total = sum(int(p.quantity) for p in parts)
+            if progress is not None:
+                progress(total, total)
+            return self._rebind(report, cached_names, names)
+
+        report = optimizer.optimize(parts, progress=progress, time_budget_ms=time_budget_ms)
+        self._set(key, (report, names))
+        return self._rebind(report, names, names)
+
+    @staticmethod
+    def _names_by_class(parts: List[PartRect]) -> Dict[Tuple, List[str]]:
+        names: Dict[Tuple, List[str]] = defaultdict(list)
+        for p in parts:
+            names[_part_class(p.width, p.height, p.grain, p.material_id)].extend([str(p.name)] * int(p.quantity))
+        return {k: sorted(v) for k, v in names.items()}
+
+    @staticmethod
+    def _rebind(report: Dict, cached_names: Dict[Tuple, List[str]], names: Dict[Tuple, List[str]]) -> Dict:
+        """
+        A copy of the report safe to hand out. Each cached name is swapped
+        for the caller's name of the same rank within its part class.
+        """
+        queues = None
+        if cached_names != names:
+            queues = {}
+            for cls, cached in cached_names.items():
+                for old, new in zip(cached, names.get(cls, [])):
+                    queues.setdefault((cls, old), deque()).append(new)
+
+        sheets = []
+        for sheet in report["sheets"]:
+            placed = []
+            for p in sheet["parts"]:
+                p = dict(p)
+                if queues is not None:
+                    w, h = (p["h"], p["w"]) if p["rotated"] else (p["w"], p["h"])
+                    p["name"] = queues[(_part_class(w, h, p["grain"], sheet["material_id"]), p["name"])].popleft()
+                placed.append(p)
+            sheets.append({**sheet, "parts": placed})
+        copy = {**report, "sheets": sheets}
+        for field in ("materials", "offcuts"):
+            if field in report:
+                copy[field] = [dict(row) for row in report[field]]
+        if "cut_plan" in report:
+            # Cuts refer to parts by placement index, so names need no rebinding
+            copy["cut_plan"] = deepcopy(report["cut_plan"])
+        return copy
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def _get(self, key: str) -> Optional[Tuple[Dict, Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.path:
+            try:
+                with open(self._file(key), "rb") as fh:
+                    entry = pickle.load(fh)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                with self._lock:
+                    self.hits += 1
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _set(self, key: str, entry: Tuple[Dict, Dict]) -> None:
+        self._remember(key, entry)
+        if self.path:
+            # Write then rename, so a reader never sees half a file
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._file(key))
+            except OSError:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+    def _remember(self, key: str, entry: Tuple[Dict, Dict]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops the in-memory entries; files under `path` are left for the next process."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses, "path": self.path}
+
+
+def _configured() -> Dict[str, Any]:
+    """settings.MODULAR_CALC_CUTLIST_CACHE when running under Django, else defaults."""
+    try:
+        from django.conf import settings
+    except ImportError:
+        return {}
+    if not settings.configured:
+        return {}
+    return getattr(settings, "MODULAR_CALC_CUTLIST_CACHE", {})
+
+
+def build_cutlist_cache(config: Optional[Dict[str, Any]] = None) -> CutlistCache:
+    """{"MAXSIZE": 256, "PATH": None}; PATH is a directory for on-disk persistence."""
+    if config is None:
+        config = _configured()
+    return CutlistCache(maxsize=config.get("MAXSIZE", DEFAULT_MAXSIZE), path=config.get("PATH"))
+
+
+cutlist_cache = build_cutlist_cache()
@@ -0,0 +1,218 @@
+# modular_calc/evaluation/cutlist_export.py
+import csv
+import zipfile
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from .geometry_utils import generate_default_svg
+
+# Export kinds: cutting list, one label per piece, optimizer interchange,
+# per-sheet SVG layouts, and all of them in one ZIP
+KIND_CUTTING_LIST = "cutting_list"
+KIND_LABELS = "labels"
+KIND_OPTIMIZER = "optimizer"
+KIND_SVG = "svg"
+KIND_ZIP = "zip"
+EXPORT_KINDS = (KIND_CUTTING_LIST, KIND_LABELS, KIND_OPTIMIZER, KIND_SVG, KIND_ZIP)
+
+CONTENT_TYPES = {
+    KIND_CUTTING_LIST: "text/csv",
+    KIND_LABELS: "text/csv",
+    KIND_OPTIMIZER: "text/plain",
+    KIND_SVG: "image/svg+xml",
+    KIND_ZIP: "application/zip",
+}
+
+OPTIMIZER_FORMAT_VERSION = 1
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: write() hands the line back instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _csv_lines(header: Iterable, rows: Iterable[Iterable]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _num(value) -> str:
+    """Millimetres without a trailing .0, the way saw software expects them."""
+    text = format(float(value), "f").rstrip("0").rstrip(".")
+    return text or "0"
+
+
+def _piece_size(piece: Dict) -> Tuple:
+    """(length, width) of a placed piece as drawn, undoing the optimizer's rotation."""
+    return (piece["w"], piece["h"]) if piece["rotated"] else (piece["h"], piece["w"])
+
+
+class CutlistExporter:
+    """
+    Streams a cutlist report (CutlistOptimizer or StripCutlistOptimizer)
+    as CSV cutting lists, piece labels, a line-based optimizer interchange
+    file and per-sheet SVG layouts. Every export is a generator of text
+    chunks, so a large order is written out piece by piece rather than
+    built up in memory. `materials` names boards by material id.
+    """
+
+    def __init__(self, cutlist: Dict, materials: Optional[Dict] = None, reference: str = ""):
+        self.cutlist = cutlist
+        self.materials = materials or {}
+        self.reference = reference
+
+    def _material(self, material_id) -> str:
+        return str(self.materials.get(material_id, material_id))
+
+    def _pieces(self) -> Iterator[Tuple[int, int, Dict, Dict]]:
+        for sheet_index, sheet in enumerate(self.cutlist.get("sheets", [])):
+            for piece_index, piece in enumerate(sheet["parts"]):
+                yield sheet_index, piece_index, sheet, piece
+
+    def cutting_list(self) -> Iterator[str]:
+        """One CSV row per part and board, with the quantity to cut."""
+        totals: Dict[Tuple, int] = OrderedDict()
+        for _, _, sheet, piece in self._pieces():
+            length, width = _piece_size(piece)
+            key = (sheet["material_id"], piece["name"], length, width, piece["grain"])
+            totals[key] = totals.get(key, 0) + 1
+        return _csv_lines(
+            ("material", "part", "length_mm", "width_mm", "qty", "grain"),
+            (
+                (self._material(material_id), name, _num(length), _num(width), qty, grain)
+                for (material_id, name, length, width, grain), qty in totals.items()
+            ),
+        )
+
+    def labels(self) -> Iterator[str]:
+        """One CSV row per piece, carrying where it sits on which sheet."""
+        return _csv_lines(
+            ("label", "reference", "part", "material", "length_mm", "width_mm", "sheet", "x_mm", "y_mm", "rotated"),
+            (
+                (
+                    f"S{sheet_index + 1}-{piece_index + 1}", self.reference, piece["name"],
+                    self._material(sheet["material_id"]), *map(_num, _piece_size(piece)),
+                    sheet_index + 1, _num(piece["x"]), _num(piece["y"]), int(piece["rotated"]),
+                )
+                for sheet_index, piece_index, sheet, piece in self._pieces()
+            ),
+        )
+
+    def optimizer(self) -> Iterator[str]:
+        """
+        Semicolon-separated interchange for panel saw software: a HEADER
+        line, one BOARD line per sheet size, one PART line per part to cut
+        and, once the layout is fixed, one PLACE line per piece.
+        """
+        yield f"HEADER;{OPTIMIZER_FORMAT_VERSION};{self.reference}\n"
+        boards: Dict[Tuple, int] = OrderedDict()
+        for sheet in self.cutlist.get("sheets", []):
+            key = (sheet["material_id"], sheet["raw_dims"]["h"], sheet["raw_dims"]["w"], sheet.get("remnant_id"))
+            boards[key] = boards.get(key, 0) + 1
+        for (material_id, length, width, remnant_id), qty in boards.items():
+            yield f"BOARD;{self._material(material_id)};{_num(length)};{_num(width)};{qty};{remnant_id or ''}\n"
+        parts: Dict[Tuple, int] = OrderedDict()
+        for _, _, sheet, piece in self._pieces():
+            key = (sheet["material_id"], piece["name"], *_piece_size(piece), piece["grain"])
+            parts[key] = parts.get(key, 0) + 1
+        for (material_id, name, length, width, grain), qty in parts.items():
+            rotate = 0 if grain.lower() in ("vertical", "horizontal", "v", "h") else 1
+            yield f"PART;{name};{self._material(material_id)};{_num(length)};{_num(width)};{qty};{grain};{rotate}\n"
+        for sheet_index, _, _, piece in self._pieces():
+            yield f"PLACE;{sheet_index + 1};{piece['name']};{_num(piece['x'])};{_num(piece['y'])};{int(piece['rotated'])}\n"
+
+    def sheet_svg(self, sheet_index: int) -> Iterator[str]:
+        """Layout of one sheet, board outline and pieces drawn with generate_default_svg paths."""
+        sheet = self.cutlist["sheets"][sheet_index]
+        width, height = sheet["usable_dims"]["w"], sheet["usable_dims"]["h"]
+        yield (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_num(width)} {_num(height)}" '
+            f'width="{_num(width)}mm" height="{_num(height)}mm">\n'
+            f'<title>{_escape(self._material(sheet["material_id"]))} sheet {sheet_index + 1}</title>\n'
+            f'<path d="{generate_default_svg("RECT", width, height)}" fill="#f4ecdf" stroke="#555"/>\n'
+        )
+        for piece in sheet["parts"]:
+            piece_length, piece_width = map(_num, _piece_size(piece))
+            yield (
+                f'<g transform="translate({_num(piece["x"])} {_num(piece["y"])})">'
+                f'<path d="{generate_default_svg("RECT", piece["w"], piece["h"])}" fill="#d9b98c" stroke="#333"/>'
+                f'<text x="{_num(float(piece["w"]) / 2)}" y="{_num(float(piece["h"]) / 2)}" '
+                f'text-anchor="middle" font-size="24">{_escape(piece["name"])} {piece_length}x{piece_width}</text></g>\n'
+            )
+        yield "</svg>\n"
+
+    def entries(self) -> Iterator[Tuple[str, Iterator[str]]]:
+        """(file name, chunks) for every export, the archive layout of zip()."""
+        yield "cutting_list.csv", self.cutting_list()
+        yield "labels.csv", self.labels()
+        yield "optimizer.txt", self.optimizer()
+        for sheet_index in range(len(self.cutlist.get("sheets", []))):
+            yield f"sheets/sheet_{sheet_index + 1:03d}.svg", self.sheet_svg(sheet_index)
+
+    def zip(self) -> Iterator[bytes]:
+        return zip_stream(self.entries())
+
+    def export(self, kind: str, sheet_index: int = 0) -> Iterator[Union[str, bytes]]:
+        if kind == KIND_CUTTING_LIST:
+            return self.cutting_list()
+        if kind == KIND_LABELS:
+            return self.labels()
+        if kind == KIND_OPTIMIZER:
+            return self.optimizer()
+        if kind == KIND_SVG:
+            if not 0 <= sheet_index < len(self.cutlist.get("sheets", [])):
+                raise ValueError(f"No sheet {sheet_index + 1} in this cutlist")
+            return self.sheet_svg(sheet_index)
+        if kind == KIND_ZIP:
+            return self.zip()
+        raise ValueError(f"Unknown export '{kind}', expected one of {', '.join(EXPORT_KINDS)}")
+
+
+def _escape(text) -> str:
+    return str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class _ZipSink:
+    """Write-only file for ZipFile; the bytes written since the last drain() are handed out and dropped."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_stream(entries: Iterable[Tuple[str, Iterable[Union[str, bytes]]]]) -> Iterator[bytes]:
+    """
+    A ZIP archive of (name, chunks) entries, yielded as it is compressed.
+    The sink cannot seek, so ZipFile writes data descriptors after each
+    entry and nothing larger than one compressed chunk is held at once.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, mode="w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
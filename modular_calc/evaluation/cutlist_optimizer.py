@@ -1,9 +1,59 @@
 # cutlist_optimizer_tier5.py
+import random
+import time
+from array import array
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple
-from decimal import Decimal
+from typing import Callable, List, Dict, Optional, Tuple
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
 # import matplotlib.pyplot as plt
 
+# Internal coordinates are integer tenths of a millimetre
+UNITS_PER_MM = 10
+
+BEST_SHORT_SIDE_FIT = "best_short_side_fit"
+BEST_AREA_FIT = "best_area_fit"
+BOTTOM_LEFT = "bottom_left"
+HEURISTICS = (BEST_SHORT_SIDE_FIT, BEST_AREA_FIT, BOTTOM_LEFT)
+
+PROGRESS_EVERY = 500
+
+# Time budgets (ms) for the anytime search: quoting sliders vs factory release
+INTERACTIVE_BUDGET_MS = 50
+RELEASE_BUDGET_MS = 30_000
+
+# Part orders tried by the anytime search, each largest first by a
+# measure of the part's (width, height) in tenth-mm
+ORDER_AREA = "area"
+ORDER_LONGEST_SIDE = "longest_side"
+ORDER_PERIMETER = "perimeter"
+ORDERINGS = {
+    ORDER_AREA: lambda w, h: w * h,
+    ORDER_LONGEST_SIDE: max,
+    ORDER_PERIMETER: lambda w, h: w + h,
+}
+SEARCH_SEED = 0
+
+# Grain as stored in PartTable; anything unknown is cut upright. That
+# includes the board grain codes (WoodMaterial "H"/"V") the BOM passes on:
+# they describe the sheet, not a rotation of the part
+GRAIN_NONE, GRAIN_VERTICAL, GRAIN_HORIZONTAL, GRAIN_OTHER = 0, 1, 2, 3
+GRAIN_CODES = {"none": GRAIN_NONE, "vertical": GRAIN_VERTICAL, "horizontal": GRAIN_HORIZONTAL}
+
+MODE_GUILLOTINE = "guillotine"
+
+# Smallest offcut worth keeping, (short side, long side) in mm
+REMNANT_MIN_MM = (150, 300)
+
+
+def to_units(mm, rounding=ROUND_CEILING) -> int:
+    """mm -> tenth-mm. Parts and kerf round up, usable sheet size rounds down."""
+    return int((Decimal(str(mm)) * UNITS_PER_MM).to_integral_value(rounding=rounding))
+
+
+def from_units(units: int) -> Decimal:
+    return Decimal(units) / UNITS_PER_MM
+
+
 @dataclass
 class PartRect:
     width: Decimal
@@ -17,144 +67,663 @@ class PartRect:
     trim_mm: Decimal = Decimal("10.0")
 
 
-@dataclass
+def canonical_sort_key(p: PartRect) -> Tuple:
+    return (
+        str(p.material_id), Decimal(str(p.sheet_width)), Decimal(str(p.sheet_height)), Decimal(str(p.trim_mm)),
+        Decimal(str(p.width)), Decimal(str(p.height)), str(p.grain or "none").lower(), str(p.name),
+    )
+
+
+class GuillotineBin:
+    """
+    Free space of one sheet as disjoint rectangles (x, y, w, h) in tenth-mm.
+    Placing a part splits only the free rectangle it lands in, along the
+    shorter leftover axis, so every layout stays cuttable edge to edge and
+    the free list is maintained incrementally.
+
+    Kerf is handled by growing the bin and every part footprint by one kerf:
+    parts never touch, and the far sheet edge needs no cut.
+    """
+
+    __slots__ = ("width", "height", "free", "free_area", "max_w", "max_h", "max_area")
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free: List[Tuple[int, int, int, int]] = [(0, 0, width, height)] if width > 0 and height > 0 else []
+        self.free_area = width * height if self.free else 0
+        self._update_bounds()
+
+    def _update_bounds(self) -> None:
+        # Widest, tallest and largest free rectangle: a cheap reject before find()
+        self.max_w = self.max_h = self.max_area = 0
+        for _, _, fw, fh in self.free:
+            if fw > self.max_w:
+                self.max_w = fw
+            if fh > self.max_h:
+                self.max_h = fh
+            if fw * fh > self.max_area:
+                self.max_area = fw * fh
+
+    def may_fit(self, orientations) -> bool:
+        w, h = orientations[0]
+        if w * h > self.max_area:
+            return False
+        return any(w <= self.max_w and h <= self.max_h for w, h in orientations)
+
+    @staticmethod
+    def _score(heuristic: str, fx: int, fy: int, fw: int, fh: int, w: int, h: int) -> Tuple[int, int]:
+        if heuristic == BEST_AREA_FIT:
+            return fw * fh - w * h, min(fw - w, fh - h)
+        if heuristic == BOTTOM_LEFT:
+            return fy + h, fx
+        leftover_w, leftover_h = fw - w, fh - h
+        return min(leftover_w, leftover_h), max(leftover_w, leftover_h)
+
+    def find(self, orientations, heuristic: str = BEST_SHORT_SIDE_FIT):
+        """Best (score, free index, orientation index) for the given footprints, or None."""
+        best = None
+        for index, (fx, fy, fw, fh) in enumerate(self.free):
+            for o, (w, h) in enumerate(orientations):
+                if w <= fw and h <= fh:
+                    score = self._score(heuristic, fx, fy, fw, fh, w, h)
+                    if best is None or score < best[0]:
+                        best = (score, index, o)
+        return best
+
+    def place(self, index: int, w: int, h: int) -> Tuple[int, int]:
+        fx, fy, fw, fh = self.free[index]
+        # Swap-remove keeps the removal O(1); order does not matter
+        self.free[index] = self.free[-1]
+        self.free.pop()
+
+        leftover_w, leftover_h = fw - w, fh - h
+        if leftover_w < leftover_h:
+            right = (fx + w, fy, leftover_w, h)
+            below = (fx, fy + h, fw, leftover_h)
+        else:
+            right = (fx + w, fy, leftover_w, fh)
+            below = (fx, fy + h, w, leftover_h)
+        for rect in (right, below):
+            if rect[2] > 0 and rect[3] > 0:
+                self.free.append(rect)
+        self.free_area -= w * h
+        self._update_bounds()
+        return fx, fy
+
+
+
+class PartTable:
+    """
+    The pieces of one optimize() call, column-wise. Each distinct part is
+    a row of the per-part columns: size in tenth-mm, grain code and sheet
+    group, plus the name and mm sizes the report needs. A piece is only
+    a row index in `pieces`, so a 3,000-piece order costs a few
+    kilobytes of ints instead of a dict of Decimals per piece.
+    """
+
+    __slots__ = ("names", "widths", "heights", "grains", "areas", "w_u", "h_u", "grain_codes", "group", "groups", "pieces")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.widths: List[Decimal] = []
+        self.heights: List[Decimal] = []
+        self.grains: List[str] = []
+        self.areas: List[Decimal] = []
+        self.w_u = array("i")
+        self.h_u = array("i")
+        self.grain_codes = array("b")
+        # Index into groups: (material_id, raw_w, raw_h, trim), the boards a part is cut from
+        self.group = array("i")
+        self.groups: List[Tuple] = []
+        self.pieces = array("i")
+
+    def add(self, p: PartRect, group_index: Dict[Tuple, int]) -> None:
+        row = len(self.names)
+        w, h = Decimal(str(p.width)), Decimal(str(p.height))
+        grain = str(p.grain or "none").lower()
+        key = (p.material_id, Decimal(str(p.sheet_width)), Decimal(str(p.sheet_height)), Decimal(str(p.trim_mm)))
+        if key not in group_index:
+            group_index[key] = len(self.groups)
+            self.groups.append(key)
+        self.names.append(p.name)
+        self.widths.append(w)
+        self.heights.append(h)
+        self.grains.append(grain)
+        self.areas.append(w * h)
+        self.w_u.append(to_units(w))
+        self.h_u.append(to_units(h))
+        self.grain_codes.append(GRAIN_CODES.get(grain, GRAIN_OTHER))
+        self.group.append(group_index[key])
+        self.pieces.extend([row] * int(p.quantity))
+
+
 class Sheet:
-    width: Decimal
-    height: Decimal
-    material_id: int
-    parts: List[Dict]
-    used_area: Decimal = Decimal("0")
-    raw_width: Decimal = Decimal("0")
-    raw_height: Decimal = Decimal("0")
+    """
+    One board or offcut being cut. Placements are parallel arrays of part
+    row, x, y (tenth-mm) and rotation; they become report dicts only in
+    CutlistOptimizer._build_report.
+    """
+
+    __slots__ = (
+        "width", "height", "material_id", "raw_width", "raw_height", "bin",
+        "remnant_id", "board_fraction", "position", "part_rows", "xs", "ys", "rotated", "used_units", "strip_plan",
+        "price",
+    )
+
+    def __init__(self, width: Decimal, height: Decimal, material_id: int,
+                 raw_width: Decimal = Decimal("0"), raw_height: Decimal = Decimal("0"),
+                 bin: Optional[GuillotineBin] = None, remnant_id: Optional[int] = None,
+                 board_fraction: Decimal = Decimal("1")):
+        self.width = width
+        self.height = height
+        self.material_id = material_id
+        self.raw_width = raw_width
+        self.raw_height = raw_height
+        self.bin = bin
+        # Set when the sheet is an offcut from stock; board_fraction is its
+        # share of a full board, which is what it costs
+        self.remnant_id = remnant_id
+        self.board_fraction = board_fraction
+        # Index in the layout's sheet list, set when the packer opens it
+        self.position = 0
+        self.part_rows = array("i")
+        self.xs = array("i")
+        self.ys = array("i")
+        self.rotated = array("b")
+        # Placed part area in tenth-mm², for comparing layouts
+        self.used_units = 0
+        # Strips and cuts when the sheet is strip-packed (strip_packing.py)
+        self.strip_plan = None
+        # Board price when the size was picked from stock offers (stock_sizes.py)
+        self.price: Optional[Decimal] = None
+
+    def add(self, row: int, x: int, y: int, rotated: bool, area_units: int) -> None:
+        self.part_rows.append(row)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.rotated.append(rotated)
+        self.used_units += area_units
 
-    def remaining_area(self) -> Decimal:
-        return (self.width * self.height) - self.used_area
+    def __len__(self) -> int:
+        return len(self.part_rows)
 
 
 class CutlistOptimizer:
 
-    def __init__(self, kerf_mm: float = 3.0):
+    mode = MODE_GUILLOTINE
+
+    def __init__(self, kerf_mm: float = 3.0, heuristic: str = BEST_SHORT_SIDE_FIT,
+                 remnants=None, min_remnant_mm: Tuple[float, float] = REMNANT_MIN_MM, stock=None):
+        """
+        `remnants` is an optional RemnantStore (see remnants.py): offcuts
+        in stock are tried before a new sheet is opened, and the report
+        lists the offcuts used and the usable ones this job leaves behind
+        (at least min_remnant_mm as (short side, long side)).
+        `stock` is an optional StockCatalog (see stock_sizes.py): materials
+        with stock sizes are cut from the mix of sizes that costs least,
+        instead of the PartRect sheet size (see _pack_boards).
+        """
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown heuristic '{heuristic}', expected one of {HEURISTICS}")
         self.kerf = Decimal(str(kerf_mm))
+        self.heuristic = heuristic
+        self.remnants = remnants
+        self.min_remnant = tuple(Decimal(str(v)) for v in min_remnant_mm)
+        self.stock = stock
         self.sheets: List[Sheet] = []
+        self.table: Optional[PartTable] = None
+        # Per sheet group: stock offers, and the one new sheets are opened in
+        self.offers: List[List] = []
+        self.boards: List = []
+
+    def optimize(self, parts: List[PartRect], visualize: bool = True,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 time_budget_ms: Optional[float] = None) -> Dict:
+        """
+        Guillotine placement, largest parts first, first sheet that fits.
+        `progress(placed, total)` is called every PROGRESS_EVERY pieces and
+        once at the end, for callers nesting whole orders off-request.
+
+        With a time_budget_ms the optimizer keeps trying other part orders
+        and heuristics until the budget runs out and reports the best
+        layout found, with a "search_stats" block (see _search).
+        """
+        self.table = self._expand(parts)
+        self._prepare_stock()
+        if time_budget_ms is None:
+            self.sheets = self._pack_boards(self._ordered(ORDER_AREA), self.heuristic, progress)
+            report = self._build_report()
+        else:
+            report = self._search(time_budget_ms, progress)
+        # if visualize:
+        #     self._draw_sheets()
+        return report
+
+    @staticmethod
+    def _expand(parts: List[PartRect]) -> PartTable:
+        """
+        Parts are put in a canonical order first, so the layout depends on
+        the multiset of parts only, never on the order they were listed in.
+        """
+        table = PartTable()
+        group_index: Dict[Tuple, int] = {}
+        for p in sorted(parts, key=canonical_sort_key):
+            table.add(p, group_index)
+        return table
+
+    def _ordered(self, ordering: str, rng: Optional[random.Random] = None) -> array:
+        """Pieces largest first by the ordering's measure; a random jitter of up to 30% when rng is given."""
+        table = self.table
+        measure = list(map(ORDERINGS[ordering], table.w_u, table.h_u))
+        if rng is None:
+            return array("i", sorted(table.pieces, key=measure.__getitem__, reverse=True))
+        keyed = [(measure[row] * (1 + rng.random() * 0.3), i) for i, row in enumerate(table.pieces)]
+        keyed.sort(reverse=True)
+        return array("i", (table.pieces[i] for _, i in keyed))
 
-    def optimize(self, parts: List[PartRect], visualize: bool = True) -> Dict:
-        """Main guillotine-based placement"""
-        rects = []
-        for p in parts:
-            for _ in range(int(p.quantity)):
-                rects.append({
-                    "name": p.name,
-                    "w": p.width,
-                    "h": p.height,
-                    "grain": p.grain,
-                    "material_id": p.material_id,
-                    "raw_w": p.sheet_width,
-                    "raw_h": p.sheet_height,
-                    "trim": p.trim_mm
-                })
-
-        # Sort descending by area for better guillotine packing
-        rects.sort(key=lambda r: r["w"] * r["h"], reverse=True)
-
-        for rect in rects:
+    def _remnant_stock(self):
+        """A fresh copy per packing run; the caller's store is never consumed."""
+        return self.remnants.copy() if self.remnants is not None else None
+
+    def _pack(self, order: array, heuristic: str,
+              progress: Optional[Callable[[int, int], None]] = None, remnants=None) -> List[Sheet]:
+        table = self.table
+        kerf = to_units(self.kerf)
+        orientations = [
+            self._allowed_orientations(w, h, grain) for w, h, grain in zip(table.w_u, table.h_u, table.grain_codes)
+        ]
+        footprints = [[(w + kerf, h + kerf) for w, h, _ in options] for options in orientations]
+        # A sheet whose largest free rectangle is below the smallest
+        # footprint of the order can take nothing more and is closed
+        smallest = min((footprints[row][0][0] * footprints[row][0][1] for row in set(order)), default=0)
+        sheets: List[Sheet] = []
+        open_sheets: List[List[Sheet]] = [[] for _ in table.groups]
+        # Free space only shrinks, so a sheet that rejected a part rejects
+        # every later piece of it too: per part, the position in `sheets`
+        # below which every sheet is known to be too full
+        rejected_below = array("i", [0]) * len(table.names)
+        for done, row in enumerate(order):
+            if progress is not None and done % PROGRESS_EVERY == 0:
+                progress(done, len(order))
+            group = table.group[row]
+            material_id, raw_w, raw_h, trim = table.groups[group]
             placed = False
-            for sheet in self.sheets:
-                if sheet.material_id == rect["material_id"]:
-                    pos = self._guillotine_place(sheet, rect)
-                    if pos:
-                        placed = True
-                        break
+            candidates = open_sheets[group]
+            fits, options = footprints[row], orientations[row]
+            start, skip = 0, rejected_below[row]
+            while start < len(candidates) and candidates[start].position < skip:
+                start += 1
+            for i in range(start, len(candidates)):
+                sheet = candidates[i]
+                if sheet.bin.may_fit(fits) and self._place(sheet, row, options, fits, heuristic):
+                    placed = True
+                    rejected_below[row] = sheet.position
+                    if sheet.bin.max_area < smallest:
+                        del candidates[i]
+                    break
+            else:
+                if candidates:
+                    rejected_below[row] = candidates[-1].position + 1
+
+            if not placed and remnants is not None:
+                offcut = remnants.take(material_id, [(w, h) for w, h, _ in options])
+                if offcut is not None:
+                    new_sheet = self._remnant_sheet(offcut, material_id, raw_w, raw_h)
+                    placed = self._place(new_sheet, row, options, fits, heuristic)
+                    if placed:
+                        new_sheet.position = len(sheets)
+                        sheets.append(new_sheet)
+                        candidates.append(new_sheet)
 
             if not placed:
                 # Create a new sheet if needed
-                new_sheet = Sheet(
-                    width=rect["raw_w"] - 2 * rect["trim"],
-                    height=rect["raw_h"] - 2 * rect["trim"],
-                    material_id=rect["material_id"],
-                    raw_width=rect["raw_w"],
-                    raw_height=rect["raw_h"],
-                    parts=[]
+                new_sheet = self._new_sheet(group, self.boards[group] if self.boards else None)
+                if not self._place(new_sheet, row, options, fits, heuristic):
+                    raise ValueError(f"Part {table.names[row]} too large for sheet")
+                new_sheet.position = len(sheets)
+                sheets.append(new_sheet)
+                candidates.append(new_sheet)
+
+        if progress is not None:
+            progress(len(order), len(order))
+        return sheets
+
+    def _new_sheet(self, group: int, board=None) -> Sheet:
+        """A fresh board for the group: its PartRect sheet size, or the given StockOffer."""
+        material_id, raw_w, raw_h, trim = self.table.groups[group]
+        kerf = to_units(self.kerf)
+        if board is not None:
+            raw_w, raw_h = board.raw_width, board.raw_height
+        sheet = Sheet(
+            width=raw_w - 2 * trim,
+            height=raw_h - 2 * trim,
+            material_id=material_id,
+            raw_width=raw_w,
+            raw_height=raw_h,
+        )
+        sheet.bin = GuillotineBin(to_units(sheet.width, ROUND_FLOOR) + kerf, to_units(sheet.height, ROUND_FLOOR) + kerf)
+        if board is not None:
+            sheet.price = board.price
+        return sheet
+
+    def _prepare_stock(self) -> None:
+        """Stock offers per sheet group, for the groups whose material has any."""
+        table = self.table
+        kerf = to_units(self.kerf)
+        if self.stock is None:
+            self.offers, self.boards = [], []
+            return
+        self.offers = [self.stock.offers(material_id, trim, kerf) for material_id, _, _, trim in table.groups]
+        self.boards = [None] * len(table.groups)
+
+    def _pack_boards(self, order: array, heuristic: str,
+                     progress: Optional[Callable[[int, int], None]] = None) -> List[Sheet]:
+        """
+        _pack with the cheapest mix of stock sizes. Each round opens new
+        sheets of every group in its next offer (cheapest per area first,
+        among those that hold every part of the group), then moves each
+        sheet to the cheapest offer its parts fit on (_downsize). Every
+        group keeps the round where it cost least. A round is skipped for
+        a group when its parts' area alone, at the offer's price per area,
+        already costs more than the group's best.
+        """
+        if not any(self.offers):
+            return self._pack(order, heuristic, progress, self._remnant_stock())
+        table = self.table
+        kerf = to_units(self.kerf)
+        needed = [0] * len(table.groups)
+        largest: List[List[Tuple[int, int]]] = [[] for _ in table.groups]
+        for row in set(order):
+            group = table.group[row]
+            fits = [(w + kerf, h + kerf) for w, h, _ in self._allowed_orientations(table.w_u[row], table.h_u[row], table.grain_codes[row])]
+            largest[group].append(fits)
+        for row in order:
+            needed[table.group[row]] += (table.w_u[row] + kerf) * (table.h_u[row] + kerf)
+        # Offers a whole group can be opened in; a group without any keeps its PartRect size
+        primaries = [
+            [offer for offer in offers if all(offer.holds(fits) for fits in largest[g])] or [None]
+            for g, offers in enumerate(self.offers)
+        ]
+        best_cost: List[Optional[Decimal]] = [None] * len(table.groups)
+        best_round = [0] * len(table.groups)
+        layouts: Dict[Tuple, List[Sheet]] = {}
+        for k in range(max(len(p) for p in primaries)):
+            live = [
+                k < len(p) and p[k] is not None and (
+                    best_cost[g] is None or needed[g] * p[k].price_per_area < best_cost[g]
                 )
-                if not self._guillotine_place(new_sheet, rect):
-                    raise ValueError(f"Part {rect['name']} too large for sheet")
-                self.sheets.append(new_sheet)
+                for g, p in enumerate(primaries)
+            ]
+            if k and not any(live):
+                continue
+            self.boards = [p[min(k, len(p) - 1)] for p in primaries]
+            sheets = self._pack(order, heuristic, progress if k == 0 else None, self._remnant_stock())
+            self._downsize(sheets, heuristic)
+            layouts[tuple(map(id, self.boards))] = sheets
+            for g, cost in enumerate(self._group_costs(sheets)):
+                if (k == 0 or live[g]) and (best_cost[g] is None or cost < best_cost[g]):
+                    best_cost[g], best_round[g] = cost, k
+        self.boards = [p[min(best_round[g], len(p) - 1)] for g, p in enumerate(primaries)]
+        sheets = layouts.get(tuple(map(id, self.boards)))
+        if sheets is None:
+            sheets = self._pack(order, heuristic, None, self._remnant_stock())
+            self._downsize(sheets, heuristic)
+        return sheets
+
+    def _downsize(self, sheets: List[Sheet], heuristic: str) -> None:
+        """Re-cut each stock sheet on the cheapest offer its parts fit on, if cheaper than its own."""
+        table = self.table
+        kerf = to_units(self.kerf)
+        for index, sheet in enumerate(sheets):
+            if sheet.price is None:
+                continue
+            group = table.group[sheet.part_rows[0]]
+            rows = sorted(sheet.part_rows, key=lambda r: table.w_u[r] * table.h_u[r], reverse=True)
+            used = sum((table.w_u[r] + kerf) * (table.h_u[r] + kerf) for r in rows)
+            for offer in sorted(self.offers[group], key=lambda o: o.price):
+                if offer.price >= sheet.price:
+                    break
+                if offer.bin_w * offer.bin_h < used:
+                    continue
+                smaller = self._new_sheet(group, offer)
+                for row in rows:
+                    options = self._allowed_orientations(table.w_u[row], table.h_u[row], table.grain_codes[row])
+                    fits = [(w + kerf, h + kerf) for w, h, _ in options]
+                    if not self._place(smaller, row, options, fits, heuristic):
+                        break
+                else:
+                    smaller.position = sheet.position
+                    sheets[index] = smaller
+                    break
+
+    def _group_costs(self, sheets: List[Sheet]) -> List[Decimal]:
+        costs = [Decimal("0")] * len(self.table.groups)
+        for sheet in sheets:
+            if sheet.price is not None:
+                costs[self.table.group[sheet.part_rows[0]]] += sheet.price
+        return costs
 
-        # Build material report
+    def _remnant_sheet(self, offcut, material_id: int, raw_w: Decimal, raw_h: Decimal) -> Sheet:
+        """An offcut is cut as is: no trim, costed as its share of a full board."""
+        kerf = to_units(self.kerf)
+        width, height = Decimal(str(offcut.width)), Decimal(str(offcut.height))
+        return Sheet(
+            width=width,
+            height=height,
+            material_id=material_id,
+            raw_width=width,
+            raw_height=height,
+            bin=GuillotineBin(to_units(width, ROUND_FLOOR) + kerf, to_units(height, ROUND_FLOOR) + kerf),
+            remnant_id=offcut.id,
+            board_fraction=(width * height) / (raw_w * raw_h),
+        )
+
+    def _offcuts(self) -> List[Dict]:
+        """Free rectangles of every sheet big enough to keep, in mm, less the kerf slot."""
+        kerf = to_units(self.kerf)
+        min_short, min_long = self.min_remnant
+        offcuts = []
+        for index, s in enumerate(self.sheets):
+            for fx, fy, fw, fh in self._free_rects(s):
+                w, h = from_units(fw - kerf), from_units(fh - kerf)
+                if min(w, h) >= min_short and max(w, h) >= min_long:
+                    offcuts.append({
+                        "material_id": s.material_id,
+                        "sheet_index": index,
+                        "x": from_units(fx), "y": from_units(fy),
+                        "w": w, "h": h,
+                    })
+        return offcuts
+
+    def _free_rects(self, sheet: Sheet) -> List[Tuple[int, int, int, int]]:
+        """Free space as (x, y, w, h) in tenth-mm, each grown by one kerf like the bin."""
+        return sheet.bin.free
+
+    def _lower_bound(self) -> int:
+        """Sheets no layout can beat: footprint area over bin area, per sheet group."""
+        table = self.table
+        kerf = to_units(self.kerf)
+        area = [0] * len(table.groups)
+        for row in table.pieces:
+            area[table.group[row]] += (table.w_u[row] + kerf) * (table.h_u[row] + kerf)
+        bound = 0
+        for (_, raw_w, raw_h, trim), needed in zip(table.groups, area):
+            capacity = (
+                (to_units(raw_w - 2 * trim, ROUND_FLOOR) + kerf)
+                * (to_units(raw_h - 2 * trim, ROUND_FLOOR) + kerf)
+            )
+            if needed and capacity > 0:
+                bound += -(-needed // capacity)
+        return bound
+
+    def _cost_lower_bound(self) -> Decimal:
+        """Stock cost no layout can beat: footprint area at each group's cheapest price per area."""
+        table = self.table
+        kerf = to_units(self.kerf)
+        bound = Decimal("0")
+        for row in table.pieces:
+            offers = self.offers[table.group[row]] if self.offers else None
+            if offers:
+                bound += (table.w_u[row] + kerf) * (table.h_u[row] + kerf) * offers[0].price_per_area
+        return bound
+
+    @staticmethod
+    def _layout_score(sheets: List[Sheet]) -> Tuple:
+        """
+        Least stock cost, then fewest new sheets, then least raw board,
+        then the emptiest sheet (the best offcut). Without stock offers
+        every layout costs 0.
+        """
+        cost = sum((s.price for s in sheets if s.price is not None), Decimal("0"))
+        new_sheets = sum(1 for s in sheets if s.remnant_id is None)
+        raw = sum(s.raw_width * s.raw_height for s in sheets)
+        emptiest = min((s.used_units for s in sheets), default=0)
+        return cost, new_sheets, raw, emptiest
+
+    def _search(self, time_budget_ms: float, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        Anytime search: every ordering with every heuristic, then
+        randomized restarts, until the budget is spent or a layout meets
+        the area lower bound. The first run (the plain greedy layout) always
+        completes, so a tiny budget never does worse than no budget.
+        Restarts are seeded, so for the same number of runs the result is
+        the same on every machine.
+        """
+        start = time.perf_counter()
+        deadline = start + time_budget_ms / 1000
+        lower_bound = self._lower_bound()
+        cost_bound = self._cost_lower_bound()
+        rng = random.Random(SEARCH_SEED)
+
+        strategies = [(o, self.heuristic) for o in ORDERINGS] + [
+            (o, h) for o in ORDERINGS for h in HEURISTICS if h != self.heuristic
+        ]
+        best = best_score = best_strategy = None
+        runs = 0
+        stopped = "budget"
+        while True:
+            if runs < len(strategies):
+                ordering, heuristic = strategies[runs]
+                order = self._ordered(ordering)
+                label = {"ordering": ordering, "heuristic": heuristic, "restart": None}
+            else:
+                ordering, heuristic = rng.choice(list(ORDERINGS)), rng.choice(HEURISTICS)
+                order = self._ordered(ordering, rng)
+                label = {"ordering": ordering, "heuristic": heuristic, "restart": runs - len(strategies) + 1}
+            sheets = self._pack_boards(order, heuristic, progress if runs == 0 else None)
+            runs += 1
+            score = self._layout_score(sheets)
+            if best is None or score < best_score:
+                best, best_score, best_strategy = sheets, score, label
+            if best_score[0] <= cost_bound and best_score[1] <= lower_bound:
+                stopped = "lower_bound"
+                break
+            if time.perf_counter() >= deadline:
+                break
+
+        self.sheets = best
         report = self._build_report()
-        # if visualize:
-        #     self._draw_sheets()
+        report["search_stats"] = {
+            "budget_ms": time_budget_ms,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            "runs": runs,
+            "stopped": stopped,
+            "lower_bound_sheets": lower_bound,
+            "best": best_strategy,
+        }
         return report
 
-    def _allowed_orientations(self, rect):
-        if rect["grain"] == "none":
-            return [(rect["w"], rect["h"]), (rect["h"], rect["w"])]
-        elif rect["grain"] == "vertical":
-            return [(rect["w"], rect["h"])]
-        elif rect["grain"] == "horizontal":
-            return [(rect["h"], rect["w"])]
-        return [(rect["w"], rect["h"])]
-
-    def _guillotine_place(self, sheet: Sheet, rect: Dict) -> Optional[Tuple[Decimal, Decimal]]:
-        """Basic guillotine placement: top-left first"""
-        # empty sheet
-        if not sheet.parts:
-            sheet.parts.append({
-                "name": rect["name"], "x": Decimal(0), "y": Decimal(0),
-                "w": rect["w"], "h": rect["h"], "grain": rect["grain"]
+    @staticmethod
+    def _allowed_orientations(w_u: int, h_u: int, grain_code: int) -> List[Tuple[int, int, bool]]:
+        """(width, height, rotated) in tenth-mm."""
+        upright = (w_u, h_u, False)
+        turned = (h_u, w_u, True)
+        if grain_code == GRAIN_NONE:
+            return [upright, turned] if w_u != h_u else [upright]
+        elif grain_code == GRAIN_HORIZONTAL:
+            return [turned]
+        return [upright]
+
+    @staticmethod
+    def _place(sheet: Sheet, row: int, orientations, footprints, heuristic: str) -> bool:
+        fit = sheet.bin.find(footprints, heuristic)
+        if fit is None:
+            return False
+        _, index, o = fit
+        fw, fh = footprints[o]
+        x, y = sheet.bin.place(index, fw, fh)
+        w, h, rotated = orientations[o]
+        sheet.add(row, x, y, rotated, w * h)
+        return True
+
+    def _sheet_parts(self, sheet: Sheet) -> List[Dict]:
+        table = self.table
+        parts = []
+        for row, x, y, rotated in zip(sheet.part_rows, sheet.xs, sheet.ys, sheet.rotated):
+            w, h = (table.heights[row], table.widths[row]) if rotated else (table.widths[row], table.heights[row])
+            parts.append({
+                "name": table.names[row], "x": from_units(x), "y": from_units(y),
+                "w": w, "h": h, "grain": table.grains[row], "rotated": bool(rotated),
             })
-            sheet.used_area += rect["w"] * rect["h"]
-            return 0, 0
-
-        # try existing free spaces (simplified)
-        free_rects = self._compute_free_rects(sheet)
-        for fx, fy, fw, fh in free_rects:
-            for ow, oh in self._allowed_orientations(rect):
-                if ow <= fw and oh <= fh:
-                    sheet.parts.append({
-                        "name": rect["name"], "x": fx, "y": fy,
-                        "w": ow, "h": oh, "grain": rect["grain"]
-                    })
-                    sheet.used_area += ow * oh
-                    return fx, fy
-        return None
-
-    def _compute_free_rects(self, sheet: Sheet) -> List[Tuple[Decimal, Decimal, Decimal, Decimal]]:
-        """Compute available rectangles on sheet (simplified guillotine)"""
-        free = [(Decimal(0), Decimal(0), sheet.width, sheet.height)]
-        for p in sheet.parts:
-            new_free = []
-            for fx, fy, fw, fh in free:
-                # subtract occupied rectangle (p)
-                if not (p["x"] >= fx+fw or p["x"]+p["w"] <= fx or
-                        p["y"] >= fy+fh or p["y"]+p["h"] <= fy):
-                    # Split free rect into up to 2 (right and bottom)
-                    right_w = fx+fw - (p["x"]+p["w"])
-                    if right_w > 0:
-                        new_free.append((p["x"]+p["w"], fy, right_w, fh))
-                    bottom_h = fy+fh - (p["y"]+p["h"])
-                    if bottom_h > 0:
-                        new_free.append((fx, p["y"]+p["h"], fw, bottom_h))
-                else:
-                    new_free.append((fx, fy, fw, fh))
-            free = new_free
-        return free
+        return parts
+
+    def _used_area(self, sheet: Sheet) -> Decimal:
+        """Exact placed area in mm², from the parts' own sizes rather than tenth-mm."""
+        areas = self.table.areas
+        return sum((areas[row] for row in sheet.part_rows), Decimal("0"))
 
     def _build_report(self) -> Dict:
-        total_used = sum(s.used_area for s in self.sheets)
+        used_areas = [self._used_area(s) for s in self.sheets]
+        total_used = sum(used_areas)
         total_raw = sum(s.raw_width*s.raw_height for s in self.sheets)
+        total_waste = float(((1 - total_used/total_raw)*100).quantize(Decimal("0.01"))) if total_raw else 0
         return {
             "sheets": [{
                 "material_id": s.material_id,
                 "raw_dims": {"w": float(s.raw_width), "h": float(s.raw_height)},
                 "usable_dims": {"w": float(s.width), "h": float(s.height)},
-                "used_area": float(s.used_area),
-                "waste_percent": float(((1 - s.used_area/(s.raw_width*s.raw_height))*100).quantize(Decimal("0.01"))),
-                "parts": s.parts
-            } for s in self.sheets],
-            "total_sheets": len(self.sheets),
-            "total_waste_avg": float(((1 - total_used/total_raw)*100).quantize(Decimal("0.01"))) if total_raw else 0
+                "used_area": float(used),
+                "waste_percent": float(((1 - used/(s.raw_width*s.raw_height))*100).quantize(Decimal("0.01"))),
+                "remnant_id": s.remnant_id,
+                "parts": self._sheet_parts(s),
+            } for s, used in zip(self.sheets, used_areas)],
+            # New boards only; offcuts taken from stock are listed apart
+            "total_sheets": sum(1 for s in self.sheets if s.remnant_id is None),
+            "materials": self._material_summary(used_areas),
+            "remnants_used": [s.remnant_id for s in self.sheets if s.remnant_id is not None],
+            "offcuts": self._offcuts(),
+            "total_waste_avg": total_waste,
+            # Name read by pricing, waste costing and the output templates
+            "total_waste_percent": total_waste,
         }
 
+    def _material_summary(self, used_areas: List[Decimal]) -> List[Dict]:
+        """
+        Sheet count and waste per material and sheet size, in first-use
+        order. Offcuts from stock form their own groups; "boards" is what
+        a group costs in full boards.
+        """
+        groups: Dict[Tuple, List[Tuple[Sheet, Decimal]]] = {}
+        for s, used in zip(self.sheets, used_areas):
+            groups.setdefault((s.material_id, s.raw_width, s.raw_height, s.remnant_id is not None, s.price), []).append((s, used))
+        summary = []
+        for (material_id, raw_w, raw_h, remnant, price), sheets in groups.items():
+            used = sum(u for _, u in sheets)
+            raw = raw_w * raw_h * len(sheets)
+            summary.append({
+                "material_id": material_id,
+                "raw_dims": {"w": float(raw_w), "h": float(raw_h)},
+                "remnant": remnant,
+                "sheets": len(sheets),
+                "boards": float(sum(s.board_fraction for s, _ in sheets)),
+                # Price of one of these boards when picked from stock offers
+                "sheet_price": price,
+                "used_area": float(used),
+                "waste_percent": float(((1 - used/raw)*100).quantize(Decimal("0.01"))) if raw else 0,
+            })
+        return summary
+
     # def _draw_sheets(self):
     #     """Draw each sheet with parts using matplotlib"""
     #     for i, s in enumerate(self.sheets):
@@ -162,7 +731,7 @@ class CutlistOptimizer:
     #         ax.set_title(f"Sheet {i+1} - Material {s.material_id}")
     #         ax.set_xlim(0, float(s.width))
     #         ax.set_ylim(0, float(s.height))
-    #         for p in s.parts:
+    #         for p in self._sheet_parts(s):
     #             rect = plt.Rectangle((float(p["x"]), float(p["y"])), float(p["w"]), float(p["h"]),
     #                                  edgecolor="black", facecolor="lightblue" if p["grain"]=="none" else "lightgreen")
     #             ax.add_patch(rect)
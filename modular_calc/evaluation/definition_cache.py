@@ -0,0 +1,158 @@
+# modular_calc/evaluation/definition_cache.py
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from modular_calc.models import TenantCatalogueVersion
+
+from .expression_cache import CompiledExpression, compile_expression
+from .product_graph import ProductGraph, ProductGraphLoader, TemplateNode, WhitelistNode
+
+# Template columns holding equations, in evaluation order
+TEMPLATE_EQUATIONS = ("part_length_equation", "part_width_equation", "part_qty_equation", "param1_eq", "param2_eq")
+RULE_EQUATIONS = ("quantity_equation", "applicability_condition")
+
+
+@dataclass
+class CompiledProductDefinition:
+    """
+    Everything the engine needs about one version of a ModularProduct:
+    the loaded graph plus its equations already parsed and its default
+    material / edgeband choices resolved. catalogue_version is the
+    tenant's TenantCatalogueVersion the graph's boards were read at.
+    """
+    product_id: Any
+    tenant_id: Any
+    version: Any
+    graph: ProductGraph
+    catalogue_version: int = 0
+    equations: Dict[Any, Dict[str, CompiledExpression]] = field(default_factory=dict)
+    evaluation_order: List[Any] = field(default_factory=list)
+    default_links: Dict[Any, Optional[WhitelistNode]] = field(default_factory=dict)
+    default_edgebands: Dict[Any, Any] = field(default_factory=dict)
+    parameter_defaults: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def hardware_rules(self) -> List[Any]:
+        return self.graph.hardware_rules
+
+    @classmethod
+    def build(cls, product, catalogue_version: int = 0) -> "CompiledProductDefinition":
+        graph = ProductGraphLoader(product).load()
+        product = graph.product
+
+        equations = {}
+        default_links = {}
+        default_edgebands = {}
+        for node in graph.templates:
+            equations[node.id] = cls._compile(node.template, TEMPLATE_EQUATIONS)
+            for rule in node.hardware_rules:
+                cls._compile(rule, RULE_EQUATIONS)
+            link = node.default_link() or node.first_link()
+            default_links[node.id] = link
+            default_edgebands[node.id] = link.edgeband_option() if link else None
+        for rule in graph.hardware_rules:
+            cls._compile(rule, RULE_EQUATIONS)
+
+        return cls(
+            product_id=product.pk,
+            tenant_id=product.tenant_id,
+            version=product.updated_at,
+            graph=graph,
+            catalogue_version=catalogue_version,
+            equations=equations,
+            evaluation_order=graph.evaluation_plan().order,
+            default_links=default_links,
+            default_edgebands=default_edgebands,
+            parameter_defaults={p.abbreviation: p.default_value for p in graph.parameters},
+        )
+
+    @staticmethod
+    def _compile(obj, fields) -> Dict[str, CompiledExpression]:
+        compiled = {}
+        for name in fields:
+            expr = getattr(obj, name, None)
+            if expr and str(expr).strip():
+                compiled[name] = compile_expression(expr)
+        return compiled
+
+    def template(self, template_id) -> Optional[TemplateNode]:
+        return self.graph.template(template_id)
+
+
+class ProductDefinitionCache:
+    """
+    Bounded LRU of CompiledProductDefinition keyed by (tenant, product).
+    An entry is only served while its version matches the product's
+    updated_at and the tenant's catalogue version, so a definition or a
+    board edited in another process is rebuilt on the next lookup (at
+    the cost of one small query per lookup); in-process edits also evict
+    through signals.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Any, Any], CompiledProductDefinition]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, product) -> CompiledProductDefinition:
+        """Return the definition for a ModularProduct instance, building it on a miss."""
+        key = (product.tenant_id, product.pk)
+        # Read before a build, so a catalogue edit made during it retires the entry
+        catalogue_version = TenantCatalogueVersion.current(product.tenant_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry.version == product.updated_at
+                and entry.catalogue_version == catalogue_version
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = CompiledProductDefinition.build(product, catalogue_version=catalogue_version)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_product(self, product_id) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == product_id]:
+                del self._entries[key]
+
+    def invalidate_tenant(self, tenant_id) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == tenant_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, product_id) -> bool:
+        return any(k[1] == product_id for k in self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# Process-wide cache shared by the configurator and quoting
+definition_cache = ProductDefinitionCache()
+
+
+def get_product_definition(product) -> CompiledProductDefinition:
+    return definition_cache.get(product)
@@ -1,7 +1,8 @@
 #modular_calc/evaluation/evaluator.py
 from asteval import Interpreter
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from .expression_cache import compile_expression
 
 _ALLOWED_NAMES = {
     "min": min,
@@ -11,7 +12,43 @@ _ALLOWED_NAMES = {
 }
 
 class ExpressionEvaluator:
-    def __init__(self, context: Dict[str, Any]):
+    """
+    asteval-backed evaluator. The Interpreter is built once per instance;
+    bind() swaps the variable set in place so one evaluator can serve every
+    hardware rule of an engine run.
+    """
+
+    def __init__(self, context: Optional[Dict[str, Any]] = None):
+        self._aeval = Interpreter(usersyms=dict(_ALLOWED_NAMES), minimal=True)
+        # Symbols present before any user context; restored on rebind
+        self._base_symbols = dict(self._aeval.symtable)
+        self._source = None
+        # Shallow copy of the dict last bound, to notice it was mutated
+        self._snapshot = None
+        self.context = {}
+        if context is not None:
+            self.bind(context)
+
+    def bind(self, context: Dict[str, Any]) -> "ExpressionEvaluator":
+        """
+        Replace the variables visible to expressions. Returns self.
+        Rebinding the same dict with the same contents is a no-op; a dict
+        changed in place since the last bind is resynced.
+        """
+        if context is self._source and context == self._snapshot:
+            return self
+
+        # Back to the base symbols: drops the old context and anything an
+        # expression assigned (x = 5), and restores shadowed builtins
+        symtable = self._aeval.symtable
+        for key in [k for k in symtable if k not in self._base_symbols]:
+            del symtable[key]
+        for key, value in self._base_symbols.items():
+            if symtable.get(key) is not value:
+                symtable[key] = value
+        # asteval keeps every parsed tree for error reporting
+        self._aeval.code_text.clear()
+
         # Convert Decimals to Floats for asteval compatibility
         # and ensure all keys are strictly lowercase
         self.context = {}
@@ -19,21 +56,28 @@ class ExpressionEvaluator:
             val = float(v) if isinstance(v, (Decimal, float, int)) else v
             self.context[k.lower()] = val
 
+        symtable.update(self.context)
+        self._source = context
+        self._snapshot = dict(context)
+        return self
+
     def eval(self, expr: str) -> Any:
         if not expr:
             return None
-            
+
         # 1. Standardize expression
         clean_expr = expr.lower().strip()
-        
-        # 2. Initialize Interpreter with our context as the initial symtable
-        # This is more reliable than updating symtable later
-        aeval = Interpreter(usersyms={**_ALLOWED_NAMES, **self.context}, minimal=True)
-        result = aeval(clean_expr)
-        
-        if len(aeval.error) > 0:
+
+        # 2. Run the cached AST against the bound symbol table
+        try:
+            tree = compile_expression(clean_expr).tree
+        except (SyntaxError, ValueError) as e:
+            raise ValueError(f"Eval error for '{clean_expr}': {e}")
+        result = self._aeval.eval(tree, show_errors=False)
+
+        if len(self._aeval.error) > 0:
             # Grab the specific error details
-            err = aeval.error[0]
+            err = self._aeval.error[0]
             raise ValueError(f"Eval error for '{clean_expr}': {err.msg}")
-            
-        return result
\ No newline at end of file
+
+        return result
@@ -0,0 +1,205 @@
+# modular_calc/evaluation/expression_cache.py
+import ast
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+DEFAULT_MAXSIZE = 4096
+
+# Node types the vector rewrite understands. Anything else (attribute
+# access, subscripts, lambdas, comprehensions...) marks the equation
+# unsupported: the scalar evaluators still run it exactly as they did
+# before equations were cached, only array evaluation refuses it.
+_ALLOWED_NODES: Tuple[type, ...] = (
+    ast.Expression, ast.Module, ast.Expr,
+    ast.Constant, ast.Name, ast.Load,
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.keyword, ast.Tuple, ast.List,
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+
+class CompiledExpression:
+    """
+    One parsed equation. Holds the Python code object used by
+    ExpressionContext / safe_eval and the module AST used by asteval.
+    Both forms are built lazily and only once per process, from the same
+    source those evaluators parsed themselves before, so they accept the
+    same equations. unsupported says why the equation falls outside
+    _ALLOWED_NODES (None when it does not).
+    """
+
+    __slots__ = ("source", "unsupported", "_code", "_tree", "_vector_code", "_lock")
+
+    def __init__(self, source: str):
+        self.source = source
+        self._code = None
+        self._tree = None
+        self._vector_code = None
+        self._lock = threading.Lock()
+        self.unsupported = _unsupported(source)
+
+    @property
+    def code(self):
+        if self._code is None:
+            with self._lock:
+                if self._code is None:
+                    self._code = compile(self.source, "<expression>", "eval")
+        return self._code
+
+    @property
+    def tree(self) -> ast.Module:
+        """Statement-mode AST, the shape asteval.Interpreter.run() expects."""
+        if self._tree is None:
+            with self._lock:
+                if self._tree is None:
+                    self._tree = ast.fix_missing_locations(ast.parse(self.source))
+        return self._tree
+
+    @property
+    def vector_code(self):
+        """
+        Code object for array evaluation (VectorExpressionContext): 'x if c
+        else y', 'and' / 'or' / 'not' and chained comparisons are rewritten
+        to element-wise helpers, since arrays have no single truth value.
+        Raises ValueError for an unsupported equation.
+        """
+        if self.unsupported:
+            raise ValueError(self.unsupported)
+        if self._vector_code is None:
+            with self._lock:
+                if self._vector_code is None:
+                    tree = _VectorRewriter().visit(ast.parse(self.source, mode="eval"))
+                    self._vector_code = compile(ast.fix_missing_locations(tree), "<vector-expression>", "eval")
+        return self._vector_code
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return self.code.co_names
+
+
+def _call(name: str, *args: ast.expr) -> ast.Call:
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=list(args), keywords=[])
+
+
+class _VectorRewriter(ast.NodeTransformer):
+    """Maps scalar control flow onto the _where/_and/_or/_not helpers."""
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _call("_where", node.test, node.body, node.orelse)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        helper = "_and" if isinstance(node.op, ast.And) else "_or"
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = _call(helper, result, value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call("_not", node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        # a < b < c  ->  _and(a < b, b < c)
+        operands = [node.left] + node.comparators
+        pairs = [
+            ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        result = pairs[0]
+        for pair in pairs[1:]:
+            result = _call("_and", result, pair)
+        return result
+
+
+def _unsupported(source: str) -> Optional[str]:
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        return f"Invalid syntax in '{source}': {e.msg}"
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            return f"Unsupported syntax '{type(node).__name__}' in '{source}'"
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Name):
+            return f"Only plain function calls are allowed in '{source}'"
+    return None
+
+
+class ExpressionCache:
+    """
+    Process-wide LRU of compiled equations, keyed by expression text.
+    Shared by ExpressionContext, ExpressionEvaluator (asteval),
+    HardwareEvaluator and safe_eval so each equation is parsed once.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CompiledExpression]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, expression: str) -> CompiledExpression:
+        key = str(expression).strip()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Compile outside the lock; a race only costs a duplicate parse.
+        entry = CompiledExpression(key)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *expressions: Optional[str]) -> None:
+        """
+        Drop specific equations (None / blanks are ignored), under both the
+        stored text and the lower-cased key ExpressionEvaluator compiles.
+        """
+        with self._lock:
+            for expr in expressions:
+                if expr:
+                    key = str(expr).strip()
+                    self._entries.pop(key, None)
+                    self._entries.pop(key.lower(), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, expression: str) -> bool:
+        return str(expression).strip() in self._entries
+
+    def stats(self) -> dict:
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+expression_cache = ExpressionCache()
+
+
+def compile_expression(expression: str) -> CompiledExpression:
+    """Shortcut for the shared cache."""
+    return expression_cache.get(expression)
+
+
+def invalidate_expressions(expressions: Iterable[Optional[str]]) -> None:
+    expression_cache.invalidate(*expressions)
@@ -1,5 +1,5 @@
 #modular_calc/evaluation/hardware_evaluator.py
-from typing import Dict
+from typing import Dict, Optional
 from .evaluator import ExpressionEvaluator
 from .context import ProductContext, to_decimal
 from decimal import Decimal
@@ -7,9 +7,14 @@ from decimal import Decimal
 class HardwareEvaluator:
     """Evaluate hardware quantity per part or product using MAX logic."""
 
-    def __init__(self, hardware_rule, context: Dict[str, Decimal]):
+    def __init__(self, hardware_rule, context: Dict[str, Decimal], evaluator: Optional[ExpressionEvaluator] = None):
         self.hardware_rule = hardware_rule
-        self.evaluator = ExpressionEvaluator(context)
+        # Reuse the engine-run evaluator when given; avoids one asteval
+        # Interpreter per rule.
+        if evaluator is not None:
+            self.evaluator = evaluator.bind(context)
+        else:
+            self.evaluator = ExpressionEvaluator(context)
 
     def evaluate(self) -> Dict[str, Decimal] | None:
         base_qty = self.evaluator.eval(self.hardware_rule.quantity_equation) or 0
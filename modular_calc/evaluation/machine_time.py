@@ -0,0 +1,246 @@
+# modular_calc/evaluation/machine_time.py
+from dataclasses import dataclass, fields
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+TWO_PLACES = Decimal("0.01")
+# Waste thinner than this goes to dust in the kerf; it takes no cut of its own
+MIN_WASTE_MM = Decimal("1")
+
+
+@dataclass(frozen=True)
+class MachineRates:
+    """
+    Shop-floor rates behind the time estimate; settings.MODULAR_CALC_MACHINE_RATES
+    overrides them with the same names upper-cased. The costs per hour
+    price machine time into sheet CP; at 0 the time is reported only.
+    """
+    saw_feed_m_per_min: float = 20.0
+    saw_cycle_s: float = 6.0  # position the fence, start the cut, return
+    rotation_s: float = 12.0  # turn a panel through 90°
+    handling_s: float = 10.0  # load a board, re-feed a strip or take a part off
+    edgebander_feed_m_per_min: float = 12.0
+    edge_feed_s: float = 5.0  # present one edge to the edgebander
+    saw_cost_per_hour: float = 0.0
+    edgebander_cost_per_hour: float = 0.0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "MachineRates":
+        if config is None:
+            config = _configured()
+        return cls(**{f.name: float(config[f.name.upper()]) for f in fields(cls) if f.name.upper() in config})
+
+
+def _configured() -> Dict[str, Any]:
+    """settings.MODULAR_CALC_MACHINE_RATES when running under Django, else defaults."""
+    try:
+        from django.conf import settings
+    except ImportError:
+        return {}
+    if not settings.configured:
+        return {}
+    return getattr(settings, "MODULAR_CALC_MACHINE_RATES", {})
+
+
+class SheetCuts:
+    """
+    Guillotine cuts of one sheet, found by splitting the sheet at every
+    cut that runs right through it, then each strip the other way, and
+    so on. Edges of neighbouring parts one kerf apart are one cut, so
+    duplicate edges never count twice. Cuts through waste to free a part
+    are included; the edge trim of a new board is too.
+    """
+
+    def __init__(self, sheet: Dict, kerf: Decimal):
+        self.kerf = kerf
+        # Cut lines: (along, at, start, end); along "y" is a cut parallel to the y axis at x=at
+        self.lines: List[Tuple[str, Decimal, Decimal, Decimal]] = []
+        self.rotations = 0
+        # Strips and blocks put back on the saw after a cut
+        self.refeeds = 0
+        self.non_guillotine = False
+
+        rects = [
+            (Decimal(str(p["x"])), Decimal(str(p["y"])), Decimal(str(p["w"])), Decimal(str(p["h"])))
+            for p in sheet.get("parts", [])
+        ]
+        width = Decimal(str(sheet["usable_dims"]["w"]))
+        height = Decimal(str(sheet["usable_dims"]["h"]))
+        raw_w, raw_h = Decimal(str(sheet["raw_dims"]["w"])), Decimal(str(sheet["raw_dims"]["h"]))
+        if raw_w > width or raw_h > height:
+            trim_x, trim_y = (raw_w - width) / 2, (raw_h - height) / 2
+            self.lines += [
+                ("y", -trim_x, -trim_y, height + trim_y), ("y", width, -trim_y, height + trim_y),
+                ("x", -trim_y, -trim_x, width + trim_x), ("x", height, -trim_x, width + trim_x),
+            ]
+            self.rotations += 1
+        if rects:
+            self._split(rects, (Decimal("0"), Decimal("0"), width, height), None)
+
+    @staticmethod
+    def _groups(rects, axis: str, kerf: Decimal):
+        """Rects in runs along the axis that a through cut can separate, with each run's extent."""
+        lo = 0 if axis == "x" else 1
+        size = lo + 2
+        ordered = sorted(rects, key=lambda r: r[lo])
+        groups = []
+        for r in ordered:
+            if groups and r[lo] < groups[-1][2] + kerf:
+                group = groups[-1]
+                group[0].append(r)
+                group[2] = max(group[2], r[lo] + r[size])
+            else:
+                groups.append([[r], r[lo], r[lo] + r[size]])
+        return groups
+
+    def _cut(self, axis: str, at: Decimal, region) -> None:
+        x0, y0, x1, y1 = region
+        # Cuts across x (at an x position) run along y
+        if axis == "x":
+            self.lines.append(("y", at, y0, y1))
+        else:
+            self.lines.append(("x", at, x0, x1))
+
+    def _split(self, rects, region, parent_axis: Optional[str]) -> None:
+        x0, y0, x1, y1 = region
+        axes = ("x", "y") if parent_axis is None else ("y", "x") if parent_axis == "x" else ("x", "y")
+        if parent_axis is None and (y1 - y0) > (x1 - x0):
+            axes = ("y", "x")
+        # Of the directions with a through cut, take the one leaving fewest pieces to re-feed
+        candidates = []
+        for rank, axis in enumerate(axes):
+            groups = self._groups(rects, axis, self.kerf)
+            start, end = (x0, x1) if axis == "x" else (y0, y1)
+            if len(groups) > 1 or groups[0][1] - start >= MIN_WASTE_MM or end - groups[0][2] >= MIN_WASTE_MM:
+                candidates.append((len(groups), rank, axis, groups, start, end))
+        if candidates:
+            _, _, axis, groups, start, end = min(candidates, key=lambda c: c[:2])
+            if parent_axis is not None and axis != parent_axis:
+                self.rotations += 1
+            if groups[0][1] - start >= MIN_WASTE_MM:
+                self._cut(axis, groups[0][1] - self.kerf, region)
+            for i, (members, g_start, g_end) in enumerate(groups):
+                if i + 1 < len(groups):
+                    self._cut(axis, g_end, region)
+                    following = groups[i + 1][1]
+                    if following - (g_end + self.kerf) >= MIN_WASTE_MM:
+                        self._cut(axis, following - self.kerf, region)
+                elif end - g_end >= MIN_WASTE_MM:
+                    self._cut(axis, g_end, region)
+                sub = (g_start, y0, g_end, y1) if axis == "x" else (x0, g_start, x1, g_end)
+                if len(members) > 1 or self._has_waste(members[0], sub):
+                    self.refeeds += 1
+                    self._split(members, sub, axis)
+            return
+        if len(rects) > 1:
+            # No through cut in either direction: each part is cut out on its own
+            self.non_guillotine = True
+            for x, y, w, h in rects:
+                self.lines += [("y", x - self.kerf, y, y + h), ("y", x + w, y, y + h), ("x", y - self.kerf, x, x + w), ("x", y + h, x, x + w)]
+
+    @staticmethod
+    def _has_waste(rect, region) -> bool:
+        x, y, w, h = rect
+        x0, y0, x1, y1 = region
+        return x - x0 >= MIN_WASTE_MM or y - y0 >= MIN_WASTE_MM or x1 - (x + w) >= MIN_WASTE_MM or y1 - (y + h) >= MIN_WASTE_MM
+
+    @property
+    def length(self) -> Decimal:
+        return sum((end - start for _, _, start, end in self.lines), Decimal("0"))
+
+
+class MachineTimeEstimator:
+    """
+    Saw and edgebander time for a cutlist report (CutlistOptimizer or
+    StripCutlistOptimizer) and the BOM parts cut from it. Saw time is
+    per cut, per metre cut, per panel rotation and per handling move
+    (board loads, strips re-fed, parts taken off); edgebander time is per
+    metre banded and per edge fed. Times are seconds.
+    """
+
+    def __init__(self, kerf_mm: float = 3.0, rates: Optional[MachineRates] = None):
+        self.kerf = Decimal(str(kerf_mm))
+        self.rates = rates or MachineRates.from_config()
+
+    def estimate(self, cutlist: Optional[Dict], parts: Iterable[Dict] = (), cut_lines: bool = False) -> Dict:
+        """
+        `parts` are BOM parts carrying "running_metrics" (total_eb_mm,
+        eb_edges, edgeband_id). With cut_lines, each sheet lists its cuts.
+        """
+        rates = self.rates
+        saw_feed = Decimal(str(rates.saw_feed_m_per_min)) * 1000 / 60  # mm/s
+        sheets = []
+        for index, sheet in enumerate((cutlist or {}).get("sheets", [])):
+            cuts = SheetCuts(sheet, self.kerf)
+            handling = 1 + cuts.refeeds + len(sheet.get("parts", []))
+            seconds = (
+                len(cuts.lines) * Decimal(str(rates.saw_cycle_s))
+                + (cuts.length / saw_feed if saw_feed else Decimal("0"))
+                + cuts.rotations * Decimal(str(rates.rotation_s))
+                + handling * Decimal(str(rates.handling_s))
+            )
+            row = {
+                "sheet_index": index,
+                "cuts": len(cuts.lines),
+                "cut_length_m": float((cuts.length / 1000).quantize(TWO_PLACES)),
+                "rotations": cuts.rotations,
+                "handling_ops": handling,
+                "non_guillotine": cuts.non_guillotine,
+                "seconds": float(seconds.quantize(TWO_PLACES)),
+            }
+            if cut_lines:
+                row["cut_lines"] = [
+                    {"along": along, "at": float(at), "start": float(start), "end": float(end)}
+                    for along, at, start, end in cuts.lines
+                ]
+            sheets.append(row)
+
+        saw_seconds = sum((Decimal(str(s["seconds"])) for s in sheets), Decimal("0"))
+        edgebanding = self._edgebanding(parts)
+        eb_seconds = Decimal(str(edgebanding["seconds"]))
+        labour = (
+            saw_seconds * Decimal(str(rates.saw_cost_per_hour))
+            + eb_seconds * Decimal(str(rates.edgebander_cost_per_hour))
+        ) / 3600
+        return {
+            "saw": {
+                "sheets": len(sheets),
+                "cuts": sum(s["cuts"] for s in sheets),
+                "cut_length_m": float(sum(Decimal(str(s["cut_length_m"])) for s in sheets)),
+                "rotations": sum(s["rotations"] for s in sheets),
+                "handling_ops": sum(s["handling_ops"] for s in sheets),
+                "seconds": float(saw_seconds),
+            },
+            "edgebanding": edgebanding,
+            "total_seconds": float(saw_seconds + eb_seconds),
+            "labour_cp": labour.quantize(TWO_PLACES),
+            "sheets": sheets,
+        }
+
+    def _edgebanding(self, parts: Iterable[Dict]) -> Dict:
+        feed = Decimal(str(self.rates.edgebander_feed_m_per_min)) * 1000 / 60  # mm/s
+        edge_s = Decimal(str(self.rates.edge_feed_s))
+        by_band: Dict[Any, List[Decimal]] = {}
+        for p in parts:
+            metrics = p.get("running_metrics") or {}
+            run = Decimal(str(metrics.get("total_eb_mm", 0)))
+            if not run:
+                continue
+            totals = by_band.setdefault(metrics.get("edgeband_id"), [Decimal("0"), Decimal("0")])
+            totals[0] += run
+            totals[1] += Decimal(str(metrics.get("eb_edges", 0)))
+        materials = []
+        for edgeband_id, (run, edges) in by_band.items():
+            seconds = (run / feed if feed else Decimal("0")) + edges * edge_s
+            materials.append({
+                "edgeband_id": edgeband_id,
+                "run_m": float((run / 1000).quantize(TWO_PLACES)),
+                "edges": int(edges),
+                "seconds": float(seconds.quantize(TWO_PLACES)),
+            })
+        return {
+            "materials": materials,
+            "run_m": float(sum(Decimal(str(m["run_m"])) for m in materials)),
+            "edges": sum(m["edges"] for m in materials),
+            "seconds": float(sum((Decimal(str(m["seconds"])) for m in materials), Decimal("0"))),
+        }
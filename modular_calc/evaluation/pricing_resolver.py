@@ -1,5 +1,5 @@
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 class PricingResolver:
@@ -10,12 +10,17 @@ class PricingResolver:
     - ONLY aggregates and presents pricing views
     """
 
-    def __init__(self, bom: dict, cost_calculator, cutlist: dict, sheet_price: Decimal,quantity: int = 1):
+    def __init__(self, bom: dict, cost_calculator, cutlist: dict, sheet_price: Decimal,quantity: int = 1,
+                 sheet_prices: Optional[Dict[Any, Decimal]] = None, machine_time: Optional[Dict[str, Any]] = None):
         self.bom = bom
         self.cost_calculator = cost_calculator
         self.cutlist = cutlist
         self.sheet_price = Decimal(sheet_price or 0)
+        # Panel price per material id; boards not listed cost sheet_price
+        self.sheet_prices = {k: Decimal(str(v)) for k, v in (sheet_prices or {}).items()}
         self.quantity = int(quantity)
+        # MachineTimeEstimator output; its labour_cp is part of sheet CP
+        self.machine_time = machine_time
         self.pricing = {
             "material_cost": 0.0,
             "hardware_cost": 0.0,
@@ -41,6 +46,23 @@ class PricingResolver:
         unit_sp = sum(Decimal(str(p.get("sell_price", 0))) for p in parts)
         return unit_sp * Decimal(str(self.quantity))
 
+    def _group_sheet_price(self, group: dict) -> Decimal:
+        """Boards picked from stock offers carry their own price; others cost the material's panel price."""
+        if group.get("sheet_price") is not None:
+            return Decimal(str(group["sheet_price"]))
+        return self.sheet_prices.get(group["material_id"], self.sheet_price)
+
+    def _sheet_cost(self) -> Decimal:
+        groups = self.cutlist.get("materials")
+        if not groups:
+            total_sheets = Decimal(str(self.cutlist.get("total_sheets", 0)))
+            return total_sheets * self.sheet_price
+        # Offcuts from stock cost their share of a board ("boards")
+        return sum(
+            (Decimal(str(g.get("boards", g["sheets"]))) * self._group_sheet_price(g) for g in groups),
+            Decimal("0"),
+        )
+
     # -------------------------
     # Pricing Views
     # -------------------------
@@ -65,7 +87,8 @@ class PricingResolver:
         self._ensure_calculated()
         total_sheets = Decimal(str(self.cutlist.get("total_sheets", 0)))
         hw_cost = sum(Decimal(str(h.get("cp", 0))) for h in self.cost_calculator.hardware_costs or [])
-        sheet_batch_cp = (total_sheets * self.sheet_price) + (hw_cost * Decimal(str(self.quantity)))
+        labour_cp = Decimal(str((self.machine_time or {}).get("labour_cp", 0)))
+        sheet_batch_cp = self._sheet_cost() + (hw_cost * Decimal(str(self.quantity))) + labour_cp
         batch_sp = self._sum_part_sell_price()
         
 
@@ -75,6 +98,28 @@ class PricingResolver:
             "sp": batch_sp.quantize(Decimal("1.00")),
             "total_sheets": int(total_sheets),
             "waste_percent": self.cutlist.get("total_waste_percent"),
+            "labour": self._labour(labour_cp),
+            "materials": [
+                {
+                    "material_id": g["material_id"],
+                    "sheets": g["sheets"],
+                    "remnant": g.get("remnant", False),
+                    "boards": g.get("boards", g["sheets"]),
+                    "raw_dims": g.get("raw_dims"),
+                    "sheet_price": self._group_sheet_price(g).quantize(Decimal("1.00")),
+                    "waste_percent": g["waste_percent"],
+                }
+                for g in self.cutlist.get("materials", [])
+            ],
+        }
+
+    def _labour(self, labour_cp: Decimal) -> Optional[Dict[str, Any]]:
+        if not self.machine_time:
+            return None
+        return {
+            "cp": labour_cp.quantize(Decimal("1.00")),
+            "saw_seconds": self.machine_time["saw"]["seconds"],
+            "edgebanding_seconds": self.machine_time["edgebanding"]["seconds"],
         }
 
     # -------------------------
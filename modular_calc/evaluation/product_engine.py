@@ -1,11 +1,16 @@
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple, Any
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from modular_calc.evaluation.geometry_validator import GeometryValidator, GeometryValidationError
 from .bom_builder import BOMBuilder
 from .cost_calculator import CostCalculator
 from modular_calc.evaluation.cutlist_optimizer import PartRect, CutlistOptimizer
+from .cutlist_cache import cutlist_cache
+from .machine_time import MachineTimeEstimator
 from .pricing_resolver import PricingResolver
-from .context import ProductContext
+from .context import ProductContext, VectorExpressionContext, np
+from .product_graph import ProductGraphLoader
+from .batch import configure_payload
 
 class ProductEngine:
     def __init__(self, engine_payload: Dict[str, Any]):
@@ -15,6 +20,25 @@ class ProductEngine:
         self.quantities = engine_payload.get("quantities", [1])
         self.selected_material = engine_payload.get("selected_material")
         self.material_selections = engine_payload.get("material_selections", {})
+        # None packs once, greedily; a budget runs the anytime cutlist search
+        self.cutlist_budget_ms = engine_payload.get("cutlist_budget_ms")
+        # Optional RemnantStore: offcuts in stock are cut before new boards
+        self.remnants = engine_payload.get("remnants")
+        # Optional StockCatalog: boards are bought in the cheapest mix of its sizes
+        self.stock = engine_payload.get("stock")
+        # Loaded once; BOM, thickness injection and costing all read from it.
+        # A cached CompiledProductDefinition skips the ORM altogether.
+        self.definition = engine_payload.get("definition")
+        self.graph = (
+            engine_payload.get("product_graph")
+            or (self.definition.graph if self.definition else None)
+            or ProductGraphLoader(self.product).load()
+        )
+        # seed() of an earlier run of the same configuration family; only
+        # the parts whose inputs changed since then are re-evaluated
+        self.previous_run = engine_payload.get("previous_run")
+        # Internal to the engine and its seed, never part of the response
+        self.evaluation: Dict[str, Any] = {}
         if not self.selected_material:
             raise ValueError("[ENGINE_FATAL] No material selected. Tier 5 requires explicit material context.")
         
@@ -29,32 +53,140 @@ class ProductEngine:
 
         self.bom: Dict | None = None
         self.cutlist: Dict | None = None
+        self.machine_time: Dict | None = None
         self.pricing: Dict | None = None
 
+    def seed(self) -> Dict[str, Any]:
+        """
+        What the next run of the same configuration family needs to
+        re-evaluate incrementally (pass it as payload["previous_run"]):
+        the evaluation signature, inputs and order, and the BOM parts.
+        """
+        return {"evaluation": self.evaluation, "parts": (self.bom or {}).get("parts", [])}
+
     def run(self) -> Dict[str, Any]:
         """Executes the full product evaluation pipeline."""
         self._build_bom()
         self._validate_geometry()
         self._optimize_cutlist()
+        self._estimate_machine_time()
         self._resolve_pricing()
         return self._build_response()
 
-    def _build_bom(self) -> None:
-        total_qty = int(self.quantities[0]) if self.quantities else 1
+    @classmethod
+    def run_many(cls, base_payload: Dict[str, Any], configurations: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Evaluates one product for many configurations (see batch.expand_grid).
+        The product graph is loaded once and every run seeds the next one's
+        incremental re-evaluation, so a sweep only recomputes the parts a
+        step touches; a configuration repeating its predecessor is not re-run.
+        Yields {"index", "configuration", "result"} or {..., "error"} per
+        configuration, in order; a failing configuration does not stop the batch.
+        """
+        shared = dict(base_payload)
+        if not shared.get("product_graph"):
+            definition = shared.get("definition")
+            shared["product_graph"] = definition.graph if definition else ProductGraphLoader(shared["product"]).load()
+
+        seed = shared.pop("previous_run", None)
+        previous, last_fingerprint = None, None
+        for index, config in enumerate(configurations):
+            fingerprint = json.dumps(config, sort_keys=True, default=str)
+            if fingerprint == last_fingerprint:
+                yield {"index": index, "configuration": config, "result": previous}
+                continue
+            payload = configure_payload(shared, config)
+            payload["previous_run"] = seed
+            try:
+                engine = cls(payload)
+                result = engine.run()
+            except Exception as e:
+                yield {"index": index, "configuration": config, "error": str(e)}
+                continue
+            previous, seed, last_fingerprint = result, engine.seed(), fingerprint
+            yield {"index": index, "configuration": config, "result": result}
+
+    @classmethod
+    def sweep_dimensions(cls, base_payload: Dict[str, Any], configurations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Finished part sizes and unit quantities for many configurations in
+        one array pass (VectorExpressionContext, needs numpy): each equation
+        is evaluated once for all configurations, in dependency order.
+        Values match the scalar engine; no costing, cutlist or pricing.
+        """
+        shared = dict(base_payload)
+        if not shared.get("product_graph"):
+            definition = shared.get("definition")
+            shared["product_graph"] = definition.graph if definition else ProductGraphLoader(shared["product"]).load()
+        shared.pop("previous_run", None)
+        graph = shared["product_graph"]
+        configurations = list(configurations)
+        if not configurations:
+            return []
+
+        contexts = [cls(configure_payload(shared, c))._product_context().get_context() for c in configurations]
+        keys = set().union(*contexts)
+        columns = {k: [float(ctx.get(k, 0)) for ctx in contexts] for k in keys}
+        vctx = VectorExpressionContext(columns, size=len(configurations))
+
+        failed = np.zeros(len(configurations), dtype=bool)
+        sized = []
+        for node in graph.ordered_templates():
+            template = node.template
+            # Quantized before publishing, as the scalar run's Decimals are
+            length, width, qty = (
+                vctx.quantize_array(vctx.evaluate_array(equation, strict=False))
+                for equation in (template.part_length_equation, template.part_width_equation, template.part_qty_equation)
+            )
+            failed |= np.isnan(length) | np.isnan(width) | np.isnan(qty)
+            # Same names ProductContext.update_calculated_part publishes
+            clean_name = template.name.lower().replace(" ", "_")
+            vctx.update_context(f"{clean_name}_length", length)
+            vctx.update_context(f"{clean_name}_width", width)
+            sized.append((template, length, width, qty))
+
+        results = []
+        for index, config in enumerate(configurations):
+            if failed[index]:
+                results.append({"index": index, "configuration": config, "error": "No finite result for one or more part equations"})
+                continue
+            results.append({
+                "index": index,
+                "configuration": config,
+                "parts": [
+                    {
+                        "part_template_id": template.id,
+                        "name": template.name,
+                        "finished_dims": {"l": float(length[index]), "w": float(width[index])},
+                        "unit_qty": float(qty[index]),
+                    }
+                    for template, length, width, qty in sized
+                ],
+            })
+        return results
+
+    def _product_context(self) -> ProductContext:
+        """Dims and parameters plus each part's material thickness."""
         pc = ProductContext(product_dims=self.product_dims,parameters=self.parameters )
-        part_templates = self.product.part_templates.all().prefetch_related('material_whitelist__material')
-        for pt in part_templates:
-            mat_id = self.material_selections.get(pt.id)
+        for node in self.graph.templates:
+            mat_id = self.material_selections.get(node.id)
             mw = None
             if mat_id:
-                mw = pt.material_whitelist.filter(material_id=mat_id).first()
+                mw = node.link_for(mat_id)
             if not mw:
-                mw = pt.material_whitelist.filter(is_default=True).first() or \
-                     pt.material_whitelist.first()
+                mw = node.default_link() or node.first_link()
             if mw and mw.material:
                 val = float(mw.material.thickness_value or 0)
-                pc.inject_material_thickness(pt.name, val)
+                pc.inject_material_thickness(node.name, val)
+        return pc
+
+    def _build_bom(self) -> None:
+        total_qty = int(self.quantities[0]) if self.quantities else 1
+        pc = self._product_context()
         full_context = pc.get_context() 
+        inputs = {k: float(v) for k, v in full_context.items()}
+        signature = self._evaluation_signature(total_qty)
+        previous_parts, reevaluate = self._reusable_parts(signature, inputs)
         builder = BOMBuilder(
             product=self.product,
             product_dims=self.product_dims,
@@ -62,7 +194,10 @@ class ProductEngine:
             material_selections=self.material_selections,
             
             stateful_context=pc,
-            quantity=total_qty 
+            quantity=total_qty,
+            graph=self.graph,
+            previous_parts=previous_parts,
+            reevaluate=reevaluate,
         )
         try:
             
@@ -72,6 +207,37 @@ class ProductEngine:
             raise ValueError(f"BOM Builder failed: {str(e)} | Available keys: {list(full_context.keys())}")
         if not self.bom.get("parts"):
             raise ValueError(f"BOM Generation Failed for {self.product.name}. Check equations.")
+        self.evaluation = {
+            "signature": signature,
+            "context": inputs,
+            "order": self.graph.evaluation_plan().order,
+            "reevaluated": builder.reevaluated,
+        }
+
+    def _evaluation_signature(self, total_qty: int) -> str:
+        """Everything besides the variable context that shapes a part's output."""
+        selections = sorted((str(k), str(v)) for k, v in self.material_selections.items())
+        return repr((
+            getattr(self.graph.product, "pk", None),
+            str(getattr(self.graph.product, "updated_at", None)),
+            getattr(self.selected_material, "pk", None),
+            str(getattr(self.selected_material, "updated_at", None)),
+            total_qty,
+            selections,
+        ))
+
+    def _reusable_parts(self, signature: str, inputs: Dict[str, float]):
+        """
+        Returns (previous parts by template id, template ids to re-evaluate),
+        or ({}, None) for a full evaluation.
+        """
+        previous = (self.previous_run or {}).get("evaluation")
+        if not previous or previous.get("signature") != signature:
+            return {}, None
+        old_inputs = previous.get("context", {})
+        changed = {k for k in old_inputs.keys() | inputs.keys() if old_inputs.get(k) != inputs.get(k)}
+        parts = {p.get("part_template_id"): p for p in self.previous_run.get("parts", [])}
+        return parts, self.graph.evaluation_plan().affected_by(changed)
     def _validate_geometry(self) -> None:
         if not getattr(self, "bom", None):
             raise ValueError("Cannot validate geometry: BOM not built yet.")
@@ -105,6 +271,9 @@ class ProductEngine:
             self.cutlist = {"total_sheets": 0, "sheets": []}
             return
 
+        # Each part is cut from its own resolved board; the optimizer keeps
+        # sheets of different materials (and sheet sizes) apart in one pass
+        boards = self._part_materials()
         part_rects = []
         for p in raw_parts:
             total_parts_to_cut = int(p.get("quantity")) 
@@ -122,6 +291,7 @@ class ProductEngine:
             if raw_w is None or raw_h is None:
                 raise ValueError(f"Data Integrity Error: Part '{p.get('name')}' has no valid width or length.")
 
+            material = boards.get(p.get("material_id")) or self.selected_material
             part_rects.append(
                 PartRect(
                     name=str(p.get("name")),
@@ -130,14 +300,40 @@ class ProductEngine:
                     height=Decimal(str(raw_h)),
                     quantity=total_parts_to_cut,
                     grain=str(p.get("grain", {}).get("direction", "none")), # Updated for your nested grain dict
-                    material_id=self.selected_material.id,
-                    sheet_width=self.sheet_width,
-                    sheet_height=self.sheet_length,
+                    material_id=material.id,
+                    sheet_width=Decimal(str(material.width_mm)),
+                    sheet_height=Decimal(str(material.length_mm)),
                 )
             )
         
-        optimizer = CutlistOptimizer(kerf_mm=3.0)
-        self.cutlist = optimizer.optimize(part_rects)
+        optimizer = CutlistOptimizer(kerf_mm=3.0, remnants=self.remnants, stock=self.stock)
+        self.cutlist = cutlist_cache.optimize(optimizer, part_rects, time_budget_ms=self.cutlist_budget_ms)
+
+    def _estimate_machine_time(self) -> None:
+        """Saw and edgebander time for the cutlist, priced as labour into sheet CP."""
+        parts = self.bom.get("parts", []) if self.bom else []
+        self.machine_time = MachineTimeEstimator(kerf_mm=3.0).estimate(self.cutlist, parts)
+
+    def _part_materials(self) -> Dict[Any, Any]:
+        """
+        Boards a BOM part may reference, by id. A board without sheet
+        dimensions cannot be nested and falls back to the selected material.
+        """
+        boards = {self.selected_material.id: self.selected_material}
+        for material_id, material in self.graph.materials().items():
+            if getattr(material, "length_mm", None) and getattr(material, "width_mm", None):
+                boards[material_id] = material
+        return boards
+
+    def _sheet_prices(self) -> Dict[Any, Decimal]:
+        """Panel price of every board the cutlist used."""
+        boards = self._part_materials()
+        prices = {}
+        for sheet in (self.cutlist or {}).get("materials", []):
+            material = boards.get(sheet["material_id"])
+            if material is not None and getattr(material, "sell_price_panel", None) is not None:
+                prices[sheet["material_id"]] = Decimal(str(material.sell_price_panel))
+        return prices
 
     def _resolve_pricing(self) -> None:
         total_qty = int(self.quantities[0]) if self.quantities else 1
@@ -153,7 +349,9 @@ class ProductEngine:
             cost_calculator=CostCalculator(self.bom),
             cutlist=self.cutlist,
             sheet_price=self.sheet_price,
-            quantity=total_qty
+            quantity=total_qty,
+            sheet_prices=self._sheet_prices(),
+            machine_time=self.machine_time,
         )
 
         # TRACE 2: Execution
@@ -185,6 +383,7 @@ class ProductEngine:
             },
             "bom": self.bom,
             "cutlist": self.cutlist,
+            "machine_time": self.machine_time,
             "pricing": self.pricing,
             "material_info": {
                 "sheet_length": float(self.sheet_length),
@@ -0,0 +1,237 @@
+# modular_calc/evaluation/product_graph.py
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from material.models.units import MeasurementUnit
+from modular_calc.utils.expression_dependencies import (
+    build_dependency_graph, extract_identifiers, extract_part_dependencies,
+    normalize_part_name, part_identifiers, topological_order, transitive_dependents,
+)
+from modular_calc.models import (
+    ModularProduct, PartTemplate, PartMaterialWhitelist,
+    PartEdgeBandWhitelist, PartHardwareRule, ProductHardwareRule,
+)
+
+
+@dataclass
+class WhitelistNode:
+    """One PartMaterialWhitelist row with its material and edgeband options."""
+    id: int
+    material: Any
+    is_default: bool
+    edgeband_options: List[Any] = field(default_factory=list)
+
+    @property
+    def material_id(self) -> Optional[int]:
+        return self.material.id if self.material else None
+
+    def edgeband_option(self, edgeband_id: Optional[int] = None):
+        """Whitelisted EB if requested and allowed, else the default EB."""
+        if edgeband_id:
+            for opt in self.edgeband_options:
+                if opt.edgeband_id == edgeband_id:
+                    return opt
+        for opt in self.edgeband_options:
+            if opt.is_default:
+                return opt
+        return None
+
+
+@dataclass
+class TemplateNode:
+    """A PartTemplate with everything the engine reads about it."""
+    template: Any
+    whitelist: List[WhitelistNode] = field(default_factory=list)
+    hardware_rules: List[Any] = field(default_factory=list)
+
+    @property
+    def id(self):
+        return self.template.id
+
+    @property
+    def name(self) -> str:
+        return self.template.name
+
+    def link_for(self, material_id: Optional[int]) -> Optional[WhitelistNode]:
+        """Same rule as the old whitelist.filter(material_id=..).first()."""
+        for link in self.whitelist:
+            if link.material_id == material_id:
+                return link
+        return None
+
+    def default_link(self) -> Optional[WhitelistNode]:
+        for link in self.whitelist:
+            if link.is_default:
+                return link
+        return None
+
+    def first_link(self) -> Optional[WhitelistNode]:
+        return self.whitelist[0] if self.whitelist else None
+
+
+@dataclass
+class EvaluationPlan:
+    """
+    Dependency-ordered evaluation of a product's parts. `dependencies`
+    maps a template id to the templates whose finished size it reads;
+    `identifiers` holds every variable a template's equations (and its
+    hardware rules) read.
+    """
+    order: List[Any]
+    dependencies: Dict[Any, set]
+    identifiers: Dict[Any, FrozenSet[str]]
+
+    def affected_by(self, changed_names) -> set:
+        """Templates to re-evaluate when these context variables changed."""
+        changed = set(changed_names)
+        seeds = {tid for tid, names in self.identifiers.items() if names & changed}
+        return transitive_dependents(self.dependencies, seeds)
+
+
+@dataclass
+class ProductGraph:
+    """
+    In-memory snapshot of a ModularProduct definition. The whole engine
+    pipeline (ProductEngine, BOMBuilder) reads from this instead of the ORM.
+    """
+    product: Any
+    templates: List[TemplateNode]
+    hardware_rules: List[Any]
+    parameters: List[Any]
+    mm_unit: Optional[Any]
+    edgeband_prices: Dict[int, Dict[str, Decimal]]
+    _plan: Optional[EvaluationPlan] = field(default=None, repr=False, compare=False)
+
+    def evaluation_plan(self) -> EvaluationPlan:
+        """Built once per graph; raises ValueError on circular part references."""
+        if self._plan is None:
+            templates = [node.template for node in self.templates]
+            dependencies = build_dependency_graph(templates)
+            name_map = {normalize_part_name(node.name): node.id for node in self.templates}
+            identifiers = {}
+            for node in self.templates:
+                # Part hardware rules are costed with the part, so they order it too
+                rule_names = set()
+                for rule in node.hardware_rules:
+                    for expr in (rule.quantity_equation, getattr(rule, "applicability_condition", None)):
+                        if expr:
+                            rule_names |= extract_identifiers(expr)
+                dependencies[node.id] |= extract_part_dependencies(rule_names, name_map, {}) - {node.id}
+                identifiers[node.id] = frozenset(part_identifiers(node.template) | rule_names)
+            self._plan = EvaluationPlan(
+                order=topological_order(dependencies, [node.id for node in self.templates]),
+                dependencies=dependencies,
+                identifiers=identifiers,
+            )
+        return self._plan
+
+    def ordered_templates(self) -> List[TemplateNode]:
+        by_id = {node.id: node for node in self.templates}
+        return [by_id[tid] for tid in self.evaluation_plan().order]
+
+    def materials(self) -> Dict[int, Any]:
+        """Every whitelisted board by id; a BOM part's material_id points here."""
+        found = {}
+        for node in self.templates:
+            for link in node.whitelist:
+                if link.material is not None:
+                    found.setdefault(link.material.id, link.material)
+        return found
+
+    def template(self, template_id) -> Optional[TemplateNode]:
+        for node in self.templates:
+            if node.id == template_id:
+                return node
+        return None
+
+
+class ProductGraphLoader:
+    """
+    Loads a ModularProduct and its templates, whitelists, edgeband options,
+    hardware rules, materials and units in a fixed number of queries,
+    independent of the part count.
+    """
+
+    def __init__(self, product):
+        self.product = product
+
+    @staticmethod
+    def prefetches() -> List[Prefetch]:
+        return [
+            "parameters",
+            Prefetch(
+                "hardware_rules",
+                queryset=ProductHardwareRule.objects.select_related("hardware").order_by("id"),
+            ),
+            Prefetch(
+                "part_templates",
+                queryset=PartTemplate.objects.order_by("id"),
+            ),
+            Prefetch(
+                "part_templates__material_whitelist",
+                queryset=PartMaterialWhitelist.objects.select_related(
+                    "material",
+                    "material__length_unit",
+                    "material__width_unit",
+                    "material__thickness_unit",
+                ).order_by("id"),
+            ),
+            Prefetch(
+                "part_templates__material_whitelist__edgeband_options",
+                queryset=PartEdgeBandWhitelist.objects.select_related("edgeband").order_by("id"),
+            ),
+            Prefetch(
+                "part_templates__hardware_rules",
+                queryset=PartHardwareRule.objects.select_related("hardware").order_by("id"),
+            ),
+        ]
+
+    def load(self) -> ProductGraph:
+        product = self.product
+        if isinstance(product, ModularProduct):
+            # Drop anything prefetched elsewhere with a different ordering
+            getattr(product, "_prefetched_objects_cache", {}).clear()
+            prefetch_related_objects([product], *self.prefetches())
+        else:
+            product = ModularProduct.objects.prefetch_related(*self.prefetches()).get(pk=product)
+
+        templates = []
+        edgeband_prices = {}
+        for pt in product.part_templates.all():
+            whitelist = []
+            for mw in pt.material_whitelist.all():
+                options = list(mw.edgeband_options.all())
+                for opt in options:
+                    eb = opt.edgeband
+                    if eb.is_active and eb.id not in edgeband_prices:
+                        edgeband_prices[eb.id] = {
+                            "cost_price": Decimal(str(eb.cost_price)),
+                            "sell_price": Decimal(str(eb.sell_price)),
+                        }
+                whitelist.append(WhitelistNode(
+                    id=mw.id, material=mw.material, is_default=mw.is_default, edgeband_options=options,
+                ))
+            templates.append(TemplateNode(
+                template=pt, whitelist=whitelist, hardware_rules=list(pt.hardware_rules.all()),
+            ))
+
+        return ProductGraph(
+            product=product,
+            templates=templates,
+            hardware_rules=list(product.hardware_rules.all()),
+            parameters=list(product.parameters.all()),
+            mm_unit=self._load_mm_unit(),
+            edgeband_prices=edgeband_prices,
+        )
+
+    @staticmethod
+    def _load_mm_unit():
+        # Mirrors the old per-part MeasurementUnit.objects.get(code="MM");
+        # None makes cost code fall back to raw material values.
+        try:
+            return MeasurementUnit.objects.get(code="MM")
+        except Exception:
+            return None
@@ -0,0 +1,79 @@
+# modular_calc/evaluation/remnants.py
+from bisect import bisect_left
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_FLOOR
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+
+from .cutlist_optimizer import to_units
+
+
+@dataclass(frozen=True)
+class Remnant:
+    """A usable offcut in stock: width runs along the sheet width, height along its length."""
+    id: int
+    material_id: int
+    width: Decimal
+    height: Decimal
+
+
+class RemnantStore:
+    """
+    Offcuts in stock, per material, sorted by (short side, long side) in
+    tenth-mm. take() bisects to the first offcut whose short side is big
+    enough and walks forward to the first that fits, which is also the
+    tightest on the short side. Taking removes the offcut from the store,
+    so every cutlist run works on its own copy().
+    """
+
+    def __init__(self, remnants: Iterable[Remnant] = ()):
+        self._index: Dict[int, List[Tuple[int, int, int]]] = {}
+        self._by_id: Dict[int, Remnant] = {}
+        for remnant in remnants:
+            self.add(remnant)
+
+    def add(self, remnant: Remnant) -> None:
+        w_u = to_units(remnant.width, ROUND_FLOOR)
+        h_u = to_units(remnant.height, ROUND_FLOOR)
+        if w_u <= 0 or h_u <= 0:
+            return
+        entries = self._index.setdefault(remnant.material_id, [])
+        entry = (min(w_u, h_u), max(w_u, h_u), remnant.id)
+        entries.insert(bisect_left(entries, entry), entry)
+        self._by_id[remnant.id] = remnant
+
+    def take(self, material_id: int, orientations: List[Tuple[int, int]]) -> Optional[Remnant]:
+        """Remove and return the best-fitting offcut for any of the (w, h) orientations."""
+        entries = self._index.get(material_id)
+        if not entries or not orientations:
+            return None
+        w, h = orientations[0]
+        short, long = min(w, h), max(w, h)
+        for i in range(bisect_left(entries, (short, long, -1)), len(entries)):
+            _, entry_long, remnant_id = entries[i]
+            if entry_long < long:
+                continue
+            remnant = self._by_id[remnant_id]
+            rw, rh = to_units(remnant.width, ROUND_FLOOR), to_units(remnant.height, ROUND_FLOOR)
+            if any(ow <= rw and oh <= rh for ow, oh in orientations):
+                del entries[i]
+                del self._by_id[remnant_id]
+                return remnant
+        return None
+
+    def copy(self) -> "RemnantStore":
+        clone = RemnantStore()
+        clone._index = {k: list(v) for k, v in self._index.items()}
+        clone._by_id = dict(self._by_id)
+        return clone
+
+    def fingerprint(self) -> str:
+        """Stable digest of the stock, for cache keys."""
+        raw = ";".join(
+            f"{r.id}:{r.material_id}:{r.width}:{r.height}"
+            for r in sorted(self._by_id.values(), key=lambda r: r.id)
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
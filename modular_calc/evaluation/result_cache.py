@@ -0,0 +1,222 @@
+# modular_calc/evaluation/result_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from modular_calc.models import TenantCatalogueVersion
+
+KEY_PREFIX = "modular_calc:eval:"
+GENERATION_KEY = KEY_PREFIX + "generation"
+
+
+class LocalMemoryBackend:
+    """Per-process LRU."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """
+    Shared backend on top of a configured Django cache alias. The alias is
+    usually shared with the rest of the site, so every key carries a
+    generation stored next to them; clear() moves to a new generation and
+    leaves the old entries to time out instead of flushing the alias.
+    """
+
+    def __init__(self, alias: str = "default", timeout: Optional[int] = 3600):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def _namespace(self) -> str:
+        generation = self.cache.get(GENERATION_KEY)
+        if generation is None:
+            # Seeded from the clock so an evicted counter never reopens an old generation
+            self.cache.add(GENERATION_KEY, time.time_ns(), None)
+            generation = self.cache.get(GENERATION_KEY)
+        return f"{KEY_PREFIX}{generation}:"
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.cache.get(self._namespace() + key)
+
+    def set(self, key: str, value: Any) -> None:
+        self.cache.set(self._namespace() + key, value, self.timeout)
+
+    def clear(self) -> None:
+        try:
+            self.cache.incr(GENERATION_KEY)
+        except ValueError:
+            self.cache.add(GENERATION_KEY, time.time_ns(), None)
+
+
+def _canonical(value: Any) -> Any:
+    """Normalise payload values so 720, 720.0 and Decimal('720.00') hash alike."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        try:
+            return format(Decimal(str(value)).normalize(), "f")
+        except InvalidOperation:
+            return str(value)
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return str(value)
+
+
+class EvaluationResultCache:
+    """
+    Memoises ProductEngine.run() output by a canonical hash of the engine
+    payload: product version, dims, merged parameters, material selections,
+    quantities, the selected material's version and the tenant's
+    catalogue version. That version lives in the database, so a catalogue
+    edit or delete in any process retires every result of the tenant at
+    once, whichever backend holds them.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def _document(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        product = payload["product"]
+        definition = payload.get("definition")
+        version = definition.version if definition is not None else getattr(product, "updated_at", None)
+        material = payload.get("selected_material")
+        # The definition's own version: a result is keyed on the boards it was computed from
+        catalogue = (
+            definition.catalogue_version if definition is not None
+            else TenantCatalogueVersion.current(product.tenant_id)
+        )
+
+        return {
+            "product": str(product.pk),
+            "version": version.isoformat() if version else None,
+            "dims": _canonical(payload.get("product_dims", {})),
+            "parameters": _canonical(payload.get("parameters", {})),
+            "material_selections": _canonical(payload.get("material_selections", {})),
+            "quantities": _canonical(payload.get("quantities", [1])),
+            "cutlist_budget_ms": payload.get("cutlist_budget_ms"),
+            "remnants": payload["remnants"].fingerprint() if payload.get("remnants") is not None else None,
+            "stock": payload["stock"].fingerprint() if payload.get("stock") is not None else None,
+            "material": [
+                getattr(material, "pk", None),
+                material.updated_at.isoformat() if getattr(material, "updated_at", None) else None,
+            ],
+            "prices": catalogue,
+        }
+
+    @staticmethod
+    def _hash(document: Dict[str, Any]) -> str:
+        raw = json.dumps(document, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def key_for(self, payload: Dict[str, Any]) -> str:
+        return self._hash(self._document(payload))
+
+    def family_for(self, payload: Dict[str, Any], document: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Same key without dims and parameters: configurations that only differ
+        by slider values share a family, and the seed of the family's latest
+        run drives the engine's incremental re-evaluation.
+        """
+        document = dict(document or self._document(payload))
+        del document["dims"], document["parameters"]
+        return "family:" + self._hash(document)
+
+    def evaluate(
+        self,
+        payload: Dict[str, Any],
+        runner: Optional[Callable[[Dict[str, Any]], Tuple[Dict[str, Any], Dict[str, Any]]]] = None,
+    ) -> Tuple[Dict[str, Any], bool, str]:
+        """
+        Returns (result, cache_hit, key). Results are shared between callers
+        and must be treated as read-only. Failed runs are not cached. The
+        runner returns (result, seed); the family entry keeps only the seed
+        (ProductEngine.seed()), so the engine's evaluation state never
+        travels with a cached result.
+        """
+        document = self._document(payload)
+        key = self._hash(document)
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, True, key
+
+        self.misses += 1
+        if runner is None:
+            runner = _run_engine
+        family = self.family_for(payload, document)
+        seed = self.backend.get(family)
+        if seed is not None and "previous_run" not in payload:
+            payload = {**payload, "previous_run": seed}
+        result, seed = runner(payload)
+        self.backend.set(key, result)
+        self.backend.set(family, seed)
+        return result, False, key
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def _run_engine(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    from .product_engine import ProductEngine
+    engine = ProductEngine(payload)
+    return engine.run(), engine.seed()
+
+
+def build_backend(config: Optional[Dict[str, Any]] = None):
+    """
+    settings.MODULAR_CALC_RESULT_CACHE selects the backend:
+    {"BACKEND": "local", "MAXSIZE": 1024} or
+    {"BACKEND": "django", "ALIAS": "default", "TIMEOUT": 3600}.
+    """
+    if config is None:
+        config = getattr(settings, "MODULAR_CALC_RESULT_CACHE", {})
+    kind = config.get("BACKEND", "local")
+    if kind == "django":
+        return DjangoCacheBackend(alias=config.get("ALIAS", "default"), timeout=config.get("TIMEOUT", 3600))
+    if kind == "local":
+        return LocalMemoryBackend(maxsize=config.get("MAXSIZE", 1024))
+    raise ValueError(f"Unknown MODULAR_CALC_RESULT_CACHE backend: {kind}")
+
+
+result_cache = EvaluationResultCache(build_backend())
+
+
+def evaluate_cached(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool, str]:
+    return result_cache.evaluate(payload)
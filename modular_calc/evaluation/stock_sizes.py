@@ -0,0 +1,80 @@
+# modular_calc/evaluation/stock_sizes.py
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_FLOOR
+from typing import Dict, Iterable, List, Optional
+import hashlib
+
+from .cutlist_optimizer import to_units
+
+
+@dataclass(frozen=True)
+class StockSize:
+    """A board size a material is bought in: width across the board, height along its length, as on WoodMaterial."""
+    material_id: int
+    width: Decimal
+    height: Decimal
+    price: Decimal
+    id: Optional[int] = None
+
+
+class StockOffer:
+    """
+    A StockSize ready for packing one sheet group: usable bin size in
+    tenth-mm (less trim, plus the kerf the bin is grown by) and the price
+    per tenth-mm² of bin, worked out once.
+    """
+
+    __slots__ = ("size", "raw_width", "raw_height", "price", "bin_w", "bin_h", "price_per_area")
+
+    def __init__(self, size: StockSize, trim: Decimal, kerf: int):
+        self.size = size
+        self.raw_width = Decimal(str(size.width))
+        self.raw_height = Decimal(str(size.height))
+        self.price = Decimal(str(size.price))
+        self.bin_w = to_units(self.raw_width - 2 * trim, ROUND_FLOOR) + kerf
+        self.bin_h = to_units(self.raw_height - 2 * trim, ROUND_FLOOR) + kerf
+        area = self.bin_w * self.bin_h
+        self.price_per_area = self.price / area if self.bin_w > kerf and self.bin_h > kerf else None
+
+    def holds(self, footprints) -> bool:
+        return any(w <= self.bin_w and h <= self.bin_h for w, h in footprints)
+
+
+class StockCatalog:
+    """
+    Stock sizes per material. offers() returns those worth opening for a
+    sheet group, cheapest per area first; a size is dropped when another
+    at most as dear is at least as large both ways, since any sheet cut
+    from it fits the other one too.
+    """
+
+    def __init__(self, sizes: Iterable[StockSize] = ()):
+        self._sizes: Dict[int, List[StockSize]] = {}
+        for size in sizes:
+            self.add(size)
+
+    def add(self, size: StockSize) -> None:
+        self._sizes.setdefault(size.material_id, []).append(size)
+
+    def offers(self, material_id: int, trim: Decimal, kerf: int) -> List[StockOffer]:
+        offers = [
+            offer for offer in (StockOffer(size, trim, kerf) for size in self._sizes.get(material_id, ()))
+            if offer.price_per_area is not None
+        ]
+        kept = []
+        for offer in sorted(offers, key=lambda o: (o.price, -o.bin_w * o.bin_h)):
+            if not any(k.bin_w >= offer.bin_w and k.bin_h >= offer.bin_h for k in kept):
+                kept.append(offer)
+        kept.sort(key=lambda o: (o.price_per_area, o.price))
+        return kept
+
+    def fingerprint(self) -> str:
+        """Stable digest of the offers, for cache keys."""
+        raw = ";".join(sorted(
+            f"{s.material_id}:{s.width}:{s.height}:{s.price}:{s.id}"
+            for sizes in self._sizes.values() for s in sizes
+        ))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return sum(len(sizes) for sizes in self._sizes.values())
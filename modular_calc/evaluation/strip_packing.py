@@ -0,0 +1,333 @@
+# modular_calc/evaluation/strip_packing.py
+import time
+from bisect import bisect_left, insort
+from decimal import ROUND_FLOOR
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cutlist_optimizer import (
+    BEST_SHORT_SIDE_FIT, PROGRESS_EVERY, REMNANT_MIN_MM, CutlistOptimizer, PartRect, Sheet, from_units, to_units,
+)
+
+MODE_STRIP = "strip"
+
+# Saw stages: rip cuts part strips off the board, crosscuts part the
+# pieces off a strip, and a third stage trims a piece narrower than its strip
+STAGE_RIP, STAGE_CROSSCUT, STAGE_TRIM = 1, 2, 3
+CUT_NAMES = {STAGE_RIP: "rip", STAGE_CROSSCUT: "crosscut", STAGE_TRIM: "trim"}
+
+# How a part lies when it opens a new strip: long side along the strip
+# (narrow strips, many crosscuts) or across it (wide strips, few rips)
+LAY_FLAT = "lay"
+STAND_UP = "stand"
+STRIP_POLICIES = (LAY_FLAT, STAND_UP)
+
+
+class Strip:
+    """One rip strip: `depth` across the strip, filled along it from 0 in footprints (size + kerf)."""
+
+    __slots__ = ("sheet", "offset", "depth", "capacity", "used", "cells")
+
+    def __init__(self, sheet: Sheet, offset: int, depth: int, capacity: int):
+        self.sheet = sheet
+        self.offset = offset
+        self.depth = depth
+        self.capacity = capacity
+        self.used = 0
+        # (index in the sheet's placements, start along the strip, length, depth)
+        self.cells: List[Tuple[int, int, int, int]] = []
+
+
+class StripPlan:
+    """
+    Strips of one sheet, ripped along its longer side. `length` and
+    `depth` are the usable size along and across the strips plus one
+    kerf, the same convention as GuillotineBin.
+    """
+
+    __slots__ = ("along_x", "length", "depth", "used", "strips")
+
+    def __init__(self, along_x: bool, length: int, depth: int):
+        self.along_x = along_x
+        self.length = length
+        self.depth = depth
+        self.used = 0
+        self.strips: List[Strip] = []
+
+
+class StripCutlistOptimizer(CutlistOptimizer):
+    """
+    Layouts a panel saw can cut in stages: rip the board into strips,
+    crosscut each strip into pieces, then (with stages=3) trim pieces
+    narrower than their strip. A piece goes into the open strip that
+    wastes the least depth, so pieces of one width share strips and
+    need no trim; a new strip opens only when none fits.
+
+    The report is the CutlistOptimizer report plus a "cut_plan" per
+    sheet (strips, crosscuts and the cut sequence) and "saw_cycles", the
+    number of cuts. Layouts are compared on new sheets first, then saw
+    cycles. Cut positions are in mm from the usable sheet's origin.
+    """
+
+    mode = MODE_STRIP
+
+    def __init__(self, kerf_mm: float = 3.0, stages: int = 3,
+                 remnants=None, min_remnant_mm: Tuple[float, float] = REMNANT_MIN_MM):
+        if stages not in (2, 3):
+            raise ValueError(f"Strip packing needs 2 or 3 saw stages, got {stages}")
+        super().__init__(kerf_mm=kerf_mm, heuristic=BEST_SHORT_SIDE_FIT, remnants=remnants, min_remnant_mm=min_remnant_mm)
+        self.stages = stages
+
+    def optimize(self, parts: List[PartRect], visualize: bool = True,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 time_budget_ms: Optional[float] = None) -> Dict:
+        """
+        Packs once per STRIP_POLICIES entry and keeps the best layout. With a
+        time_budget_ms, later policies are skipped once it is spent.
+        """
+        self.table = self._expand(parts)
+        start = time.perf_counter()
+        best = best_score = best_policy = None
+        runs = 0
+        stopped = "exhausted"
+        for policy in STRIP_POLICIES:
+            if runs and time_budget_ms is not None and (time.perf_counter() - start) * 1000 >= time_budget_ms:
+                stopped = "budget"
+                break
+            sheets = self._pack_strips(policy, progress if runs == 0 else None, self._remnant_stock())
+            runs += 1
+            score = self._strip_score(sheets)
+            if best is None or score < best_score:
+                best, best_score, best_policy = sheets, score, policy
+
+        self.sheets = best
+        report = self._build_report()
+        if time_budget_ms is not None:
+            report["search_stats"] = {
+                "budget_ms": time_budget_ms,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                "runs": runs,
+                "stopped": stopped,
+                "lower_bound_sheets": self._lower_bound(),
+                "best": {"policy": best_policy},
+            }
+        return report
+
+    @staticmethod
+    def _strip_options(allowed, along_x: bool, policy: str) -> List[Tuple[int, int, bool]]:
+        """(length along the strip, depth across it, rotated), in the order a new strip tries them."""
+        options = [(w, h, rotated) if along_x else (h, w, rotated) for w, h, rotated in allowed]
+        options.sort(key=lambda o: o[1], reverse=policy == STAND_UP)
+        return options
+
+    def _pack_strips(self, policy: str, progress: Optional[Callable[[int, int], None]] = None,
+                     remnants=None) -> List[Sheet]:
+        table = self.table
+        kerf = to_units(self.kerf)
+        allowed = [
+            self._allowed_orientations(w, h, grain) for w, h, grain in zip(table.w_u, table.h_u, table.grain_codes)
+        ]
+        options = {
+            along_x: [self._strip_options(a, along_x, policy) for a in allowed] for along_x in (True, False)
+        }
+        # Widest first, so the piece that opens a strip sets its depth
+        group_along_x = [(raw_w - 2 * trim) >= (raw_h - 2 * trim) for _, raw_w, raw_h, trim in table.groups]
+        keys = []
+        for row in range(len(table.names)):
+            along, depth, _ = options[group_along_x[table.group[row]]][row][0]
+            keys.append((depth, along))
+        order = sorted(table.pieces, key=keys.__getitem__, reverse=True)
+        # No piece is shorter than this along a strip or thinner across it
+        smallest = min((min(table.w_u[row], table.h_u[row]) + kerf for row in set(order)), default=0)
+
+        sheets: List[Sheet] = []
+        open_sheets: List[List[Sheet]] = [[] for _ in table.groups]
+        # Open strips per (group, rip direction), bucketed by depth
+        buckets: Dict[Tuple[int, bool], Dict[int, List[Strip]]] = {}
+        depths: Dict[Tuple[int, bool], List[int]] = {}
+
+        def open_strip(sheet: Sheet, group: int, depth: int) -> Strip:
+            plan = sheet.strip_plan
+            strip = Strip(sheet, plan.used, depth, plan.length)
+            plan.used += depth + kerf
+            plan.strips.append(strip)
+            key = (group, plan.along_x)
+            bucket = buckets.setdefault(key, {})
+            if depth not in bucket:
+                bucket[depth] = []
+                insort(depths.setdefault(key, []), depth)
+            bucket[depth].append(strip)
+            return strip
+
+        def fill(strip: Strip, row: int, group: int, along: int, depth: int, rotated: bool) -> None:
+            sheet, plan = strip.sheet, strip.sheet.strip_plan
+            x, y = (strip.used, strip.offset) if plan.along_x else (strip.offset, strip.used)
+            sheet.add(row, x, y, rotated, along * depth)
+            strip.cells.append((len(sheet) - 1, strip.used, along, depth))
+            strip.used += along + kerf
+            if strip.capacity - strip.used < smallest:
+                key = (group, plan.along_x)
+                bucket = buckets[key][strip.depth]
+                bucket.remove(strip)
+                if not bucket:
+                    del buckets[key][strip.depth]
+                    depths[key].remove(strip.depth)
+
+        for done, row in enumerate(order):
+            if progress is not None and done % PROGRESS_EVERY == 0:
+                progress(done, len(order))
+            group = table.group[row]
+            material_id, raw_w, raw_h, trim = table.groups[group]
+
+            best = None
+            for along_x in (True, False):
+                key = (group, along_x)
+                if key not in depths:
+                    continue
+                for along, depth, rotated in options[along_x][row]:
+                    found = self._best_strip(buckets[key], depths[key], along + kerf, depth)
+                    if found is not None and (best is None or found[0] < best[0]):
+                        best = (found[0], found[1], along, depth, rotated)
+            if best is not None:
+                _, strip, along, depth, rotated = best
+                fill(strip, row, group, along, depth, rotated)
+                continue
+
+            placed = False
+            candidates = open_sheets[group]
+            for i, sheet in enumerate(candidates):
+                plan = sheet.strip_plan
+                for along, depth, rotated in options[plan.along_x][row]:
+                    if along + kerf <= plan.length and depth + kerf <= plan.depth - plan.used:
+                        fill(open_strip(sheet, group, depth), row, group, along, depth, rotated)
+                        placed = True
+                        break
+                if placed:
+                    if plan.depth - plan.used < smallest:
+                        del candidates[i]
+                    break
+
+            if not placed and remnants is not None:
+                offcut = remnants.take(material_id, [(w, h) for w, h, _ in allowed[row]])
+                if offcut is not None:
+                    new_sheet = self._remnant_sheet(offcut, material_id, raw_w, raw_h)
+                    placed = self._open_sheet(new_sheet, row, group, options, kerf, open_strip, fill)
+                    if placed:
+                        new_sheet.position = len(sheets)
+                        sheets.append(new_sheet)
+                        candidates.append(new_sheet)
+
+            if not placed:
+                new_sheet = Sheet(
+                    width=raw_w - 2 * trim,
+                    height=raw_h - 2 * trim,
+                    material_id=material_id,
+                    raw_width=raw_w,
+                    raw_height=raw_h,
+                )
+                if not self._open_sheet(new_sheet, row, group, options, kerf, open_strip, fill):
+                    raise ValueError(f"Part {table.names[row]} too large for sheet")
+                new_sheet.position = len(sheets)
+                sheets.append(new_sheet)
+                candidates.append(new_sheet)
+
+        if progress is not None:
+            progress(len(order), len(order))
+        return sheets
+
+    def _best_strip(self, bucket: Dict[int, List[Strip]], depths: List[int], need: int,
+                    depth: int) -> Optional[Tuple[int, Strip]]:
+        """(depth waste, strip) for the shallowest open strip the piece fits, or None."""
+        for i in range(bisect_left(depths, depth), len(depths)):
+            strip_depth = depths[i]
+            if self.stages == 2 and strip_depth != depth:
+                # A narrower piece would need a third (trim) stage
+                return None
+            for strip in bucket[strip_depth]:
+                if strip.capacity - strip.used >= need:
+                    return strip_depth - depth, strip
+        return None
+
+    @staticmethod
+    def _open_sheet(sheet: Sheet, row: int, group: int, options, kerf: int, open_strip, fill) -> bool:
+        width = to_units(sheet.width, ROUND_FLOOR) + kerf
+        height = to_units(sheet.height, ROUND_FLOOR) + kerf
+        along_x = width >= height
+        sheet.strip_plan = StripPlan(along_x, width if along_x else height, height if along_x else width)
+        for along, depth, rotated in options[along_x][row]:
+            if along + kerf <= sheet.strip_plan.length and depth + kerf <= sheet.strip_plan.depth:
+                fill(open_strip(sheet, group, depth), row, group, along, depth, rotated)
+                return True
+        return False
+
+    def _cuts(self, sheet: Sheet) -> List[Tuple[int, int, Optional[int], int]]:
+        """
+        (stage, strip, placement index, position) in cutting order: each
+        strip is ripped off, then crossed into pieces, each piece trimmed
+        if it is narrower than the strip. No cut where a piece or strip
+        already ends at the sheet edge.
+        """
+        plan = sheet.strip_plan
+        kerf = to_units(self.kerf)
+        length, depth = plan.length - kerf, plan.depth - kerf
+        cuts = []
+        for i, strip in enumerate(plan.strips):
+            if strip.offset + strip.depth < depth:
+                cuts.append((STAGE_RIP, i, None, strip.offset + strip.depth))
+            for index, start, along, piece_depth in strip.cells:
+                if start + along < length:
+                    cuts.append((STAGE_CROSSCUT, i, index, start + along))
+                if piece_depth < strip.depth:
+                    cuts.append((STAGE_TRIM, i, index, strip.offset + piece_depth))
+        return cuts
+
+    def _strip_score(self, sheets: List[Sheet]) -> Tuple:
+        """Fewest new sheets, then fewest saw cycles, then least raw board."""
+        new_sheets = sum(1 for s in sheets if s.remnant_id is None)
+        cycles = sum(len(self._cuts(s)) for s in sheets)
+        raw = sum(s.raw_width * s.raw_height for s in sheets)
+        return new_sheets, cycles, raw
+
+    def _free_rects(self, sheet: Sheet) -> List[Tuple[int, int, int, int]]:
+        """Strip tails, trim slivers and the unripped rest of the sheet."""
+        plan = sheet.strip_plan
+        kerf = to_units(self.kerf)
+        free = []
+        for strip in plan.strips:
+            free.append((strip.used, strip.offset, plan.length - strip.used, strip.depth + kerf))
+            for _, start, along, depth in strip.cells:
+                if depth < strip.depth:
+                    free.append((start, strip.offset + depth + kerf, along + kerf, strip.depth - depth))
+        free.append((0, plan.used, plan.length, plan.depth - plan.used))
+        free = [r for r in free if r[2] > 0 and r[3] > 0]
+        if plan.along_x:
+            return free
+        return [(y, x, h, w) for x, y, w, h in free]
+
+    def _cut_plan(self, index: int, sheet: Sheet) -> Dict:
+        plan = sheet.strip_plan
+        kerf = to_units(self.kerf)
+        cuts = [
+            {"stage": stage, "cut": CUT_NAMES[stage], "strip": strip, "part": part, "at": from_units(at)}
+            for stage, strip, part, at in self._cuts(sheet)
+        ]
+        return {
+            "sheet_index": index,
+            "rip_along": "x" if plan.along_x else "y",
+            "strips": [{
+                "index": i,
+                "offset": from_units(strip.offset),
+                "depth": from_units(strip.depth),
+                "length_used": from_units(max(strip.used - kerf, 0)),
+                "parts": [cell[0] for cell in strip.cells],
+            } for i, strip in enumerate(plan.strips)],
+            "crosscuts": [cut for cut in cuts if cut["stage"] == STAGE_CROSSCUT],
+            "cuts": cuts,
+            "saw_cycles": len(cuts),
+        }
+
+    def _build_report(self) -> Dict:
+        report = super()._build_report()
+        report["cut_plan"] = [self._cut_plan(i, s) for i, s in enumerate(self.sheets)]
+        report["saw_cycles"] = sum(plan["saw_cycles"] for plan in report["cut_plan"])
+        report["stages"] = self.stages
+        return report
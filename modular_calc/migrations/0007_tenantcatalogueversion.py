@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_globalvariable_options_alter_tenant_options_and_more'),
+        ('modular_calc', '0006_alter_partedgebandwhitelist_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantCatalogueVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='catalogue_version', to='accounts.tenant')),
+            ],
+        ),
+    ]
@@ -145,4 +145,28 @@ class PartHardwareRule(TenantModel):
     quantity_equation = models.CharField(max_length=255, default="1") 
     applicability_condition = models.TextField(blank=True) 
     class Meta:
-        unique_together = ("part_template", "hardware","tenant")
\ No newline at end of file
+        unique_together = ("part_template", "hardware","tenant")
+
+
+class TenantCatalogueVersion(models.Model):
+    """
+    Version of a tenant's catalogue (boards, edgebands, hardware), bumped
+    in the database on every save or delete of one of its rows. Cached
+    product definitions carry the version they were built against, so
+    every process rebuilds them after a catalogue edit, not only the one
+    that made it.
+    """
+    tenant = models.OneToOneField("accounts.Tenant", on_delete=models.CASCADE, related_name="catalogue_version")
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.tenant_id} v{self.version}"
+
+    @classmethod
+    def current(cls, tenant_id) -> int:
+        return cls.objects.filter(tenant_id=tenant_id).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, tenant_id) -> None:
+        cls.objects.get_or_create(tenant_id=tenant_id)
+        cls.objects.filter(tenant_id=tenant_id).update(version=models.F("version") + 1)
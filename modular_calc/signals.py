@@ -0,0 +1,95 @@
+# modular_calc/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from material.models.wood import WoodMaterial
+from material.models.edgeband import EdgeBand
+from material.models.hardware import Hardware
+from .models import (
+    ModularProduct, ProductParameter, PartTemplate, PartMaterialWhitelist,
+    PartEdgeBandWhitelist, PartHardwareRule, ProductHardwareRule, TenantCatalogueVersion,
+)
+from .evaluation.expression_cache import invalidate_expressions
+from .evaluation.definition_cache import definition_cache
+
+# Equation columns per model that feed the shared expression cache
+EQUATION_FIELDS = {
+    PartTemplate: ("part_length_equation", "part_width_equation", "part_qty_equation", "param1_eq", "param2_eq"),
+    PartHardwareRule: ("quantity_equation", "applicability_condition"),
+    ProductHardwareRule: ("quantity_equation", "applicability_condition"),
+}
+
+
+@receiver(pre_save, sender=PartTemplate)
+@receiver(pre_save, sender=PartHardwareRule)
+@receiver(pre_save, sender=ProductHardwareRule)
+def evict_stale_equations(sender, instance, **kwargs):
+    """
+    Drops the compiled form of the equations this row held before the save,
+    so edited formulas are re-parsed and old ones stop occupying the cache.
+    """
+    if not instance.pk:
+        return
+    fields = EQUATION_FIELDS[sender]
+    previous = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    if previous:
+        invalidate_expressions(previous)
+
+
+def _owning_product_id(sender, instance):
+    if sender in (ProductParameter, PartTemplate, ProductHardwareRule):
+        return instance.product_id
+    if sender in (PartMaterialWhitelist, PartHardwareRule):
+        return PartTemplate.objects.filter(pk=instance.part_template_id).values_list("product_id", flat=True).first()
+    if sender is PartEdgeBandWhitelist:
+        return PartMaterialWhitelist.objects.filter(pk=instance.material_selection_id).values_list(
+            "part_template__product_id", flat=True
+        ).first()
+    return None
+
+
+@receiver(post_save, sender=ModularProduct)
+@receiver(post_delete, sender=ModularProduct)
+def evict_product_definition(sender, instance, **kwargs):
+    definition_cache.invalidate_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductParameter)
+@receiver(post_delete, sender=ProductParameter)
+@receiver(post_save, sender=PartTemplate)
+@receiver(post_delete, sender=PartTemplate)
+@receiver(post_save, sender=PartMaterialWhitelist)
+@receiver(post_delete, sender=PartMaterialWhitelist)
+@receiver(post_save, sender=PartEdgeBandWhitelist)
+@receiver(post_delete, sender=PartEdgeBandWhitelist)
+@receiver(post_save, sender=ProductHardwareRule)
+@receiver(post_delete, sender=ProductHardwareRule)
+@receiver(post_save, sender=PartHardwareRule)
+@receiver(post_delete, sender=PartHardwareRule)
+def bump_product_version(sender, instance, **kwargs):
+    """
+    A child row changed: move the product's updated_at forward so every
+    process sees a new definition version, and evict the local entry.
+    """
+    product_id = _owning_product_id(sender, instance)
+    if product_id is None:
+        return
+    ModularProduct.objects.filter(pk=product_id).update(updated_at=timezone.now())
+    definition_cache.invalidate_product(product_id)
+
+
+@receiver(post_save, sender=WoodMaterial)
+@receiver(post_delete, sender=WoodMaterial)
+@receiver(post_save, sender=EdgeBand)
+@receiver(post_delete, sender=EdgeBand)
+@receiver(post_save, sender=Hardware)
+@receiver(post_delete, sender=Hardware)
+def bump_catalogue_version(sender, instance, **kwargs):
+    """
+    Cached graphs hold catalogue rows (prices, sizes): move the tenant's
+    catalogue version forward so every process rebuilds them and stops
+    serving its memoised evaluation results, then drop the local entries.
+    """
+    TenantCatalogueVersion.bump(instance.tenant_id)
+    definition_cache.invalidate_tenant(instance.tenant_id)
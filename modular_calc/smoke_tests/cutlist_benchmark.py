@@ -0,0 +1,114 @@
+"""
+Cutlist throughput: the previous free-rectangle replay (every placement
+recomputes the free list from all placed parts, in Decimal) vs the
+incremental GuillotineBin, for 500- and 5,000-part orders; then time and
+peak memory for large orders of repeated parts (carcass panels by the
+dozen), where pieces are rows of a PartTable rather than dicts.
+
+    python -m modular_calc.smoke_tests.cutlist_benchmark
+"""
+import dataclasses
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_optimizer import HEURISTICS, CutlistOptimizer, PartRect
+
+SHEET_W, SHEET_H, TRIM = Decimal("2440"), Decimal("1220"), Decimal("10")
+LEGACY_LIMIT = 500
+TRACEMALLOC_LIMIT = 5000
+
+
+def _order(part_count, seed=7):
+    rng = random.Random(seed)
+    parts = []
+    for i in range(part_count):
+        parts.append(PartRect(
+            name=f"P{i}",
+            width=Decimal(rng.randrange(150, 1100, 2)),
+            height=Decimal(rng.randrange(80, 700, 2)),
+            quantity=1,
+            grain=rng.choice(["none", "none", "vertical"]),
+            material_id=1,
+            sheet_width=SHEET_W,
+            sheet_height=SHEET_H,
+            trim_mm=TRIM,
+        ))
+    return parts
+
+
+def _legacy_free_rects(width, height, placed):
+    free = [(Decimal(0), Decimal(0), width, height)]
+    for x, y, w, h in placed:
+        new_free = []
+        for fx, fy, fw, fh in free:
+            if not (x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy):
+                if fx + fw - (x + w) > 0:
+                    new_free.append((x + w, fy, fx + fw - (x + w), fh))
+                if fy + fh - (y + h) > 0:
+                    new_free.append((fx, y + h, fw, fy + fh - (y + h)))
+            else:
+                new_free.append((fx, fy, fw, fh))
+        free = new_free
+    return free
+
+
+def _legacy_sheets(parts):
+    """The pre-rewrite placement loop, kept here only for comparison."""
+    rects = sorted(((p.width, p.height, p.grain) for p in parts), key=lambda r: r[0] * r[1], reverse=True)
+    width, height = SHEET_W - 2 * TRIM, SHEET_H - 2 * TRIM
+    sheets = []
+    for w, h, grain in rects:
+        options = [(w, h), (h, w)] if grain == "none" else [(w, h)]
+        placed = False
+        for sheet in sheets:
+            for fx, fy, fw, fh in _legacy_free_rects(width, height, sheet):
+                fit = next(((ow, oh) for ow, oh in options if ow <= fw and oh <= fh), None)
+                if fit:
+                    sheet.append((fx, fy) + fit)
+                    placed = True
+                    break
+            if placed:
+                break
+        if not placed:
+            sheets.append([(Decimal(0), Decimal(0), w, h)])
+    return len(sheets)
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run():
+    for count in (500, 5000):
+        parts = _order(count)
+        print(f"--- {count} parts ---")
+        if count <= LEGACY_LIMIT:
+            sheets, elapsed = _time(lambda: _legacy_sheets(parts))
+            print(f"legacy replay          : {elapsed * 1000:9.1f} ms  {sheets:4d} sheets (no kerf)")
+        for heuristic in HEURISTICS:
+            report, elapsed = _time(lambda: CutlistOptimizer(kerf_mm=3.0, heuristic=heuristic).optimize(parts))
+            print(
+                f"{heuristic:<23}: {elapsed * 1000:9.1f} ms  {report['total_sheets']:4d} sheets "
+                f"{report['total_waste_avg']:6.2f}% waste"
+            )
+
+    for repeats in (30, 300):
+        parts = [dataclasses.replace(p, quantity=repeats) for p in _order(100)]
+        print(f"--- 100 parts x {repeats} ({100 * repeats} pieces) ---")
+        report, elapsed = _time(lambda: CutlistOptimizer(kerf_mm=3.0).optimize(parts))
+        print(f"{'best_short_side_fit':<23}: {elapsed * 1000:9.1f} ms  {report['total_sheets']:4d} sheets")
+        if 100 * repeats <= TRACEMALLOC_LIMIT:
+            # tracemalloc slows allocation down a lot; peak memory on the small order only
+            tracemalloc.start()
+            CutlistOptimizer(kerf_mm=3.0).optimize(parts)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{'peak memory':<23}: {peak / 1e6:9.1f} MB")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+"""
+Hardware rule throughput: per-expression asteval Interpreter (previous
+behaviour) vs one ExpressionEvaluator shared across the engine run.
+
+    python -m modular_calc.smoke_tests.hardware_rules_benchmark
+"""
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from asteval import Interpreter
+
+from modular_calc.evaluation.evaluator import ExpressionEvaluator, _ALLOWED_NAMES
+from modular_calc.evaluation.hardware_evaluator import HardwareEvaluator
+
+RULE_COUNT = 400
+ROUNDS = 5
+
+
+def _legacy_eval(context, expr):
+    """The pre-cache code path: new Interpreter for every expression."""
+    ctx = {k.lower(): float(v) if isinstance(v, (Decimal, float, int)) else v for k, v in context.items()}
+    aeval = Interpreter(usersyms={**_ALLOWED_NAMES, **ctx}, minimal=True)
+    return aeval(expr.lower().strip())
+
+
+def _build_rules():
+    hinge = SimpleNamespace(h_name="HINGE")
+    return [
+        SimpleNamespace(
+            quantity_equation=f"max(2, round(product_height / {400 + i % 7}))",
+            applicability_condition="max(0, product_width - 450) / 75",
+            hardware=hinge,
+        )
+        for i in range(RULE_COUNT)
+    ]
+
+
+def _build_context():
+    ctx = {f"param_{i}": Decimal(i) for i in range(40)}
+    ctx.update({"product_height": Decimal("2100"), "product_width": Decimal("600")})
+    return ctx
+
+
+def run():
+    rules = _build_rules()
+    ctx = _build_context()
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for rule in rules:
+            _legacy_eval(ctx, rule.quantity_equation)
+            _legacy_eval(ctx, rule.applicability_condition)
+    legacy = RULE_COUNT * ROUNDS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for rule in rules:
+            HardwareEvaluator(rule, ctx).evaluate()
+    per_rule = RULE_COUNT * ROUNDS / (time.perf_counter() - start)
+
+    shared = ExpressionEvaluator()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for rule in rules:
+            HardwareEvaluator(rule, ctx, evaluator=shared).evaluate()
+    reused = RULE_COUNT * ROUNDS / (time.perf_counter() - start)
+
+    print(f"Interpreter per expression : {legacy:10.0f} rules/s")
+    print(f"Interpreter per rule       : {per_rule:10.0f} rules/s")
+    print(f"Shared engine-run backend  : {reused:10.0f} rules/s  ({reused / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
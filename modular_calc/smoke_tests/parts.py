@@ -0,0 +1,14 @@
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_optimizer import PartRect
+
+# A standard board as the engine passes it: width_mm across, length_mm up
+BOARD = (1220, 2440)
+
+
+def part(name, w, h, qty=1, grain="none", material_id=1, sheet=BOARD):
+    """A PartRect of w x h mm cut from a sheet of (width, height) mm."""
+    return PartRect(
+        name=name, width=Decimal(str(w)), height=Decimal(str(h)), quantity=qty, grain=grain,
+        material_id=material_id, sheet_width=Decimal(str(sheet[0])), sheet_height=Decimal(str(sheet[1])),
+    )
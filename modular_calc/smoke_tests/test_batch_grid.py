@@ -0,0 +1,41 @@
+import unittest
+
+from modular_calc.evaluation.batch import MAX_BATCH_CONFIGURATIONS, configure_payload, expand_grid
+
+
+class TestBatchGrid(unittest.TestCase):
+
+    def test_range_is_inclusive_and_last_axis_fastest(self):
+        configs = expand_grid({
+            "product_width": {"start": 300, "stop": 400, "step": 50},
+            "product_height": [720, 900],
+        })
+        self.assertEqual(len(configs), 6)
+        self.assertEqual(configs[0], {"product_width": 300.0, "product_height": 720.0})
+        self.assertEqual(configs[1], {"product_width": 300.0, "product_height": 900.0})
+        self.assertEqual(configs[-1], {"product_width": 400.0, "product_height": 900.0})
+
+    def test_parameter_axes(self):
+        configs = expand_grid({"parameters": {"GAP": [2, 3]}})
+        self.assertEqual(configs, [{"parameters": {"GAP": 2.0}}, {"parameters": {"GAP": 3.0}}])
+
+    def test_grid_cap(self):
+        with self.assertRaises(ValueError):
+            expand_grid({"product_width": {"start": 1, "stop": MAX_BATCH_CONFIGURATIONS + 1}})
+
+    def test_configure_payload_overrides_dims_and_parameters(self):
+        base = {
+            "product_dims": {"product_width": 600, "W": 600, "width": 600, "quantity": 1},
+            "parameters": {"GAP": 2, "TOE": 100},
+            "quantities": [1],
+        }
+        payload = configure_payload(base, {"W": 450, "quantity": 3, "parameters": {"GAP": 4}})
+        self.assertEqual(payload["product_dims"]["product_width"], 450.0)
+        self.assertEqual(payload["product_dims"]["width"], 450.0)
+        self.assertEqual(payload["quantities"], [3])
+        self.assertEqual(payload["parameters"], {"GAP": 4, "TOE": 100})
+        self.assertEqual(base["product_dims"]["product_width"], 600)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+
+from modular_calc.evaluation.cutlist_cache import CutlistCache
+from modular_calc.evaluation.cutlist_optimizer import CutlistOptimizer
+from modular_calc.smoke_tests.parts import part
+
+
+def cabinet(prefix=""):
+    return [
+        part(f"{prefix}Side", 560, 720, qty=2, grain="vertical"),
+        part(f"{prefix}Bottom", 564, 560),
+        part(f"{prefix}Shelf", 564, 540, qty=2),
+        part(f"{prefix}Back", 600, 720),
+    ]
+
+
+def placements(report):
+    return [
+        [(p["name"], p["x"], p["y"], p["w"], p["h"], p["rotated"]) for p in sheet["parts"]]
+        for sheet in report["sheets"]
+    ]
+
+
+class TestCutlistCache(unittest.TestCase):
+
+    def test_layout_does_not_depend_on_part_order(self):
+        forward = CutlistOptimizer(kerf_mm=3).optimize(cabinet())
+        backward = CutlistOptimizer(kerf_mm=3).optimize(list(reversed(cabinet())))
+        self.assertEqual(placements(forward), placements(backward))
+
+    def test_permuted_and_split_parts_hit(self):
+        cache = CutlistCache(maxsize=8)
+        first = cache.optimize(CutlistOptimizer(kerf_mm=3), cabinet())
+        shelves = [part("Shelf", 564, 540), part("Shelf", 564, 540)]
+        second = cache.optimize(CutlistOptimizer(kerf_mm=3), list(reversed(cabinet()[:2] + shelves + cabinet()[3:])))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(placements(first), placements(second))
+
+    def test_settings_are_part_of_the_key(self):
+        cache = CutlistCache(maxsize=8)
+        cache.optimize(CutlistOptimizer(kerf_mm=3), cabinet())
+        cache.optimize(CutlistOptimizer(kerf_mm=4), cabinet())
+        self.assertEqual(cache.misses, 2)
+
+    def test_hit_carries_the_callers_part_names(self):
+        cache = CutlistCache(maxsize=8)
+        cache.optimize(CutlistOptimizer(kerf_mm=3), cabinet())
+        report = cache.optimize(CutlistOptimizer(kerf_mm=3), cabinet("Tall "))
+        self.assertEqual(cache.hits, 1)
+        names = sorted(p["name"] for sheet in report["sheets"] for p in sheet["parts"])
+        self.assertEqual(names, sorted(["Tall Side", "Tall Side", "Tall Bottom", "Tall Shelf", "Tall Shelf", "Tall Back"]))
+
+    def test_returned_reports_are_copies(self):
+        cache = CutlistCache(maxsize=8)
+        cache.optimize(CutlistOptimizer(kerf_mm=3), cabinet())["sheets"][0]["parts"][0]["name"] = "scribbled"
+        report = cache.optimize(CutlistOptimizer(kerf_mm=3), cabinet())
+        self.assertNotIn("scribbled", [p["name"] for p in report["sheets"][0]["parts"]])
+
+    def test_lru_is_bounded(self):
+        cache = CutlistCache(maxsize=2)
+        for width in (300, 400, 500):
+            cache.optimize(CutlistOptimizer(kerf_mm=3), [part("Panel", width, 600)])
+        self.assertEqual(len(cache), 2)
+        cache.optimize(CutlistOptimizer(kerf_mm=3), [part("Panel", 300, 600)])
+        self.assertEqual(cache.hits, 0)
+
+    def test_layouts_persist_on_disk(self):
+        with tempfile.TemporaryDirectory() as path:
+            CutlistCache(maxsize=8, path=path).optimize(CutlistOptimizer(kerf_mm=3), cabinet())
+            restarted = CutlistCache(maxsize=8, path=path)
+            report = restarted.optimize(CutlistOptimizer(kerf_mm=3), cabinet())
+            self.assertEqual(restarted.stats()["hits"], 1)
+            self.assertEqual(report["total_sheets"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
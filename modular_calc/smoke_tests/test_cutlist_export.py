@@ -0,0 +1,77 @@
+import csv
+import io
+import types
+import unittest
+import zipfile
+from xml.etree import ElementTree
+
+from modular_calc.evaluation.cutlist_export import CutlistExporter, zip_stream
+from modular_calc.evaluation.cutlist_optimizer import CutlistOptimizer
+from modular_calc.smoke_tests.parts import part
+
+
+class TestCutlistExport(unittest.TestCase):
+
+    def setUp(self):
+        parts = [part("Side", 560, 720, qty=6), part("Shelf", 564, 300, qty=9), part("Door", 596, 716, qty=4, material_id=2)]
+        self.report = CutlistOptimizer().optimize(parts)
+        self.exporter = CutlistExporter(self.report, {1: "Birch, 18mm", 2: "MDF 18"}, reference="Q-7")
+
+    def test_exports_are_generators(self):
+        for chunks in (self.exporter.cutting_list(), self.exporter.labels(), self.exporter.optimizer(), self.exporter.zip()):
+            self.assertIsInstance(chunks, types.GeneratorType)
+
+    def test_cutting_list_counts_parts_per_board(self):
+        rows = list(csv.DictReader(io.StringIO("".join(self.exporter.cutting_list()))))
+        by_part = {(r["material"], r["part"]): r for r in rows}
+        self.assertEqual(by_part[("Birch, 18mm", "Side")]["qty"], "6")
+        self.assertEqual((by_part[("Birch, 18mm", "Side")]["length_mm"], by_part[("Birch, 18mm", "Side")]["width_mm"]), ("720", "560"))
+        self.assertEqual(by_part[("MDF 18", "Door")]["qty"], "4")
+
+    def test_one_label_per_piece(self):
+        rows = list(csv.DictReader(io.StringIO("".join(self.exporter.labels()))))
+        self.assertEqual(len(rows), 19)
+        self.assertEqual(len({r["label"] for r in rows}), 19)
+        # Rotated pieces keep their own length and width on the label
+        self.assertTrue(all((r["length_mm"], r["width_mm"]) in {("720", "560"), ("300", "564"), ("716", "596")} for r in rows))
+
+    def test_optimizer_lists_boards_parts_and_placements(self):
+        lines = "".join(self.exporter.optimizer()).splitlines()
+        self.assertEqual(lines[0], "HEADER;1;Q-7")
+        records = [line.split(";")[0] for line in lines]
+        self.assertEqual(sum(int(l.split(";")[4]) for l in lines if l.startswith("BOARD")), len(self.report["sheets"]))
+        self.assertEqual(records.count("PART"), 3)
+        self.assertEqual(records.count("PLACE"), 19)
+
+    def test_sheet_svg_draws_every_piece(self):
+        svg = ElementTree.fromstring("".join(self.exporter.sheet_svg(0)))
+        groups = svg.findall("{http://www.w3.org/2000/svg}g")
+        self.assertEqual(len(groups), len(self.report["sheets"][0]["parts"]))
+        with self.assertRaises(ValueError):
+            self.exporter.export("svg", sheet_index=len(self.report["sheets"]))
+        with self.assertRaises(ValueError):
+            self.exporter.export("dxf")
+
+    def test_zip_holds_every_export(self):
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(self.exporter.zip())))
+        self.assertIsNone(archive.testzip())
+        names = archive.namelist()
+        self.assertEqual(names[:3], ["cutting_list.csv", "labels.csv", "optimizer.txt"])
+        self.assertEqual(len(names), 3 + len(self.report["sheets"]))
+        self.assertEqual(archive.read("labels.csv").decode(), "".join(self.exporter.labels()))
+
+    def test_zip_streams_as_it_goes(self):
+        produced = []
+
+        def chunks():
+            for i in range(50):
+                produced.append(i)
+                yield f"{i:05d}" * 2000 + "\n"
+
+        stream = zip_stream([("big.txt", chunks())])
+        next(stream)
+        self.assertLess(len(produced), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
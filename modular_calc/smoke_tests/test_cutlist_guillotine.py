@@ -0,0 +1,110 @@
+import random
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_optimizer import HEURISTICS, CutlistOptimizer
+from modular_calc.smoke_tests.parts import part
+
+
+class TestGuillotineCutlist(unittest.TestCase):
+
+    def assertValidLayout(self, report, kerf):
+        for sheet in report["sheets"]:
+            usable_w, usable_h = sheet["usable_dims"]["w"], sheet["usable_dims"]["h"]
+            placed = sheet["parts"]
+            for p in placed:
+                self.assertGreaterEqual(p["x"], 0)
+                self.assertGreaterEqual(p["y"], 0)
+                self.assertLessEqual(float(p["x"] + p["w"]), usable_w)
+                self.assertLessEqual(float(p["y"] + p["h"]), usable_h)
+            for i, a in enumerate(placed):
+                for b in placed[i + 1:]:
+                    apart = (
+                        a["x"] + a["w"] + kerf <= b["x"] or b["x"] + b["w"] + kerf <= a["x"] or
+                        a["y"] + a["h"] + kerf <= b["y"] or b["y"] + b["h"] + kerf <= a["y"]
+                    )
+                    self.assertTrue(apart, f"{a} and {b} closer than the kerf")
+
+    def test_random_orders_are_valid_for_every_heuristic(self):
+        rng = random.Random(3)
+        parts = [part(f"P{i}", rng.randrange(100, 1200), rng.randrange(60, 800), grain=rng.choice(["none", "vertical"]))
+                 for i in range(120)]
+        for heuristic in HEURISTICS:
+            report = CutlistOptimizer(kerf_mm=4, heuristic=heuristic).optimize(parts)
+            self.assertValidLayout(report, Decimal("4"))
+            self.assertEqual(sum(len(s["parts"]) for s in report["sheets"]), 120)
+
+    def test_kerf_and_trim_limit_capacity(self):
+        # 2420 usable: four 600 panels fit with 3 kerf gaps of 5mm, not with 7mm
+        parts = [part("Shelf", 1200, 600, qty=4, grain="vertical")]
+        self.assertEqual(CutlistOptimizer(kerf_mm=5).optimize(parts)["total_sheets"], 1)
+        self.assertEqual(CutlistOptimizer(kerf_mm=7).optimize(parts)["total_sheets"], 2)
+
+    def test_grain_is_respected_and_case_insensitive(self):
+        report = CutlistOptimizer().optimize([
+            part("Door", 1100, 500, grain="VERTICAL"),
+            part("Rail", 1000, 80, grain="horizontal"),
+        ])
+        placed = {p["name"]: p for s in report["sheets"] for p in s["parts"]}
+        self.assertEqual((placed["Door"]["w"], placed["Door"]["h"]), (Decimal("1100"), Decimal("500")))
+        self.assertFalse(placed["Door"]["rotated"])
+        self.assertEqual((placed["Rail"]["w"], placed["Rail"]["h"]), (Decimal("80"), Decimal("1000")))
+        self.assertTrue(placed["Rail"]["rotated"])
+
+    def test_tenth_mm_sizes_round_up(self):
+        report = CutlistOptimizer(kerf_mm=0).optimize([part("A", 1200, "1210.05", qty=2, grain="vertical")])
+        self.assertEqual(report["total_sheets"], 2)
+
+    def test_materials_never_share_a_sheet(self):
+        report = CutlistOptimizer().optimize([part("A", 300, 300, material_id=1), part("B", 300, 300, material_id=2)])
+        self.assertEqual(report["total_sheets"], 2)
+        self.assertEqual(report["total_waste_percent"], report["total_waste_avg"])
+
+    def test_material_summary_counts_sheets_per_board(self):
+        report = CutlistOptimizer().optimize([
+            part("Carcass", 1200, 1200, qty=3, material_id=1),
+            part("Shutter", 700, 400, qty=2, material_id=2),
+        ])
+        groups = {g["material_id"]: g for g in report["materials"]}
+        self.assertEqual((groups[1]["sheets"], groups[2]["sheets"]), (2, 1))
+        self.assertEqual(sum(g["sheets"] for g in report["materials"]), report["total_sheets"])
+        self.assertEqual(groups[2]["used_area"], 560000.0)
+
+    def test_progress_reports_every_piece(self):
+        calls = []
+        CutlistOptimizer().optimize([part("Shelf", 300, 200, qty=1200)], progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(calls[0], (0, 1200))
+        self.assertEqual(calls[-1], (1200, 1200))
+        self.assertEqual(len(calls), 4)
+
+    def test_quantity_packs_like_the_pieces_listed_one_by_one(self):
+        rng = random.Random(11)
+        sizes = [(rng.randrange(150, 900), rng.randrange(80, 600)) for _ in range(12)]
+        grouped = [part(f"P{i}", w, h, qty=25) for i, (w, h) in enumerate(sizes)]
+        single = [part(f"P{i}", w, h) for i, (w, h) in enumerate(sizes) for _ in range(25)]
+        a, b = CutlistOptimizer().optimize(grouped), CutlistOptimizer().optimize(single)
+        self.assertEqual(a["sheets"], b["sheets"])
+        self.assertValidLayout(a, Decimal("3"))
+        self.assertEqual(sum(len(s["parts"]) for s in a["sheets"]), 300)
+
+    def test_anytime_search_never_loses_to_greedy(self):
+        rng = random.Random(5)
+        parts = [part(f"P{i}", rng.randrange(150, 1100), rng.randrange(80, 700)) for i in range(80)]
+        greedy = CutlistOptimizer().optimize(parts)
+        report = CutlistOptimizer().optimize(parts, time_budget_ms=100)
+        self.assertLessEqual(report["total_sheets"], greedy["total_sheets"])
+        self.assertValidLayout(report, Decimal("3"))
+        stats = report["search_stats"]
+        self.assertIn(stats["stopped"], ("budget", "lower_bound"))
+        self.assertLessEqual(stats["lower_bound_sheets"], report["total_sheets"])
+        self.assertEqual(set(report) - {"search_stats"}, set(greedy))
+
+    def test_zero_budget_still_packs_and_bound_stops_search(self):
+        report = CutlistOptimizer().optimize([part("Shelf", 1200, 600, qty=4, grain="vertical")], time_budget_ms=0)
+        self.assertEqual(report["total_sheets"], 1)
+        self.assertEqual(report["search_stats"]["runs"], 1)
+        self.assertEqual(report["search_stats"]["stopped"], "lower_bound")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from decimal import Decimal
+from types import SimpleNamespace
+
+from modular_calc.evaluation.evaluator import ExpressionEvaluator
+from modular_calc.evaluation.hardware_evaluator import HardwareEvaluator
+
+
+class TestEvaluatorRebind(unittest.TestCase):
+
+    def test_bind_swaps_symbols_in_place(self):
+        evaluator = ExpressionEvaluator({"Shelf_Count": 3, "round": 1})
+        self.assertEqual(evaluator.eval("shelf_count * 2"), 6.0)
+
+        evaluator.bind({"door_count": Decimal("2")})
+        self.assertEqual(evaluator.eval("door_count + 1"), 3.0)
+        # Old variables are gone, shadowed builtins are restored
+        with self.assertRaises(ValueError):
+            evaluator.eval("shelf_count")
+        self.assertEqual(evaluator.eval("round(2.6)"), 3)
+
+    def test_rebind_drops_assigned_symbols(self):
+        evaluator = ExpressionEvaluator({"door_count": 2})
+        evaluator.eval("x = 5")
+        evaluator.eval("round = 1")
+        self.assertEqual(evaluator.eval("x + door_count"), 7.0)
+
+        evaluator.bind({"door_count": 3})
+        self.assertEqual(evaluator._aeval.code_text, [])
+        with self.assertRaises(ValueError):
+            evaluator.eval("x")
+        self.assertEqual(evaluator.eval("round(2.6)"), 3)
+
+    def test_rebinding_a_mutated_dict_resyncs(self):
+        context = {"door_count": 2}
+        evaluator = ExpressionEvaluator(context)
+        self.assertEqual(evaluator.eval("door_count * 2"), 4.0)
+
+        context["door_count"] = 3
+        context["shelf_count"] = 1
+        evaluator.bind(context)
+        self.assertEqual(evaluator.eval("door_count * 2 + shelf_count"), 7.0)
+
+        del context["shelf_count"]
+        evaluator.bind(context)
+        with self.assertRaises(ValueError):
+            evaluator.eval("shelf_count")
+
+    def test_hardware_rules_share_one_backend(self):
+        hinge = SimpleNamespace(h_name="HINGE")
+        rules = [
+            SimpleNamespace(quantity_equation="ceil_h / 600", applicability_condition="", hardware=hinge),
+            SimpleNamespace(quantity_equation="2", applicability_condition="", hardware=hinge),
+        ]
+        shared = ExpressionEvaluator()
+
+        results = [
+            HardwareEvaluator(rule, {"ceil_h": 1800}, evaluator=shared).evaluate()
+            for rule in rules
+        ]
+
+        self.assertEqual([r["quantity"] for r in results], [Decimal("3.0"), Decimal("2")])
+        self.assertTrue(all(HardwareEvaluator(r, {}, evaluator=shared).evaluator is shared for r in rules))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.context import ExpressionContext
+from modular_calc.evaluation.evaluator import ExpressionEvaluator
+from modular_calc.evaluation.expression_cache import ExpressionCache, expression_cache
+from modular_calc.utils.safe_eval import safe_eval
+
+
+class TestExpressionCache(unittest.TestCase):
+
+    def test_equation_compiled_once(self):
+        cache = ExpressionCache()
+        first = cache.get("product_height - 2*side_thickness")
+        second = cache.get(" product_height - 2*side_thickness ")
+
+        self.assertIs(first, second)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_lru_eviction(self):
+        cache = ExpressionCache(maxsize=2)
+        cache.get("a + 1")
+        cache.get("b + 1")
+        cache.get("a + 1")  # refresh 'a'
+        cache.get("c + 1")
+
+        self.assertIn("a + 1", cache)
+        self.assertNotIn("b + 1", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate(self):
+        cache = ExpressionCache()
+        cache.get("H - 20")
+        cache.invalidate("H - 20", None, "")
+        self.assertNotIn("H - 20", cache)
+
+    def test_invalidate_drops_the_evaluators_lower_cased_entry(self):
+        expression_cache.clear()
+        ExpressionEvaluator({"H": 720}).eval("H - 20")
+        self.assertIn("h - 20", expression_cache)
+
+        expression_cache.invalidate(" H - 20")
+        self.assertNotIn("h - 20", expression_cache)
+
+    def test_unsupported_syntax_still_evaluates(self):
+        cache = ExpressionCache()
+        compiled = cache.get("widths[1] - 2")
+        self.assertIn("Subscript", compiled.unsupported)
+        with self.assertRaises(ValueError):
+            compiled.vector_code
+
+        # The scalar evaluators accept what they accepted before caching
+        self.assertEqual(ExpressionEvaluator({"widths": [300, 450]}).eval("widths[1] - 2"), 448)
+        self.assertEqual(safe_eval("widths[1] - 2", {"widths": [300, 450]}), 448)
+        self.assertIsNone(cache.get("max(W, 300) - 2").unsupported)
+
+    def test_all_evaluators_share_the_cache(self):
+        expression_cache.clear()
+        ctx = {"H": Decimal("720"), "side_thickness": Decimal("18")}
+
+        self.assertEqual(ExpressionContext(ctx).evaluate("H - 2*side_thickness"), Decimal("684.0000"))
+        self.assertEqual(safe_eval("H - 2*side_thickness", {"H": 720, "side_thickness": 18}), 684)
+        self.assertEqual(ExpressionEvaluator(ctx).eval("max(h, 100) / 2"), 360.0)
+
+        self.assertIn("H - 2*side_thickness", expression_cache)
+        self.assertIn("max(h, 100) / 2", expression_cache)
+        self.assertEqual(expression_cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from types import SimpleNamespace
+
+from modular_calc.utils.expression_dependencies import (
+    build_dependency_graph, has_circular_dependency, topological_order, transitive_dependents,
+)
+
+
+def template(id, name, length, width, qty="1"):
+    return SimpleNamespace(
+        id=id, name=name,
+        part_length_equation=length, part_width_equation=width, part_qty_equation=qty,
+    )
+
+
+class TestExpressionDependencies(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = [
+            template(1, "TOP", "product_length", "side_width - GAP"),
+            template(2, "SIDE", "product_height", "product_width"),
+            template(3, "SHELF", "top_length - 2*side_thickness", "side_width"),
+            template(4, "BACK", "product_length", "product_height"),
+        ]
+
+    def test_graph_reads_finished_dimensions(self):
+        graph = build_dependency_graph(self.templates)
+        self.assertEqual(graph, {1: {2}, 2: set(), 3: {1, 2}, 4: set()})
+        self.assertFalse(has_circular_dependency(graph))
+
+    def test_topological_order_stays_close_to_given_order(self):
+        graph = build_dependency_graph(self.templates)
+        self.assertEqual(topological_order(graph, [1, 2, 3, 4]), [2, 1, 3, 4])
+
+    def test_cycle_raises(self):
+        graph = {1: {2}, 2: {1}, 3: set()}
+        with self.assertRaises(ValueError):
+            topological_order(graph)
+
+    def test_transitive_dependents(self):
+        graph = build_dependency_graph(self.templates)
+        self.assertEqual(transitive_dependents(graph, {2}), {1, 2, 3})
+        self.assertEqual(transitive_dependents(graph, {4}), {4})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_optimizer import CutlistOptimizer
+from modular_calc.evaluation.machine_time import MachineRates, MachineTimeEstimator
+from modular_calc.evaluation.strip_packing import StripCutlistOptimizer
+from modular_calc.smoke_tests.parts import part
+
+
+def sheet(*rects, w=1000, h=1000):
+    return {
+        "raw_dims": {"w": w, "h": h}, "usable_dims": {"w": w, "h": h},
+        "parts": [{"x": x, "y": y, "w": pw, "h": ph} for x, y, pw, ph in rects],
+    }
+
+
+class TestMachineTime(unittest.TestCase):
+
+    def setUp(self):
+        self.estimator = MachineTimeEstimator(kerf_mm=3, rates=MachineRates())
+
+    def test_shared_edges_are_cut_once(self):
+        # Two panels side by side filling the board: one cut between them
+        report = self.estimator.estimate({"sheets": [sheet((0, 0, 497, 1000), (500, 0, 500, 1000))]}, cut_lines=True)
+        row = report["sheets"][0]
+        self.assertEqual(row["cuts"], 1)
+        self.assertEqual(row["cut_lines"], [{"along": "y", "at": 497.0, "start": 0.0, "end": 1000.0}])
+        self.assertEqual(row["cut_length_m"], 1.0)
+        self.assertEqual(row["rotations"], 0)
+        # Load the board, take two parts off
+        self.assertEqual(row["handling_ops"], 3)
+
+    def test_strip_layout_rips_then_crosscuts(self):
+        report = self.estimator.estimate({"sheets": [sheet((0, 0, 300, 200), (303, 0, 300, 200), (606, 0, 394, 200))]})
+        row = report["sheets"][0]
+        # Rip the strip off the waste, then two crosscuts along it
+        self.assertEqual(row["cuts"], 3)
+        self.assertEqual(row["rotations"], 1)
+        self.assertEqual(report["saw"]["cut_length_m"], 1.4)
+
+    def test_trimmed_boards_get_their_edge_cuts(self):
+        report = CutlistOptimizer().optimize([part("Shelf", 560, 300, qty=4)])
+        row = self.estimator.estimate(report)["sheets"][0]
+        self.assertFalse(row["non_guillotine"])
+        self.assertGreaterEqual(row["cuts"], 4 + 3)
+
+    def test_strip_plans_need_no_more_cuts_than_the_saw_plan(self):
+        parts = [part(f"P{i}", 200 + 37 * i, 150 + 23 * (i % 7)) for i in range(40)]
+        report = StripCutlistOptimizer().optimize(parts)
+        estimate = self.estimator.estimate(report)
+        trims = 4 * estimate["saw"]["sheets"]
+        self.assertLessEqual(estimate["saw"]["cuts"] - trims, report["saw_cycles"])
+
+    def test_edgebanding_runs_are_grouped_by_band(self):
+        parts = [
+            {"running_metrics": {"total_eb_mm": 1200.0, "eb_edges": 2, "edgeband_id": 7}},
+            {"running_metrics": {"total_eb_mm": 800.0, "eb_edges": 1, "edgeband_id": 7}},
+            {"running_metrics": {"total_eb_mm": 500.0, "eb_edges": 1, "edgeband_id": 9}},
+            {"running_metrics": {"total_eb_mm": 0.0, "eb_edges": 0, "edgeband_id": None}},
+        ]
+        banding = self.estimator.estimate(None, parts)["edgebanding"]
+        self.assertEqual([(m["edgeband_id"], m["run_m"], m["edges"]) for m in banding["materials"]], [(7, 2.0, 3), (9, 0.5, 1)])
+        # 2 m at 12 m/min plus three edges fed
+        self.assertEqual(banding["materials"][0]["seconds"], 25.0)
+
+    def test_labour_is_priced_per_hour(self):
+        rates = MachineRates.from_config({"SAW_COST_PER_HOUR": 360, "EDGEBANDER_COST_PER_HOUR": 0})
+        report = MachineTimeEstimator(kerf_mm=3, rates=rates).estimate({"sheets": [sheet((0, 0, 497, 1000), (500, 0, 500, 1000))]})
+        self.assertEqual(report["labour_cp"], (Decimal(str(report["saw"]["seconds"])) / 10).quantize(Decimal("0.01")))
+
+
+if __name__ == "__main__":
+    unittest.main()
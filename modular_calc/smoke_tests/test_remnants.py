@@ -0,0 +1,66 @@
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_optimizer import CutlistOptimizer, to_units
+from modular_calc.evaluation.remnants import Remnant, RemnantStore
+from modular_calc.smoke_tests.parts import part
+
+
+def store(*sizes, material_id=1):
+    return RemnantStore(
+        Remnant(id=i + 1, material_id=material_id, width=Decimal(str(w)), height=Decimal(str(h)))
+        for i, (w, h) in enumerate(sizes)
+    )
+
+
+class TestRemnantStore(unittest.TestCase):
+
+    def test_takes_the_tightest_fit(self):
+        stock = store((900, 900), (400, 700), (450, 650), (300, 2000))
+        taken = stock.take(1, [(to_units(400), to_units(600)), (to_units(600), to_units(400))])
+        self.assertEqual(taken.id, 2)
+        self.assertEqual(len(stock), 3)
+
+    def test_grain_locked_part_needs_its_own_orientation(self):
+        stock = store((700, 400), (400, 700))
+        taken = stock.take(1, [(to_units(400), to_units(600))])
+        self.assertEqual(taken.id, 2)
+
+    def test_other_materials_and_copies_are_untouched(self):
+        stock = store((900, 900))
+        self.assertIsNone(stock.take(2, [(to_units(100), to_units(100))]))
+        clone = stock.copy()
+        self.assertIsNotNone(clone.take(1, [(to_units(100), to_units(100))]))
+        self.assertEqual(len(stock), 1)
+
+
+class TestCutlistWithRemnants(unittest.TestCase):
+
+    def test_offcut_is_cut_before_a_new_board(self):
+        stock = store((620, 1240))
+        report = CutlistOptimizer(remnants=stock).optimize([part("Side", 560, 1200, qty=1, grain="vertical")])
+        self.assertEqual(report["total_sheets"], 0)
+        self.assertEqual(report["remnants_used"], [1])
+        group = report["materials"][0]
+        self.assertTrue(group["remnant"])
+        self.assertAlmostEqual(group["boards"], 620 * 1240 / (1220 * 2440))
+        # The caller's store is not consumed by a preview
+        self.assertEqual(len(stock), 1)
+
+    def test_new_boards_once_offcuts_run_out(self):
+        report = CutlistOptimizer(remnants=store((620, 1240))).optimize([part("Side", 560, 1200, qty=3, grain="vertical")])
+        self.assertEqual(report["total_sheets"], 1)
+        self.assertEqual(report["remnants_used"], [1])
+
+    def test_usable_leftovers_are_reported(self):
+        report = CutlistOptimizer(kerf_mm=4).optimize([part("Top", 1200, 1000, grain="vertical")])
+        offcuts = report["offcuts"]
+        self.assertEqual(len(offcuts), 1)
+        self.assertEqual((offcuts[0]["w"], offcuts[0]["h"]), (Decimal("1200"), Decimal("1416")))
+
+        tiny = CutlistOptimizer(min_remnant_mm=(1300, 1500)).optimize([part("Top", 1200, 1000, grain="vertical")])
+        self.assertEqual(tiny["offcuts"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
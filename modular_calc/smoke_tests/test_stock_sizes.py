@@ -0,0 +1,82 @@
+import random
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_cache import CutlistCache
+from modular_calc.evaluation.cutlist_optimizer import CutlistOptimizer
+from modular_calc.evaluation.pricing_resolver import PricingResolver
+from modular_calc.evaluation.stock_sizes import StockCatalog, StockSize
+from modular_calc.smoke_tests.parts import part
+
+
+def size(w, h, price, material_id=1, id=None):
+    return StockSize(material_id=material_id, width=Decimal(str(w)), height=Decimal(str(h)), price=Decimal(str(price)), id=id)
+
+
+class FixedCosts:
+    total_cost = Decimal("0")
+    part_costs = []
+    hardware_costs = []
+
+    def calculate(self):
+        pass
+
+
+class TestStockSizes(unittest.TestCase):
+
+    def setUp(self):
+        self.stock = StockCatalog([size(1220, 2440, 3000, id=1), size(1830, 2440, 4200, id=2), size(1000, 1000, 1500, id=3)])
+
+    def cost(self, report):
+        return sum(Decimal(str(g["sheet_price"])) * g["sheets"] for g in report["materials"])
+
+    def test_dominated_sizes_are_pruned(self):
+        stock = StockCatalog([size(1220, 2440, 3000, id=1), size(1220, 2440, 3100, id=2), size(1200, 2400, 3000, id=3)])
+        self.assertEqual([o.size.id for o in stock.offers(1, Decimal("10"), 30)], [1])
+        self.assertEqual(stock.offers(2, Decimal("10"), 30), [])
+
+    def test_wider_board_is_cheaper_than_two_narrow_ones(self):
+        # Six sides need two 1220 boards (6000) but fit one 1830 board (4200)
+        report = CutlistOptimizer(stock=self.stock).optimize([part("Side", 560, 720, qty=6)])
+        self.assertEqual(report["total_sheets"], 1)
+        self.assertEqual(report["materials"][0]["raw_dims"], {"w": 1830.0, "h": 2440.0})
+        self.assertEqual(self.cost(report), Decimal("4200"))
+
+    def test_small_jobs_are_cut_from_the_small_board(self):
+        report = CutlistOptimizer(stock=self.stock).optimize([part("Shelf", 300, 300, qty=3)])
+        self.assertEqual(self.cost(report), Decimal("1500"))
+
+    def test_stock_never_costs_more_than_any_single_size(self):
+        rng = random.Random(5)
+        parts = [part(f"P{i}", rng.randrange(100, 900), rng.randrange(100, 900)) for i in range(60)]
+        cost = self.cost(CutlistOptimizer(stock=self.stock).optimize(parts))
+        for offer in (size(1220, 2440, 3000), size(1830, 2440, 4200)):
+            single = CutlistOptimizer(stock=StockCatalog([offer])).optimize(parts)
+            self.assertLessEqual(cost, self.cost(single))
+
+    def test_materials_without_stock_keep_their_sheet_size(self):
+        report = CutlistOptimizer(stock=self.stock).optimize([part("Door", 596, 716, qty=2, material_id=2)])
+        self.assertEqual(report["materials"][0]["raw_dims"], {"w": 1220.0, "h": 2440.0})
+        self.assertIsNone(report["materials"][0]["sheet_price"])
+
+    def test_search_keeps_the_cheapest_layout(self):
+        parts = [part("Side", 560, 720, qty=14), part("Top", 1700, 600, qty=2)]
+        greedy = self.cost(CutlistOptimizer(stock=self.stock).optimize(parts))
+        searched = CutlistOptimizer(stock=self.stock).optimize(parts, time_budget_ms=20)
+        self.assertLessEqual(self.cost(searched), greedy)
+
+    def test_pricing_uses_the_stock_price(self):
+        report = CutlistOptimizer(stock=self.stock).optimize([part("Side", 560, 720, qty=6)])
+        pricing = PricingResolver({}, FixedCosts(), report, sheet_price=Decimal("3000")).sheet_pricing()
+        self.assertEqual(pricing["cp"], Decimal("4200.00"))
+
+    def test_cache_keys_include_the_stock(self):
+        cache = CutlistCache(maxsize=4)
+        parts = [part("Side", 560, 720, qty=6)]
+        cache.optimize(CutlistOptimizer(), parts)
+        cache.optimize(CutlistOptimizer(stock=self.stock), parts)
+        self.assertEqual(cache.misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
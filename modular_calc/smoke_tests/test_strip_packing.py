@@ -0,0 +1,106 @@
+import random
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.cutlist_cache import CutlistCache
+from modular_calc.evaluation.cutlist_optimizer import CutlistOptimizer
+from modular_calc.evaluation.strip_packing import STAGE_CROSSCUT, STAGE_RIP, STAGE_TRIM, StripCutlistOptimizer
+from modular_calc.smoke_tests.parts import part
+
+
+class TestStripPacking(unittest.TestCase):
+
+    def assertValidLayout(self, report, kerf):
+        for sheet in report["sheets"]:
+            placed = sheet["parts"]
+            for p in placed:
+                self.assertLessEqual(float(p["x"] + p["w"]), sheet["usable_dims"]["w"])
+                self.assertLessEqual(float(p["y"] + p["h"]), sheet["usable_dims"]["h"])
+            for i, a in enumerate(placed):
+                for b in placed[i + 1:]:
+                    apart = (
+                        a["x"] + a["w"] + kerf <= b["x"] or b["x"] + b["w"] + kerf <= a["x"] or
+                        a["y"] + a["h"] + kerf <= b["y"] or b["y"] + b["h"] + kerf <= a["y"]
+                    )
+                    self.assertTrue(apart, f"{a} and {b} closer than the kerf")
+
+    def random_order(self, count=150, seed=4):
+        rng = random.Random(seed)
+        return [
+            part(f"P{i}", rng.randrange(100, 1200), rng.randrange(60, 800), grain=rng.choice(["none", "vertical", "horizontal"]))
+            for i in range(count)
+        ]
+
+    def test_pieces_sit_on_their_strip(self):
+        report = StripCutlistOptimizer(kerf_mm=4).optimize(self.random_order())
+        self.assertValidLayout(report, Decimal("4"))
+        self.assertEqual(sum(len(s["parts"]) for s in report["sheets"]), 150)
+        for sheet, plan in zip(report["sheets"], report["cut_plan"]):
+            # An upright board is ripped along its length
+            self.assertEqual(plan["rip_along"], "y")
+            self.assertEqual(sorted(i for strip in plan["strips"] for i in strip["parts"]), list(range(len(sheet["parts"]))))
+            for strip in plan["strips"]:
+                for i in strip["parts"]:
+                    p = sheet["parts"][i]
+                    self.assertEqual(p["x"], strip["offset"])
+                    self.assertLessEqual(p["w"], strip["depth"])
+
+    def test_cut_sequence_rips_each_strip_before_crossing_it(self):
+        report = StripCutlistOptimizer().optimize(self.random_order(60))
+        for plan in report["cut_plan"]:
+            ripped = set()
+            for cut in plan["cuts"]:
+                if cut["stage"] == STAGE_RIP:
+                    ripped.add(cut["strip"])
+                elif cut["strip"] != len(plan["strips"]) - 1:
+                    self.assertIn(cut["strip"], ripped)
+            self.assertEqual(plan["crosscuts"], [c for c in plan["cuts"] if c["stage"] == STAGE_CROSSCUT])
+        self.assertEqual(report["saw_cycles"], sum(len(plan["cuts"]) for plan in report["cut_plan"]))
+
+    def test_same_width_parts_share_one_strip(self):
+        report = StripCutlistOptimizer(kerf_mm=3).optimize([part("Shelf", 560, 300, qty=4)])
+        plan = report["cut_plan"][0]
+        self.assertEqual(len(plan["strips"]), 1)
+        # One rip off the board, a crosscut after each shelf, no trims
+        self.assertEqual([c["cut"] for c in plan["cuts"]], ["rip", "crosscut", "crosscut", "crosscut", "crosscut"])
+        self.assertEqual(report["saw_cycles"], 5)
+
+    def test_two_stages_never_trim(self):
+        report = StripCutlistOptimizer(stages=2).optimize(self.random_order(80))
+        self.assertValidLayout(report, Decimal("3"))
+        for sheet, plan in zip(report["sheets"], report["cut_plan"]):
+            self.assertNotIn(STAGE_TRIM, [c["stage"] for c in plan["cuts"]])
+            for strip in plan["strips"]:
+                self.assertEqual({sheet["parts"][i]["w"] for i in strip["parts"]}, {strip["depth"]})
+
+    def test_board_grain_codes_keep_tall_parts_upright(self):
+        # BOM parts carry their board's grain; a cabinet side on an upright "H" board is not turned
+        sides = [part(f"Side {grain}", 560, 2100, grain=grain) for grain in ("H", "V", "NONE")]
+        for optimizer in (CutlistOptimizer(), StripCutlistOptimizer()):
+            report = optimizer.optimize(sides)
+            placed = {p["name"]: p for s in report["sheets"] for p in s["parts"]}
+            self.assertEqual(set(placed), {"Side H", "Side V", "Side NONE"})
+            self.assertFalse(any(p["rotated"] for p in placed.values()))
+
+    def test_offcuts_lie_in_free_space(self):
+        report = StripCutlistOptimizer().optimize([part("Side", 720, 560, qty=3)])
+        self.assertTrue(report["offcuts"])
+        for offcut in report["offcuts"]:
+            for p in report["sheets"][offcut["sheet_index"]]["parts"]:
+                apart = (
+                    offcut["x"] + offcut["w"] <= p["x"] or p["x"] + p["w"] <= offcut["x"] or
+                    offcut["y"] + offcut["h"] <= p["y"] or p["y"] + p["h"] <= offcut["y"]
+                )
+                self.assertTrue(apart)
+
+    def test_cache_keeps_modes_apart(self):
+        cache = CutlistCache(maxsize=4)
+        parts = self.random_order(20)
+        cache.optimize(CutlistOptimizer(), parts)
+        report = cache.optimize(StripCutlistOptimizer(), parts)
+        self.assertEqual(cache.misses, 2)
+        self.assertIn("cut_plan", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from decimal import Decimal
+
+from modular_calc.evaluation.context import ExpressionContext, VectorExpressionContext, np
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestVectorExpressionContext(unittest.TestCase):
+
+    EQUATIONS = [
+        "product_height - 2*side_thickness",
+        "(product_width - GAP) / 3",
+        "max(product_width / 2, 300) + min(GAP, 3, 10)",
+        "ceil(product_width / 450) * floor(GAP + 0.5)",
+        "round(product_height / 7, 2) + round(GAP / 4)",
+        "sqrt(product_width) + pow(GAP, 2) + abs(GAP - 5)",
+        "product_width if 400 < product_width <= 600 and not GAP > 3 else 0",
+        "product_width % 64 + product_height // 7",
+    ]
+
+    def setUp(self):
+        self.rows = [
+            {"product_width": w, "product_height": h, "GAP": g, "side_thickness": 18}
+            for w in (300, 450, 600, 1200)
+            for h in (720, 901.5)
+            for g in (2, 2.5, 4)
+        ]
+        columns = {k: [row[k] for row in self.rows] for k in self.rows[0]}
+        columns["side_thickness"] = 18
+        self.vctx = VectorExpressionContext(columns)
+
+    def test_matches_scalar_mode(self):
+        for expr in self.EQUATIONS:
+            vector = self.vctx.evaluate(expr)
+            scalar = [ExpressionContext(row).evaluate(expr) for row in self.rows]
+            self.assertEqual(vector, scalar, expr)
+
+    def test_scalar_result_is_broadcast(self):
+        self.assertEqual(self.vctx.evaluate("1"), [Decimal("1.0000")] * len(self.rows))
+
+    def test_invalid_configurations(self):
+        vctx = VectorExpressionContext({"GAP": [2, 0, 4]})
+        with self.assertRaises(ValueError):
+            vctx.evaluate("10 / GAP")
+        result = vctx.evaluate_array("10 / GAP", strict=False)
+        self.assertTrue(np.isnan(result[1]))
+        self.assertEqual(result[2], 2.5)
+
+    def test_published_parts_are_quantized_like_scalar_mode(self):
+        vctx = VectorExpressionContext({"product_width": [1000, 1001]})
+        vctx.update_context("third_width", vctx.quantize_array(vctx.evaluate_array("product_width / 3")))
+        scalar = []
+        for width in (1000, 1001):
+            third = ExpressionContext({"product_width": width}).evaluate("product_width / 3")
+            scalar.append(ExpressionContext({"third_width": third}).evaluate("third_width * 3"))
+        self.assertEqual(vctx.evaluate("third_width * 3"), scalar)
+        self.assertEqual(scalar[0], Decimal("999.9999"))
+
+    def test_missing_variable(self):
+        with self.assertRaises(NameError):
+            self.vctx.evaluate("unknown_width + 1")
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            VectorExpressionContext({"a": [1, 2], "b": [1, 2, 3]})
+
+
+if __name__ == "__main__":
+    unittest.main()
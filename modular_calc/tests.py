@@ -1,3 +1,435 @@
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models.tenant import Tenant
+from material.models import (
+    MeasurementUnit, BillingUnit, Category, WoodMaterial,
+    Brand, EdgebandName, EdgeBand, HardwareGroup, Hardware,
+)
+from modular_calc.models import (
+    ModularProduct, ModularProductCategory, ProductParameter, PartTemplate,
+    PartMaterialWhitelist, PartEdgeBandWhitelist, PartHardwareRule, ProductHardwareRule, TenantCatalogueVersion,
+)
+from modular_calc.evaluation.product_engine import ProductEngine
+from modular_calc.evaluation.product_graph import ProductGraphLoader
+from modular_calc.evaluation.definition_cache import ProductDefinitionCache, definition_cache
+from modular_calc.evaluation.result_cache import (
+    DjangoCacheBackend, EvaluationResultCache, LocalMemoryBackend, result_cache,
+)
+from modular_calc.evaluation.batch import expand_grid
+from modular_calc.evaluation.context import np as context_np
+
+
+class EngineFixtureMixin:
+    """Shared catalogue: one tenant, one board, one edgeband, one hinge."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Factory")
+        mm = MeasurementUnit.objects.create(name="Millimetre", code="MM", system="SI", factor=Decimal("0.001"))
+        panel = BillingUnit.objects.create(name="Panel", code="PANEL")
+        group = Category.objects.create(tenant=cls.tenant, name="Ply")
+        cls.material = WoodMaterial.objects.create(
+            tenant=cls.tenant, material_grp=group, name="BWR 18", color="White",
+            length_value=2440, length_unit=mm, width_value=1220, width_unit=mm,
+            thickness_value=18, thickness_unit=mm,
+            cost_price=2000, cost_unit=panel, sell_price=3000, sell_unit=panel,
+        )
+        brand = Brand.objects.create(tenant=cls.tenant, name="Rehau")
+        cls.edgeband = EdgeBand.objects.create(
+            tenant=cls.tenant, edgeband_name=EdgebandName.objects.create(brand=brand, depth=Decimal("2")),
+            thickness=Decimal("0.8"), cost_price=10, sell_price=20,
+        )
+        cls.hinge = Hardware.objects.create(
+            tenant=cls.tenant, h_group=HardwareGroup.objects.create(name="Hinges"),
+            h_name="Soft close", billing_unit=panel, cost_price=50, sell_price=90,
+        )
+        cls.category = ModularProductCategory.objects.create(tenant=cls.tenant, name="Base")
+
+    @classmethod
+    def build_product(cls, name, part_count):
+        product = ModularProduct.objects.create(tenant=cls.tenant, name=name, category=cls.category)
+        ProductParameter.objects.create(
+            tenant=cls.tenant, product=product, name="Gap", abbreviation="GAP", default_value=2,
+        )
+        ProductHardwareRule.objects.create(
+            tenant=cls.tenant, product=product, hardware=cls.hinge, quantity_equation="2",
+        )
+        for i in range(part_count):
+            pt = PartTemplate.objects.create(
+                tenant=cls.tenant, product=product, name=f"Panel {i}",
+                part_length_equation="product_height - 2*side_thickness",
+                part_width_equation="product_width - GAP",
+                part_qty_equation="1",
+            )
+            mw = PartMaterialWhitelist.objects.create(
+                tenant=cls.tenant, part_template=pt, material=cls.material, is_default=True,
+            )
+            PartEdgeBandWhitelist.objects.create(
+                tenant=cls.tenant, material_selection=mw, side="top", edgeband=cls.edgeband, is_default=True,
+            )
+            PartHardwareRule.objects.create(
+                tenant=cls.tenant, part_template=pt, hardware=cls.hinge, quantity_equation="1",
+            )
+        return product
+
+    def engine_payload(self, product, **overrides):
+        payload = {
+            "product": product,
+            "product_dims": {"product_length": 600, "product_width": 500, "product_height": 720, "quantity": 1},
+            "parameters": {"GAP": 2, "side_thickness": 18},
+            "quantities": [1],
+            "selected_material": self.material,
+        }
+        payload.update(overrides)
+        return payload
+
+
+class ProductGraphLoaderTests(EngineFixtureMixin, TestCase):
+
+    def test_loader_query_count_is_fixed(self):
+        for part_count in (5, 40):
+            product = self.build_product(f"Cabinet {part_count}", part_count)
+            with self.assertNumQueries(8):
+                graph = ProductGraphLoader(product.pk).load()
+            self.assertEqual(len(graph.templates), part_count)
+            self.assertEqual(graph.templates[0].default_link().material, self.material)
+
+    def test_engine_queries_do_not_scale_with_parts(self):
+        counts = {}
+        for part_count in (5, 40):
+            product = self.build_product(f"Wardrobe {part_count}", part_count)
+            product = ModularProduct.objects.get(pk=product.pk)
+            with CaptureQueriesContext(connection) as ctx:
+                result = ProductEngine(self.engine_payload(product)).run()
+            counts[part_count] = len(ctx.captured_queries)
+            self.assertEqual(len(result["bom"]["parts"]), part_count)
+
+        self.assertEqual(counts[5], counts[40])
+
+
+class DefinitionCacheTests(EngineFixtureMixin, TestCase):
+
+    def setUp(self):
+        definition_cache.clear()
+
+    def test_repeat_evaluation_skips_orm(self):
+        product = self.build_product("Base 600", 6)
+        product = ModularProduct.objects.get(pk=product.pk)
+        definition = definition_cache.get(product)
+
+        # A hit only reads the tenant's catalogue version
+        with self.assertNumQueries(1):
+            self.assertIs(definition_cache.get(product), definition)
+        with self.assertNumQueries(0):
+            result = ProductEngine(self.engine_payload(product, definition=definition)).run()
+        self.assertEqual(len(result["bom"]["parts"]), 6)
+        self.assertEqual(definition.parameter_defaults, {"GAP": 2})
+        self.assertIn("part_length_equation", definition.equations[definition.evaluation_order[0]])
+
+    def test_child_edit_bumps_version(self):
+        product = self.build_product("Tall 450", 2)
+        product = ModularProduct.objects.get(pk=product.pk)
+        stale = definition_cache.get(product)
+
+        template = PartTemplate.objects.filter(product=product).first()
+        template.part_width_equation = "product_width - 2*GAP"
+        template.save()
+        self.assertNotIn(product.pk, definition_cache)
+
+        product = ModularProduct.objects.get(pk=product.pk)
+        fresh = definition_cache.get(product)
+        self.assertIsNot(fresh, stale)
+        self.assertEqual(fresh.template(template.id).template.part_width_equation, "product_width - 2*GAP")
+
+    def test_catalogue_edit_elsewhere_rebuilds(self):
+        product = ModularProduct.objects.get(pk=self.build_product("Drawer 600", 2).pk)
+        stale = definition_cache.get(product)
+
+        # Another process edited a board: the version moved, nothing was evicted here
+        WoodMaterial.objects.filter(pk=self.material.pk).update(sell_price=3300)
+        TenantCatalogueVersion.bump(self.tenant.pk)
+        self.assertIn(product.pk, definition_cache)
+
+        fresh = definition_cache.get(product)
+        self.assertIsNot(fresh, stale)
+        self.assertEqual(fresh.graph.materials()[self.material.pk].sell_price, 3300)
+
+    def test_catalogue_delete_bumps_version(self):
+        product = ModularProduct.objects.get(pk=self.build_product("Drawer 450", 1).pk)
+        definition_cache.get(product)
+        before = TenantCatalogueVersion.current(self.tenant.pk)
+
+        Hardware.objects.create(
+            tenant=self.tenant, h_group=self.hinge.h_group, h_name="Runner",
+            billing_unit=self.hinge.billing_unit, cost_price=80, sell_price=120,
+        ).delete()
+        self.assertEqual(TenantCatalogueVersion.current(self.tenant.pk), before + 2)
+        self.assertNotIn(product.pk, definition_cache)
+
+    def test_lru_bound(self):
+        cache = ProductDefinitionCache(maxsize=1)
+        first = ModularProduct.objects.get(pk=self.build_product("Wall 300", 1).pk)
+        second = ModularProduct.objects.get(pk=self.build_product("Wall 600", 1).pk)
+        cache.get(first)
+        cache.get(second)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(second.pk, cache)
+        self.assertNotIn(first.pk, cache)
+
+
+class EvaluationResultCacheTests(EngineFixtureMixin, TestCase):
+
+    def setUp(self):
+        definition_cache.clear()
+        self.cache = EvaluationResultCache(LocalMemoryBackend(maxsize=8))
+        self.product = ModularProduct.objects.get(pk=self.build_product("Base 900", 3).pk)
+        self.definition = definition_cache.get(self.product)
+
+    def test_identical_configuration_hits(self):
+        first, hit, key = self.cache.evaluate(self.engine_payload(self.product, definition=self.definition))
+        self.assertFalse(hit)
+
+        payload = self.engine_payload(
+            self.product, definition=self.definition,
+            product_dims={"product_length": 600.0, "product_width": Decimal("500.00"),
+                          "product_height": 720, "quantity": 1},
+        )
+        with self.assertNumQueries(0):
+            second, hit, same_key = self.cache.evaluate(payload)
+        self.assertTrue(hit)
+        self.assertIs(second, first)
+        self.assertEqual(same_key, key)
+
+    def test_changed_dims_miss(self):
+        self.cache.evaluate(self.engine_payload(self.product, definition=self.definition))
+        payload = self.engine_payload(
+            self.product, definition=self.definition,
+            product_dims={"product_length": 600, "product_width": 450, "product_height": 720, "quantity": 1},
+        )
+        _, hit, _ = self.cache.evaluate(payload)
+        self.assertFalse(hit)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_price_change_invalidates(self):
+        payload = self.engine_payload(self.product, definition=self.definition)
+        _, _, key = self.cache.evaluate(payload)
+
+        # A price edit in another process: only the shared version moved
+        TenantCatalogueVersion.bump(self.tenant.pk)
+        payload = self.engine_payload(self.product, definition=definition_cache.get(self.product))
+        _, hit, new_key = self.cache.evaluate(payload)
+        self.assertFalse(hit)
+        self.assertNotEqual(new_key, key)
+
+    def test_edgeband_save_retires_shared_results(self):
+        payload = self.engine_payload(self.product, definition=self.definition)
+        _, _, key = result_cache.evaluate(payload)
+
+        self.edgeband.sell_price = 25
+        self.edgeband.save()
+        payload = self.engine_payload(self.product, definition=definition_cache.get(self.product))
+        self.assertNotEqual(result_cache.key_for(payload), key)
+
+    def test_catalogue_delete_retires_results(self):
+        payload = self.engine_payload(self.product)
+        key = result_cache.key_for(payload)
+
+        Hardware.objects.create(
+            tenant=self.tenant, h_group=self.hinge.h_group, h_name="Runner",
+            billing_unit=self.hinge.billing_unit, cost_price=80, sell_price=120,
+        ).delete()
+        self.assertNotEqual(result_cache.key_for(payload), key)
+
+    def test_django_backend_clear_keeps_the_rest_of_the_alias(self):
+        backend = DjangoCacheBackend()
+        backend.cache.set("session:abc", "kept")
+        cache = EvaluationResultCache(backend)
+        payload = self.engine_payload(self.product, definition=self.definition)
+        cache.evaluate(payload)
+        self.assertTrue(cache.evaluate(payload)[1])
+
+        cache.clear()
+        self.assertFalse(cache.evaluate(payload)[1])
+        self.assertEqual(backend.cache.get("session:abc"), "kept")
+
+
+class DependencyOrderTests(EngineFixtureMixin, TestCase):
+
+    def setUp(self):
+        definition_cache.clear()
+        product = ModularProduct.objects.create(tenant=self.tenant, name="Sideboard", category=self.category)
+        ProductParameter.objects.create(
+            tenant=self.tenant, product=product, name="Gap", abbreviation="GAP", default_value=2,
+        )
+        # TOP reads SIDE but is created first; BACK only reads product_length
+        self.top = self.add_template(product, "Top", "product_length", "side_width - GAP")
+        self.side = self.add_template(product, "Side", "product_height", "product_width")
+        self.back = self.add_template(product, "Back", "product_length", "product_height")
+        self.product = ModularProduct.objects.get(pk=product.pk)
+
+    def add_template(self, product, name, length_eq, width_eq):
+        pt = PartTemplate.objects.create(
+            tenant=self.tenant, product=product, name=name,
+            part_length_equation=length_eq, part_width_equation=width_eq, part_qty_equation="1",
+        )
+        PartMaterialWhitelist.objects.create(
+            tenant=self.tenant, part_template=pt, material=self.material, is_default=True,
+        )
+        return pt
+
+    def test_parts_follow_their_dependencies(self):
+        definition = definition_cache.get(self.product)
+        self.assertEqual(definition.evaluation_order, [self.side.id, self.top.id, self.back.id])
+
+        result = ProductEngine(self.engine_payload(self.product, definition=definition)).run()
+        top = next(p for p in result["bom"]["parts"] if p["part_template_id"] == self.top.id)
+        self.assertEqual(top["finished_dims"]["w"], 498.0)
+
+    def test_parameter_change_reevaluates_dependents_only(self):
+        definition = definition_cache.get(self.product)
+        first = ProductEngine(self.engine_payload(self.product, definition=definition))
+        first_result = first.run()
+        self.assertEqual(first.evaluation["reevaluated"], [self.side.id, self.top.id, self.back.id])
+        self.assertNotIn("evaluation", first_result)
+
+        payload = self.engine_payload(
+            self.product, definition=definition, previous_run=first.seed(),
+            parameters={"GAP": 10, "side_thickness": 18},
+        )
+        second = ProductEngine(payload)
+        second_result = second.run()
+        self.assertEqual(second.evaluation["reevaluated"], [self.top.id])
+        parts = {p["part_template_id"]: p for p in second_result["bom"]["parts"]}
+        self.assertEqual(parts[self.top.id]["finished_dims"]["w"], 490.0)
+        self.assertIs(parts[self.back.id], first_result["bom"]["parts"][2])
+
+        payload = self.engine_payload(
+            self.product, definition=definition, previous_run=second.seed(),
+            product_dims={"product_length": 600, "product_width": 450, "product_height": 720, "quantity": 1},
+            parameters={"GAP": 10, "side_thickness": 18},
+        )
+        third = ProductEngine(payload)
+        third.run()
+        self.assertEqual(third.evaluation["reevaluated"], [self.side.id, self.top.id])
+
+    def test_runs_are_chained_through_their_seeds(self):
+        definition = definition_cache.get(self.product)
+        configurations = expand_grid({"parameters": {"GAP": [2, 10]}})
+        items = list(ProductEngine.run_many(self.engine_payload(self.product, definition=definition), configurations))
+        first, second = ({p["part_template_id"]: p for p in item["result"]["bom"]["parts"]} for item in items)
+        self.assertIs(second[self.back.id], first[self.back.id])
+        self.assertIsNot(second[self.top.id], first[self.top.id])
+
+        cache = EvaluationResultCache(LocalMemoryBackend(maxsize=8))
+        results = [
+            cache.evaluate(self.engine_payload(self.product, definition=definition, parameters={"GAP": gap}))[0]
+            for gap in (2, 10)
+        ]
+        self.assertIs(results[1]["bom"]["parts"][2], results[0]["bom"]["parts"][2])
+        self.assertTrue(all("evaluation" not in result for result in results))
+
+
+class RunManyTests(EngineFixtureMixin, TestCase):
+
+    def test_sweep_loads_graph_once_and_reuses_parts(self):
+        product = ModularProduct.objects.get(pk=self.build_product("Base sweep", 4).pk)
+        configurations = expand_grid({
+            "product_height": [720, 900],
+            "parameters": {"GAP": [2, 4]},
+        })
+
+        with mock.patch.object(ProductGraphLoader, "load", autospec=True, side_effect=ProductGraphLoader.load) as load:
+            items = list(ProductEngine.run_many(self.engine_payload(product), configurations))
+        self.assertEqual(load.call_count, 1)
+
+        self.assertEqual([item["index"] for item in items], [0, 1, 2, 3])
+        self.assertTrue(all("result" in item for item in items))
+        widths = [item["result"]["bom"]["parts"][0]["finished_dims"]["w"] for item in items]
+        self.assertEqual(widths, [498.0, 496.0, 498.0, 496.0])
+        self.assertTrue(all("evaluation" not in item["result"] for item in items))
+
+    def test_failing_configuration_does_not_stop_batch(self):
+        product = ModularProduct.objects.get(pk=self.build_product("Base errors", 1).pk)
+        configurations = [{"product_width": 600}, {"product_width": 1}, {"product_width": 600}]
+        items = list(ProductEngine.run_many(self.engine_payload(product), configurations))
+
+        self.assertIn("result", items[0])
+        self.assertIn("error", items[1])
+        self.assertIn("result", items[2])
+
+    @skipIf(context_np is None, "numpy not installed")
+    def test_dimension_sweep_matches_full_runs(self):
+        product = ModularProduct.objects.get(pk=self.build_product("Base dims", 3).pk)
+        configurations = expand_grid({"product_width": [450, 600], "product_height": [720, 900]})
+
+        swept = ProductEngine.sweep_dimensions(self.engine_payload(product), configurations)
+        full = list(ProductEngine.run_many(self.engine_payload(product), configurations))
+        for dims, item in zip(swept, full):
+            self.assertEqual(
+                [p["finished_dims"] for p in dims["parts"]],
+                [p["finished_dims"] for p in item["result"]["bom"]["parts"]],
+            )
+
+    @skipIf(context_np is None, "numpy not installed")
+    def test_dimension_sweep_reads_quantized_parts(self):
+        product = ModularProduct.objects.create(tenant=self.tenant, name="Thirds", category=self.category)
+        for name, length_eq in (("Third", "product_length / 3"), ("Whole", "third_length * 3")):
+            pt = PartTemplate.objects.create(
+                tenant=self.tenant, product=product, name=name,
+                part_length_equation=length_eq, part_width_equation="product_width", part_qty_equation="1",
+            )
+            PartMaterialWhitelist.objects.create(
+                tenant=self.tenant, part_template=pt, material=self.material, is_default=True,
+            )
+        product = ModularProduct.objects.get(pk=product.pk)
+        configurations = [{"product_length": 1000}, {"product_length": 1001}]
+
+        swept = ProductEngine.sweep_dimensions(self.engine_payload(product), configurations)
+        full = list(ProductEngine.run_many(self.engine_payload(product), configurations))
+        self.assertEqual(swept[0]["parts"][1]["finished_dims"]["l"], 999.9999)
+        for dims, item in zip(swept, full):
+            self.assertEqual(
+                [p["finished_dims"] for p in dims["parts"]],
+                [p["finished_dims"] for p in item["result"]["bom"]["parts"]],
+            )
+
+
+class MultiMaterialCutlistTests(EngineFixtureMixin, TestCase):
+
+    def setUp(self):
+        definition_cache.clear()
+        product = self.build_product("Two tone", 2)
+        mm = MeasurementUnit.objects.get(code="MM")
+        panel = BillingUnit.objects.get(code="PANEL")
+        self.shutter = WoodMaterial.objects.create(
+            tenant=self.tenant, material_grp=self.material.material_grp, name="MDF 18", color="Oak",
+            length_value=2440, length_unit=mm, width_value=1830, width_unit=mm,
+            thickness_value=18, thickness_unit=mm,
+            cost_price=3500, cost_unit=panel, sell_price=5000, sell_unit=panel,
+        )
+        # Panel 1 is cut from the second board
+        PartMaterialWhitelist.objects.filter(part_template__product=product, part_template__name__iexact="Panel 1").update(
+            material=self.shutter,
+        )
+        self.product = ModularProduct.objects.get(pk=product.pk)
+
+    def test_parts_nest_on_their_own_boards(self):
+        # The main board is selected; Panel 1 does not whitelist it and keeps its own
+        payload = self.engine_payload(self.product, material_selections={"default": self.material.id})
+        result = ProductEngine(payload).run()
+        cutlist = result["cutlist"]
+
+        self.assertEqual({s["material_id"] for s in cutlist["sheets"]}, {self.material.id, self.shutter.id})
+        groups = {g["material_id"]: g for g in cutlist["materials"]}
+        self.assertEqual(groups[self.shutter.id]["raw_dims"], {"w": 1830.0, "h": 2440.0})
+        self.assertEqual(groups[self.material.id]["sheets"], 1)
 
-# Create your tests here.
+        sheet = result["pricing"]["pricing_options"]["sheet"]
+        prices = {m["material_id"]: m["sheet_price"] for m in sheet["materials"]}
+        self.assertEqual(prices[self.shutter.id], Decimal(str(self.shutter.sell_price_panel)).quantize(Decimal("1.00")))
+        self.assertEqual(prices[self.material.id], Decimal(str(self.material.sell_price_panel)).quantize(Decimal("1.00")))
@@ -1,5 +1,32 @@
 # utils/expression_dependencies.py
 import ast
+import heapq
+from collections import deque
+
+# Equation attributes read from a part: the Part shape and PartTemplate columns
+EQUATION_FIELDS = (
+    "length_expr", "width_expr", "quantity_expr",
+    "part_length_equation", "part_width_equation", "part_qty_equation",
+)
+
+# Finished dimensions a part publishes to later formulas (see ProductContext)
+PART_DIMENSION_SUFFIXES = ("_length", "_width")
+
+
+def normalize_part_name(name: str) -> str:
+    """Same key ProductContext.update_calculated_part uses: 'Side Panel' -> 'side_panel'."""
+    return str(name).lower().replace(" ", "_")
+
+
+def part_identifiers(part) -> set[str]:
+    """All variable names read by a part's equations."""
+    identifiers = set()
+    for field in EQUATION_FIELDS:
+        expr = getattr(part, field, None)
+        if expr:
+            identifiers |= extract_identifiers(expr)
+    return identifiers
+
 
 def extract_identifiers(expression: str) -> set[str]:
     """
@@ -35,17 +62,24 @@ def extract_part_dependencies(
         elif key.startswith("part_") and key in part_id_map:
             dependencies.add(part_id_map[key])
 
+        else:
+            # 'side_panel_length' refers to the finished size of SIDE PANEL
+            for suffix in PART_DIMENSION_SUFFIXES:
+                if key.endswith(suffix) and key[: -len(suffix)] in part_name_map:
+                    dependencies.add(part_name_map[key[: -len(suffix)]])
+
     return dependencies
 
 def build_dependency_graph(parts):
     """
-    parts = iterable of Part objects
+    parts = iterable of Part or PartTemplate objects
     """
+    parts = list(parts)
     graph = {}
 
     # Pre-build lookup maps
     part_name_map = {
-        part.normalized_name: part.id
+        (getattr(part, "normalized_name", None) or normalize_part_name(part.name)): part.id
         for part in parts
     }
 
@@ -62,12 +96,7 @@ def build_dependency_graph(parts):
         for part in parts
     }
     for part in parts:
-        identifiers = set()
-
-        for field in ("length_expr", "width_expr", "quantity_expr"):
-            expr = getattr(part, field, None)
-            if expr:
-                identifiers |= extract_identifiers(expr)
+        identifiers = part_identifiers(part)
 
         deps = extract_part_dependencies(
             identifiers,
@@ -81,6 +110,8 @@ def build_dependency_graph(parts):
         graph[part.id] = deps
 
     return graph
+
+
 def has_circular_dependency(graph: dict[int, set[int]]) -> bool:
     visited = set()
     stack = set()
@@ -102,3 +133,53 @@ def has_circular_dependency(graph: dict[int, set[int]]) -> bool:
         return False
 
     return any(visit(node) for node in graph)
+
+
+def topological_order(graph: dict[int, set[int]], order=None) -> list[int]:
+    """
+    Order parts so every part comes after the parts it depends on.
+    Among parts that are ready, the earliest in the given order (default:
+    graph order) goes first, so products without cross-part references
+    evaluate exactly as before.
+    Raises ValueError on a circular dependency.
+    """
+    order = list(order if order is not None else graph)
+    position = {node: i for i, node in enumerate(order)}
+    remaining = {node: len(graph.get(node, ())) for node in order}
+    dependents = {node: [] for node in order}
+    for node in order:
+        for dep in graph.get(node, ()):
+            dependents.setdefault(dep, []).append(node)
+
+    ready = [position[node] for node in order if remaining[node] == 0]
+    heapq.heapify(ready)
+    result = []
+    while ready:
+        node = order[heapq.heappop(ready)]
+        result.append(node)
+        for child in dependents.get(node, ()):
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                heapq.heappush(ready, position[child])
+
+    if len(result) != len(order):
+        stuck = [node for node in order if remaining[node] > 0]
+        raise ValueError(f"Circular dependency between parts: {stuck}")
+    return result
+
+
+def transitive_dependents(graph: dict[int, set[int]], roots) -> set[int]:
+    """Every part that reads, directly or through other parts, one of the roots."""
+    dependents = {}
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents.setdefault(dep, set()).add(node)
+
+    seen = set(roots)
+    queue = deque(seen)
+    while queue:
+        for child in dependents.get(queue.popleft(), ()):
+            if child not in seen:
+                seen.add(child)
+                queue.append(child)
+    return seen
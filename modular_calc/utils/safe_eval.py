@@ -2,6 +2,7 @@
 
 import math
 import operator
+from modular_calc.evaluation.expression_cache import compile_expression
 
 ALLOWED_NAMES = {
     # math
@@ -28,8 +29,8 @@ def safe_eval(expr: str, context: dict):
     if not isinstance(expr, str):
         raise ValueError("Expression must be a string")
 
-    # Compile first (catches syntax errors early)
-    code = compile(expr, "<expression>", "eval")
+    # Compile first (catches syntax errors early); cached per process
+    code = compile_expression(expr).code
 
     # Block any forbidden names
     for name in code.co_names:
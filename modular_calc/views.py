@@ -7,7 +7,8 @@ from django.db.models.functions import Cast
 from django.utils import timezone
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+import json
 
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
@@ -17,6 +18,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from modular_calc.evaluation.product_engine import ProductEngine
+from modular_calc.evaluation.definition_cache import get_product_definition
+from modular_calc.evaluation.result_cache import evaluate_cached
+from modular_calc.evaluation.batch import MAX_BATCH_CONFIGURATIONS, expand_grid, summarize
 
 from accounts.mixins import TenantSafeViewSetMixin
 
@@ -36,7 +40,7 @@ from material.models.edgeband import EdgeBand
 from material.models.hardware import Hardware
 
 from .evaluation.bom_builder import BOMBuilder
-from .evaluation.cutlist_optimizer import CutlistOptimizer
+from .evaluation.cutlist_optimizer import CutlistOptimizer, RELEASE_BUDGET_MS
 from .evaluation.validators import validate_boolean_expression
 from .evaluation.context import ProductContext
 from .evaluation.part_evaluator import PartEvaluator
@@ -109,6 +113,9 @@ class ModularProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
                 Q(category__name__icontains=search) |
                 Q(type__name__icontains=search)
             ).distinct()
+        if self.action in ("evaluate", "evaluate_batch"):
+            # The definition comes from the cache; only the row itself is needed
+            qs = qs.prefetch_related(None)
         return qs.order_by("name")
 
     def _safe_float(self, val, default=0.0):
@@ -138,27 +145,15 @@ class ModularProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
             return [self._deep_float_convert(i) for i in obj]
         return obj
 
-    @action(detail=True, methods=['post'])
-    def evaluate(self, request, pk=None):
-        product = self.get_object()
-        data = request.data
-        
-        # 1. Material & Setup
-        material_id = data.get("material_id")
-        if not material_id:
-            return Response({"error": "material_id is required"}, status=400) 
-        
-        selected_material = get_object_or_404(
-            WoodMaterial, id=material_id, tenant=request.user.tenant
-        )
-
+    def _base_engine_payload(self, product, definition, data, selected_material):
+        """Engine payload from request data: dims, merged parameters and quantities."""
         def safe_float(value, default=0.0):
             try:
                 return float(value) if value is not None else float(default)
             except (ValueError, TypeError):
                 return float(default)
 
-        # 2. Dimensions
+        # Dimensions
         L = safe_float(data.get("product_length") or data.get("L"), 1000)
         W = safe_float(data.get("product_width") or data.get("W"), 600)
         H = safe_float(data.get("product_height") or data.get("H"), 720)
@@ -171,11 +166,11 @@ class ModularProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
             "quantity": qty,
         }
 
-        # 3. Parameters (Merge System Truth + User Overrides)
+        # Parameters (Merge System Truth + User Overrides)
         # We fetch the clean abbreviations (D1FH, etc.) directly from the DB
         system_defaults = {
-            p.abbreviation: safe_float(p.default_value) 
-            for p in product.parameters.all()
+            abbr: safe_float(value)
+            for abbr, value in definition.parameter_defaults.items()
         }
 
         raw_params = data.get("parameters") or data.get("custom_parameters") or {}
@@ -191,20 +186,43 @@ class ModularProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
         if isinstance(data.get("quantities"), list):
             quantities = [int(safe_float(q)) for q in data.get("quantities")]
 
+        # Optional anytime cutlist search, e.g. INTERACTIVE_BUDGET_MS for sliders
+        budget = data.get("cutlist_budget_ms")
+        cutlist_budget_ms = min(safe_float(budget), RELEASE_BUDGET_MS) if budget not in (None, "") else None
+
+        return {
+            "product": product,
+            "product_dims": product_dims,
+            "parameters": cleaned_params, # Contains D1FH from DB
+            "quantities": quantities,
+            "selected_material": selected_material,
+            "definition": definition,
+            "cutlist_budget_ms": cutlist_budget_ms,
+        }
+
+    @action(detail=True, methods=['post'])
+    def evaluate(self, request, pk=None):
+        product = self.get_object()
+        definition = get_product_definition(product)
+        data = request.data
+        
+        # 1. Material & Setup
+        material_id = data.get("material_id")
+        if not material_id:
+            return Response({"error": "material_id is required"}, status=400) 
+        
+        selected_material = get_object_or_404(
+            WoodMaterial, id=material_id, tenant=request.user.tenant
+        )
+
+        engine_payload = self._base_engine_payload(product, definition, data, selected_material)
+        cleaned_params = engine_payload["parameters"]
+
         # -------------------
         # 2️⃣ Run Engine
         # -------------------
         try:
-            engine_payload = {
-                "product": product,
-                "product_dims": product_dims,
-                "parameters": cleaned_params, # Contains D1FH from DB
-                "quantities": quantities,
-                "selected_material": selected_material,   
-            }
-
-            engine = ProductEngine(engine_payload)
-            raw_output = engine.run()
+            raw_output, cache_hit, cache_key = evaluate_cached(engine_payload)
             engine_output = self._deep_float_convert(raw_output)
 
         except Exception as e:
@@ -236,7 +254,70 @@ class ModularProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
             "engine_output": engine_output,
             "ai_suggestions": ai_suggestions,
             "constraint_analysis": constraint_analysis,
+            "cache_hit": cache_hit,
+            "cache_key": cache_key,
         }, status=200)
+
+    @action(detail=True, methods=['post'], url_path='evaluate-batch')
+    def evaluate_batch(self, request, pk=None):
+        """
+        Evaluates many configurations of one product and streams one JSON
+        line per configuration (application/x-ndjson).
+        Payload: base fields as for `evaluate`, plus either
+        "configurations": [{"product_width": 600, "parameters": {...}}, ...] or
+        "grid": {"product_width": {"start": 300, "stop": 1200, "step": 50}, "product_height": [720, 900]}.
+        "detail": "full" streams the whole engine output instead of the price summary;
+        "detail": "dimensions" streams only part sizes from one array pass (needs numpy).
+        """
+        product = self.get_object()
+        definition = get_product_definition(product)
+        data = request.data
+
+        material_id = data.get("material_id")
+        if not material_id:
+            return Response({"error": "material_id is required"}, status=400)
+        selected_material = get_object_or_404(
+            WoodMaterial, id=material_id, tenant=request.user.tenant
+        )
+
+        try:
+            if data.get("grid"):
+                configurations = expand_grid(data["grid"])
+            else:
+                configurations = list(data.get("configurations") or [])
+        except (ValueError, TypeError, KeyError) as e:
+            return Response({"error": f"Invalid grid: {e}"}, status=400)
+        if not configurations:
+            return Response({"error": "configurations or grid is required"}, status=400)
+        if len(configurations) > MAX_BATCH_CONFIGURATIONS:
+            return Response({"error": f"At most {MAX_BATCH_CONFIGURATIONS} configurations per batch"}, status=400)
+
+        base_payload = self._base_engine_payload(product, definition, data, selected_material)
+        full = data.get("detail") == "full"
+
+        if data.get("detail") == "dimensions":
+            try:
+                items = ProductEngine.sweep_dimensions(base_payload, configurations)
+            except ImportError as e:
+                return Response({"error": str(e)}, status=501)
+            except (NameError, ValueError) as e:
+                return Response({"error": f"Engine calculation failed: {e}"}, status=400)
+            response = StreamingHttpResponse(
+                (json.dumps(item, default=str) + "\n" for item in items), content_type="application/x-ndjson"
+            )
+            response["X-Batch-Size"] = str(len(configurations))
+            return response
+
+        def stream():
+            for item in ProductEngine.run_many(base_payload, configurations):
+                if "result" in item:
+                    item["result"] = self._deep_float_convert(item["result"] if full else summarize(item["result"]))
+                yield json.dumps(item, default=str) + "\n"
+
+        response = StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+        response["X-Batch-Size"] = str(len(configurations))
+        return response
+
     @action(detail=True, methods=['post'], url_path='set-part-default-material')
     def set_part_default_material(self, request, pk=None):
         """
@@ -967,10 +967,18 @@ class Module(models.Model):
         print(f"DEBUG: Calling calculate_optimal_material_usage with blade_size_mm: {actual_blade_size_for_packing}")
         print(f"DEBUG: Calling calculate_optimal_material_usage with rotation_allowed: {rotation_allowed}") # Pass this if packing_service supports it
 
-        # This is the line that calls the function being patched
-        packed_material_results = calculate_optimal_material_usage(
-            parts_data, material_sheets_data, actual_blade_size_for_packing, rotation_allowed=rotation_allowed # Pass rotation_allowed
-        )
+        # Pack each material on its own stock; every entry of the sheet list
+        # is one physical sheet, so offer as many as there are pieces
+        packed_material_results = {}
+        for sheet in material_sheets_data:
+            material_parts = [p for p in parts_data if p['material_id'] == sheet['material_id']]
+            if not material_parts:
+                continue
+            piece_count = sum(p['quantity'] for p in material_parts)
+            packed_material_results[sheet['material_name']] = calculate_optimal_material_usage(
+                material_parts, [sheet] * piece_count,
+                rotation_allowed=rotation_allowed, blade_size_mm=actual_blade_size_for_packing,
+            )
         print("DEBUG: calculate_optimal_material_usage was called and returned results.")
 
         module_packing_analysis = {}
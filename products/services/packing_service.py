@@ -3,12 +3,105 @@ from decimal import Decimal
 DEFAULT_BRAND = "Generic"
 DEFAULT_GRAIN_DIRECTION = None  # Grain constraint off unless specified
 
+
+class MaxRectsSheet:
+    """
+    Free space of one sheet as maximal free rectangles (x, y, w, l): every
+    largest empty rectangle, overlaps allowed. The lowest-then-leftmost
+    position a part fits at is always the corner of one of them, so
+    placement looks at a few dozen rectangles instead of every (x, y)
+    on the sheet.
+    """
+
+    __slots__ = ("width", "length", "free")
+
+    def __init__(self, width, length):
+        self.width = width
+        self.length = length
+        self.free = [(0.0, 0.0, width, length)] if width > 0 and length > 0 else []
+
+    def find_bottom_left(self, w, l, allow_rotation):
+        """(x, y, rotated) with the lowest y, then x, unrotated first; or None."""
+        orientations = [(w, l, False)]
+        if allow_rotation and w != l:
+            orientations.append((l, w, True))
+        best = None
+        for fx, fy, fw, fl in self.free:
+            for ow, ol, rotated in orientations:
+                if ow <= fw and ol <= fl:
+                    candidate = (fy, fx, rotated)
+                    if best is None or candidate < best:
+                        best = candidate
+        if best is None:
+            return None
+        y, x, rotated = best
+        return x, y, rotated
+
+    def place(self, x, y, w, l):
+        """Carve the footprint out of every free rectangle it overlaps."""
+        x2, y2 = x + w, y + l
+        kept = []
+        for fx, fy, fw, fl in self.free:
+            fx2, fy2 = fx + fw, fy + fl
+            if x >= fx2 or x2 <= fx or y >= fy2 or y2 <= fy:
+                kept.append((fx, fy, fw, fl))
+                continue
+            if x > fx:
+                kept.append((fx, fy, x - fx, fl))
+            if x2 < fx2:
+                kept.append((x2, fy, fx2 - x2, fl))
+            if y > fy:
+                kept.append((fx, fy, fw, y - fy))
+            if y2 < fy2:
+                kept.append((fx, y2, fw, fy2 - y2))
+        self.free = self._prune(kept)
+
+    @staticmethod
+    def _prune(rects):
+        # Drop rectangles contained in another; larger ones first so the
+        # survivors are checked against few candidates
+        rects.sort(key=lambda r: r[2] * r[3], reverse=True)
+        maximal = []
+        for fx, fy, fw, fl in rects:
+            contained = False
+            for mx, my, mw, ml in maximal:
+                if mx <= fx and my <= fy and fx + fw <= mx + mw and fy + fl <= my + ml:
+                    contained = True
+                    break
+            if not contained:
+                maximal.append((fx, fy, fw, fl))
+        return maximal
+
+
+def _part_rows(parts_queryset):
+    """One row per piece; accepts Part1 objects or the dicts Module builds."""
+    all_parts = []
+    for part in parts_queryset:
+        if isinstance(part, dict):
+            width, length, quantity = part['width_mm'], part['length_mm'], part.get('quantity', 1)
+            brand = part.get('material_brand', DEFAULT_BRAND)
+            grain = part.get('grain_direction', DEFAULT_GRAIN_DIRECTION)
+        else:
+            dims = part.compute_dimensions()
+            width, length, quantity = dims['width'], dims['length'], dims['quantity']
+            brand = getattr(getattr(part.part_material, 'brand', None), 'name', DEFAULT_BRAND)
+            grain = part.part_dimensions.get('grain_direction', DEFAULT_GRAIN_DIRECTION)
+        for _ in range(int(quantity)):
+            all_parts.append({
+                'width_mm': float(width),
+                'length_mm': float(length),
+                'material_brand': brand,
+                'grain_direction': grain,
+            })
+    return all_parts
+
+
 def calculate_optimal_material_usage(parts_queryset, material_sheets_data, rotation_allowed=True, blade_size_mm=0.0):
     """
     Calculates optimal material usage for a list of parts with constraints using a 2D greedy algorithm.
 
     Args:
-        parts_queryset: Django queryset of Part1 objects.
+        parts_queryset: Django queryset of Part1 objects, or dicts with width_mm, length_mm and quantity.
         material_sheets_data (list): [{'width_mm': 1200, 'length_mm': 2400, 'brand': 'XYZ'}]
         rotation_allowed (bool): Whether rotation of parts is allowed.
         blade_size_mm (float): Saw kerf size to leave between parts.
@@ -16,52 +109,10 @@ def calculate_optimal_material_usage(parts_queryset, material_sheets_data, rotat
     Returns:
         dict: Packing result including layout, area used, wastage %, etc.
     """
-
-    def intersects(rect1, rect2):
-        r1_x1, r1_y1, r1_w, r1_h = rect1
-        r1_x2, r1_y2 = r1_x1 + r1_w, r1_y1 + r1_h
-        r2_x1, r2_y1, r2_w, r2_h = rect2
-        r2_x2, r2_y2 = r2_x1 + r2_w, r2_y1 + r2_h
-        return not (r1_x2 <= r2_x1 or r1_x1 >= r2_x2 or r1_y2 <= r2_y1 or r1_y1 >= r2_y2)
-
-    def find_placement(sheet_w, sheet_l, occupied, w, l, allow_rotation, blade):
-        w_k = w + blade
-        l_k = l + blade
-        max_x = int(sheet_w - blade)
-        max_y = int(sheet_l - blade)
-
-        for y in range(max_y + 1):
-            for x in range(max_x + 1):
-                # Try original
-                if x + w_k <= sheet_w and y + l_k <= sheet_l:
-                    new_rect = (x, y, w_k, l_k)
-                    if not any(intersects(new_rect, r) for r in occupied):
-                        return x, y, w, l, False
-
-                # Try rotated
-                if allow_rotation and w != l:
-                    w_r, l_r = l, w
-                    w_k_r = w_r + blade
-                    l_k_r = l_r + blade
-                    if x + w_k_r <= sheet_w and y + l_k_r <= sheet_l:
-                        new_rect = (x, y, w_k_r, l_k_r)
-                        if not any(intersects(new_rect, r) for r in occupied):
-                            return x, y, w_r, l_r, True
-        return None
+    blade = float(blade_size_mm or 0)
 
     # --- Step 1: Build list of parts with metadata ---
-    all_parts = []
-    for part in parts_queryset:
-        dims = part.compute_dimensions()
-        brand = getattr(getattr(part.part_material, 'brand', None), 'name', DEFAULT_BRAND)
-        grain = part.part_dimensions.get('grain_direction', DEFAULT_GRAIN_DIRECTION)
-        for _ in range(dims['quantity']):
-            all_parts.append({
-                'width_mm': float(dims['width']),
-                'length_mm': float(dims['length']),
-                'material_brand': brand,
-                'grain_direction': grain,
-            })
+    all_parts = _part_rows(parts_queryset)
 
     # Sort by largest dimension for better greedy fitting
     all_parts.sort(key=lambda p: max(p['width_mm'], p['length_mm']), reverse=True)
@@ -80,45 +131,43 @@ def calculate_optimal_material_usage(parts_queryset, material_sheets_data, rotat
         sheet_l = float(sheet['length_mm'])
         sheet_brand = sheet.get('brand', DEFAULT_BRAND)
 
-        sheet_occupied = []
+        # Every footprint carries one kerf; the far sheet edges need none
+        # beyond it, same as the old per-position scan
+        free_space = MaxRectsSheet(sheet_w, sheet_l)
         sheet_layout = []
+        unplaced = []
 
-        i = 0
-        while i < len(remaining_parts):
-            part = remaining_parts[i]
-
+        for part in remaining_parts:
             # Filter: Brand match
             if part['material_brand'] != sheet_brand:
-                i += 1
+                unplaced.append(part)
                 continue
 
             # Filter: Grain direction constraint
             part_grain = part.get('grain_direction')
-            rot_allowed = rotation_allowed
-            if part_grain is not None:
-                rot_allowed = False  # No rotation allowed if grain is specified
-
-            result = find_placement(
-                sheet_w, sheet_l, sheet_occupied,
-                part['width_mm'], part['length_mm'],
-                rot_allowed, blade_size_mm
-            )
-
-            if result:
-                x, y, w, l, rotated = result
-                sheet_occupied.append((x, y, w + blade_size_mm, l + blade_size_mm))
-                sheet_layout.append({
-                    'x_pos_mm': x,
-                    'y_pos_mm': y,
-                    'width_mm': w,
-                    'length_mm': l,
-                    'rotated': rotated,
-                    'grain_direction': part_grain,
-                    'material_brand': part['material_brand']
-                })
-                remaining_parts.pop(i)
-            else:
-                i += 1
+            rot_allowed = rotation_allowed and part_grain is None  # No rotation if grain is specified
+
+            w, l = part['width_mm'], part['length_mm']
+            fit = free_space.find_bottom_left(w + blade, l + blade, rot_allowed)
+            if fit is None:
+                unplaced.append(part)
+                continue
+
+            x, y, rotated = fit
+            if rotated:
+                w, l = l, w
+            free_space.place(x, y, w + blade, l + blade)
+            sheet_layout.append({
+                'x_pos_mm': x,
+                'y_pos_mm': y,
+                'width_mm': w,
+                'length_mm': l,
+                'rotated': rotated,
+                'grain_direction': part_grain,
+                'material_brand': part['material_brand']
+            })
+
+        remaining_parts = unplaced
 
         if sheet_layout:
             final_layout.append({
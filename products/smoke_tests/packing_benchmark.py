@@ -0,0 +1,97 @@
+"""
+Placement time per part for calculate_optimal_material_usage: the old
+per-position scan (every integer (x, y) on the sheet, each checked
+against every placed rectangle) vs the maximal-rectangles packer.
+The scan is only timed on small orders; it grows with sheet area.
+
+    python -m products.smoke_tests.packing_benchmark
+"""
+import random
+import time
+
+from products.services.packing_service import calculate_optimal_material_usage
+
+SHEET = {"width_mm": 1220, "length_mm": 2440}
+LEGACY_LIMIT = 12
+
+
+def order(part_count, seed=11, grain_share=0.3):
+    rng = random.Random(seed)
+    return [
+        {
+            "width_mm": rng.randrange(150, 1100),
+            "length_mm": rng.randrange(80, 700),
+            "quantity": 1,
+            "grain_direction": "vertical" if rng.random() < grain_share else None,
+        }
+        for _ in range(part_count)
+    ]
+
+
+def legacy_usage(parts, sheets, rotation_allowed=True, blade_size_mm=0.0):
+    """The replaced scan, kept here only for comparison. Returns (sheet count, layout)."""
+
+    def intersects(r1, r2):
+        return not (r1[0] + r1[2] <= r2[0] or r1[0] >= r2[0] + r2[2] or
+                    r1[1] + r1[3] <= r2[1] or r1[1] >= r2[1] + r2[3])
+
+    def find_placement(sheet_w, sheet_l, occupied, w, l, allow_rotation, blade):
+        for y in range(int(sheet_l - blade) + 1):
+            for x in range(int(sheet_w - blade) + 1):
+                for ow, ol, rotated in ((w, l, False), (l, w, True)):
+                    if rotated and not (allow_rotation and w != l):
+                        continue
+                    if x + ow + blade <= sheet_w and y + ol + blade <= sheet_l:
+                        rect = (x, y, ow + blade, ol + blade)
+                        if not any(intersects(rect, r) for r in occupied):
+                            return x, y, ow, ol, rotated
+        return None
+
+    rows = []
+    for p in parts:
+        rows.extend([(float(p["width_mm"]), float(p["length_mm"]), p.get("grain_direction"))] * p.get("quantity", 1))
+    rows.sort(key=lambda r: max(r[0], r[1]), reverse=True)
+
+    layout = []
+    for sheet in sheets:
+        if not rows:
+            break
+        occupied, placed, unplaced = [], [], []
+        for w, l, grain in rows:
+            fit = find_placement(float(sheet["width_mm"]), float(sheet["length_mm"]), occupied, w, l,
+                                 rotation_allowed and grain is None, blade_size_mm)
+            if fit is None:
+                unplaced.append((w, l, grain))
+                continue
+            x, y, pw, pl, rotated = fit
+            occupied.append((x, y, pw + blade_size_mm, pl + blade_size_mm))
+            placed.append((x, y, pw, pl, rotated))
+        rows = unplaced
+        if placed:
+            layout.append(placed)
+    return len(layout), layout
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run():
+    for count in (LEGACY_LIMIT, 200, 2000):
+        parts = order(count)
+        sheets = [SHEET] * count
+        print(f"--- {count} parts ---")
+        if count <= LEGACY_LIMIT:
+            (used, _), elapsed = _time(lambda: legacy_usage(parts, sheets, blade_size_mm=4.0))
+            print(f"per-position scan : {elapsed / count * 1000:10.3f} ms/part  {used:4d} sheets")
+        report, elapsed = _time(lambda: calculate_optimal_material_usage(parts, sheets, blade_size_mm=4.0))
+        print(
+            f"maximal rectangles: {elapsed / count * 1000:10.3f} ms/part  {report['total_sheets_used']:4d} sheets "
+            f"{report['calculated_wastage_percentage']:6}% waste"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,50 @@
+import unittest
+from decimal import Decimal
+
+from products.services.packing_service import calculate_optimal_material_usage
+from products.smoke_tests.packing_benchmark import legacy_usage, order
+
+SMALL_SHEET = {"width_mm": 240, "length_mm": 160}
+
+
+class TestPackingService(unittest.TestCase):
+
+    def test_same_layout_as_the_position_scan(self):
+        # Whole-mm sizes on a small sheet, so the old scan stays cheap
+        for seed in range(2):
+            parts = [
+                {**p, "width_mm": p["width_mm"] // 10, "length_mm": p["length_mm"] // 10}
+                for p in order(14, seed=seed)
+            ]
+            sheets = [SMALL_SHEET] * 14
+            for rotation_allowed in (True, False):
+                _, expected = legacy_usage(parts, sheets, rotation_allowed, blade_size_mm=3.0)
+                report = calculate_optimal_material_usage(parts, sheets, rotation_allowed, blade_size_mm=3.0)
+                layout = [
+                    [(r["x_pos_mm"], r["y_pos_mm"], r["width_mm"], r["length_mm"], r["rotated"]) for r in s["packed_rects"]]
+                    for s in report["layout"]
+                ]
+                self.assertEqual(layout, expected)
+
+    def test_brands_fill_only_their_own_sheets(self):
+        parts = [
+            {"width_mm": 200, "length_mm": 100, "quantity": 2, "material_brand": "Action"},
+            {"width_mm": 200, "length_mm": 100, "quantity": 1, "material_brand": "Century"},
+        ]
+        sheets = [dict(SMALL_SHEET, brand="Action"), dict(SMALL_SHEET, brand="Century")]
+        report = calculate_optimal_material_usage(parts, sheets)
+        brands = [[r["material_brand"] for r in s["packed_rects"]] for s in report["layout"]]
+        self.assertEqual(brands, [["Action"], ["Century"]])
+
+    def test_wastage_and_kerf(self):
+        parts = [{"width_mm": 120, "length_mm": 160, "quantity": 2}]
+        exact = calculate_optimal_material_usage(parts, [SMALL_SHEET] * 2)
+        self.assertEqual(exact["total_sheets_used"], 1)
+        self.assertEqual(exact["calculated_wastage_percentage"], Decimal("0.00"))
+        with_kerf = calculate_optimal_material_usage(parts, [SMALL_SHEET] * 2, blade_size_mm=1)
+        self.assertEqual(with_kerf["total_sheets_used"], 2)
+        self.assertEqual(with_kerf["calculated_wastage_percentage"], Decimal("50.00"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,58 +1,73 @@
-from ..models import QuoteRequest, QuoteSolution, QuoteProduct, QuotePart, QuotePartHardware
+from django.db import transaction
 
+from ..models import QuoteLineItem, QuoteRequest, QuoteSolution, QuoteProduct, QuotePart, QuotePartHardware
+
+BATCH_SIZE = 500
+
+
+@transaction.atomic
 def create_quote_revision(old_quote_id):
     """
     Main entry point to create a R+1 revision of a quote.
+    The tree is copied level by level with bulk inserts, so the query
+    count does not grow with the number of solutions, products or parts.
     """
     old_quote = QuoteRequest.objects.get(id=old_quote_id)
-    
-    # 1. Duplicate the QuoteRequest
-    new_quote = old_quote
-    new_quote.pk = None  # Reset primary key to create new record
+
+    # 1. Duplicate the QuoteRequest (a fresh instance, so old_quote keeps pointing at the original)
+    new_quote = QuoteRequest.objects.get(id=old_quote_id)
+    new_quote.pk = None
     new_quote.revision_number += 1
+    new_quote.quote_number = f"{old_quote.quote_number}-R{new_quote.revision_number}"[:30]
+    new_quote.status = "draft"
     new_quote.is_locked = False
+    new_quote.workspace_version = 0
     new_quote.save()
 
-    # 2. Duplicate Solutions
-    for sol in old_quote.solutions.all():
-        clone_solution(sol, new_quote)
-
-    return new_quote
+    # 2. Duplicate Solutions, Products, Parts and Hardware
+    solutions = clone_rows(old_quote.solutions.order_by("id"), quote_id=new_quote.pk)
+    products = clone_rows(
+        QuoteProduct.objects.filter(solution__quote=old_quote).order_by("id"),
+        solution_id=solutions,
+    )
+    relink_parents(products)
+    parts = clone_rows(
+        QuotePart.objects.filter(quote_product__solution__quote=old_quote).order_by("id"),
+        quote_product_id=products,
+    )
+    clone_rows(
+        QuotePartHardware.objects.filter(quote_part__quote_product__solution__quote=old_quote).order_by("id"),
+        quote_part_id=parts,
+    )
 
-def clone_solution(old_sol, new_quote):
-    """
-    Clones Solution and triggers Product cloning.
-    """
-    new_sol = old_sol
-    new_sol.pk = None
-    new_sol.quote = new_quote
-    new_sol.save()
+    # 3. Standard line items; bulk_create skips their save(), the copied totals already count them
+    clone_rows(QuoteLineItem.objects.filter(quote=old_quote).order_by("id"), quote_id=new_quote.pk)
 
-    for prod in old_sol.products.all():
-        clone_product(prod, new_sol)
+    return new_quote
 
-def clone_product(old_prod, new_sol):
+def clone_rows(queryset, **links):
     """
-    Clones Product and triggers Part cloning.
+    Bulk-inserts copies of the rows. Each keyword names a foreign key
+    column and gives either the new value or a {old id: new instance}
+    map from the level above. Returns {old id: new instance}.
     """
-    new_prod = old_prod
-    new_prod.pk = None
-    new_prod.solution = new_sol
-    new_prod.save()
+    rows = list(queryset)
+    old_ids = [row.pk for row in rows]
+    for row in rows:
+        row.pk = None
+        row._state.adding = True
+        for column, target in links.items():
+            if isinstance(target, dict):
+                setattr(row, column, target[getattr(row, column)].pk)
+            else:
+                setattr(row, column, target)
+    created = queryset.model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return dict(zip(old_ids, created))
 
-    for part in old_prod.parts.all():
-        clone_part(part, new_prod)
-
-def clone_part(old_part, new_prod):
-    """
-    Clones Part and triggers Hardware cloning.
-    """
-    new_part = old_part
-    new_part.pk = None
-    new_part.quote_product = new_prod
-    new_part.save()
-
-    for hw in old_part.hardware.all():
-        hw.pk = None
-        hw.quote_part = new_part
-        hw.save()
\ No newline at end of file
+def relink_parents(products):
+    """Points copied child products (bundle parts) at their copied parents."""
+    children = [qp for qp in products.values() if qp.parent_id in products]
+    for qp in children:
+        qp.parent_id = products[qp.parent_id].pk
+    if children:
+        QuoteProduct.objects.bulk_update(children, ["parent"], batch_size=BATCH_SIZE)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quoting.models import QuoteRequest
+from quoting.services.recalculation import reconcile_quote
+
+
+class Command(BaseCommand):
+    help = "Check incrementally kept quote totals against a full recount (run periodically)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("quote_ids", nargs="*", type=int, help="Quotes to check (default: every open quote)")
+        parser.add_argument("--fix", action="store_true", help="Write the recounted totals back")
+
+    def handle(self, *args, **options):
+        quotes = QuoteRequest.objects.all()
+        if options["quote_ids"]:
+            quotes = quotes.filter(id__in=options["quote_ids"])
+        else:
+            quotes = quotes.exclude(status__in=["locked", "cancelled"])
+
+        drifted = 0
+        for quote_id in quotes.values_list("id", flat=True).iterator():
+            with transaction.atomic():
+                quote = QuoteRequest.objects.select_for_update().get(pk=quote_id)
+                drift = reconcile_quote(quote, fix=options["fix"])
+            if drift:
+                drifted += 1
+                for row in drift:
+                    self.stdout.write(
+                        f"{quote.quote_number}: {row['model']} {row['id']} {row['field']} "
+                        f"stored {row['stored']} expected {row['expected']}"
+                    )
+
+        action = "fixed" if options["fix"] else "found"
+        style = self.style.WARNING if drifted else self.style.SUCCESS
+        self.stdout.write(style(f"{drifted} quote(s) with drifted totals {action}"))
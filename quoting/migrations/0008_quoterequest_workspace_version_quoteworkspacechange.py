@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_globalvariable_options_alter_tenant_options_and_more'),
+        ('quoting', '0007_quoteproduct_modular_product_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quoterequest',
+            name='workspace_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='QuoteWorkspaceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('version', models.PositiveBigIntegerField()),
+                ('quote_product_id', models.BigIntegerField()),
+                ('removed', models.BooleanField(default=False)),
+                ('quote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workspace_changes', to='quoting.quoterequest')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to='accounts.tenant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['quote', 'version'], name='quoting_quo_quote_i_f905ca_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_globalvariable_options_alter_tenant_options_and_more'),
+        ('quoting', '0008_quoterequest_workspace_version_quoteworkspacechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuoteSnapshotNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('digest', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('part', 'Part')], max_length=10)),
+                ('data', models.JSONField()),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_set', to='accounts.tenant')),
+            ],
+            options={
+                'unique_together': {('tenant', 'digest')},
+            },
+        ),
+    ]
@@ -78,6 +78,9 @@ class QuoteRequest(TenantModel):
         related_name="locked_quotes"
     )
 
+    # Bumped on every workspace edit; clients send the last one they saw to get a delta
+    workspace_version = models.PositiveBigIntegerField(default=0)
+
     class Meta:
         ordering = ["-created_at"]
 
@@ -122,12 +125,33 @@ class QuoteLineItem(TenantModel):
         self.line_total_sp = (self.unit_sp or 0) * (self.quantity or 1)
         self.line_total_cp = (self.unit_cp or 0) * (self.quantity or 1)
         
-        # 2. SAVE THE RECORD
-        super().save(*args, **kwargs)
-
-        # 3. TRIGGER THE EXHAUST: Update the Quote total automatically
-        from quoting.services.recalculation import recalc_quote
-        recalc_quote(self.quote)
+        from quoting.services.recalculation import bump_quote
+        with transaction.atomic():
+            # 2. SAVE THE RECORD, remembering what the quote currently counts for it
+            old_cp = old_sp = Decimal("0.00")
+            if self.pk:
+                stored = (
+                    QuoteLineItem.objects.select_for_update().filter(pk=self.pk)
+                    .values_list("line_total_cp", "line_total_sp").first()
+                )
+                if stored:
+                    old_cp, old_sp = stored
+            super().save(*args, **kwargs)
+
+            # 3. TRIGGER THE EXHAUST: Move the Quote total by the difference
+            bump_quote(self.quote_id, self.line_total_cp - old_cp, self.line_total_sp - old_sp)
+
+    def delete(self, *args, **kwargs):
+        from quoting.services.recalculation import bump_quote
+        with transaction.atomic():
+            # The quote counts the stored line totals, not this (possibly edited) instance's
+            stored = (
+                QuoteLineItem.objects.select_for_update().filter(pk=self.pk)
+                .values_list("line_total_cp", "line_total_sp").first()
+            )
+            if stored:
+                bump_quote(self.quote_id, -stored[0], -stored[1])
+            return super().delete(*args, **kwargs)
     
 class QuoteSolution(TenantModel):
     quote = models.ForeignKey(
@@ -218,9 +242,51 @@ class QuoteProduct(TenantModel):
             models.Index(fields=["tenant", "solution", "product_template"])
         ]
 
+    # Kept by quoting.services.recalculation with F() updates; a plain save() must not write back a stale copy
+    TOTAL_FIELDS = ("total_cp", "total_sp")
+
     def __str__(self):
         return f"{self.product_template.name} ({self.length_mm}x{self.width_mm})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.mark_totals_saved()
+        return instance
+
+    def _totals(self):
+        # Deferred totals are not in __dict__ and stay unread
+        return tuple(self.__dict__.get(name) for name in self.TOTAL_FIELDS)
+
+    def mark_totals_saved(self):
+        """The in-memory totals are what the row holds (read, saved or bulk-updated)."""
+        self._saved_totals = self._totals()
+
+    def refresh_totals(self):
+        """Re-reads the totals after propagate_totals or another writer moved them."""
+        self.total_cp, self.total_sp = (
+            type(self).objects.filter(pk=self.pk).values_list(*self.TOTAL_FIELDS).get()
+        )
+        self.mark_totals_saved()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            # Totals only move through set_product_totals() or an explicit update_fields
+            if self._totals() != getattr(self, "_saved_totals", self._totals()):
+                raise ValueError(
+                    "QuoteProduct totals changed on a plain save(); write them with "
+                    "quoting.services.recalculation.set_product_totals()"
+                )
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in deferred and f.name not in self.TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        written = kwargs.get("update_fields")
+        if written is None or set(self.TOTAL_FIELDS) <= set(written):
+            self.mark_totals_saved()
+
 class QuotePart(TenantModel):
     quote_product = models.ForeignKey(
         "quoting.QuoteProduct",
@@ -368,6 +434,7 @@ class QuoteRevision(TenantModel):
     )
 
     revision_no = models.PositiveIntegerField()
+    # A manifest referencing QuoteSnapshotNode digests (older revisions hold the full tree)
     snapshot = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -375,3 +442,47 @@ class QuoteRevision(TenantModel):
         unique_together = ("tenant", "quote", "revision_no")
         ordering = ["-revision_no"]
 
+    def materialize(self):
+        """The full snapshot tree, with product and part subtrees resolved from their nodes."""
+        from quoting.revisions.snapshot_store import materialize_snapshot
+        return materialize_snapshot(self.snapshot, self.tenant_id)
+
+class QuoteSnapshotNode(TenantModel):
+    """
+    A product or part subtree of a revision snapshot, stored once under
+    the SHA-256 of its content and shared by every revision containing it.
+    """
+    KIND_PRODUCT = "product"
+    KIND_PART = "part"
+
+    digest = models.CharField(max_length=64)
+    kind = models.CharField(
+        max_length=10,
+        choices=[(KIND_PRODUCT, "Product"), (KIND_PART, "Part")]
+    )
+    data = models.JSONField()
+
+    class Meta:
+        unique_together = ("tenant", "digest")
+
+class QuoteWorkspaceChange(TenantModel):
+    """
+    A product touched by a workspace edit, logged at the quote's new
+    workspace_version so clients can be sent only what changed since the
+    version they hold. quote_product_id is a plain column, not a foreign
+    key, so removals stay logged after the product is gone.
+    """
+    quote = models.ForeignKey(
+        "quoting.QuoteRequest",
+        on_delete=models.CASCADE,
+        related_name="workspace_changes"
+    )
+
+    version = models.PositiveBigIntegerField()
+    quote_product_id = models.BigIntegerField()
+    removed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["quote", "version"])
+        ]
@@ -17,8 +17,8 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from accounts.models import GlobalVariable
-from modular_calc.evaluation.product_engine import ProductEngine
-from quoting.models import QuotePart, QuotePartHardware
+from modular_calc.evaluation.definition_cache import get_product_definition
+from modular_calc.evaluation.result_cache import evaluate_cached
 
 # quoting/services.py alignment
 
@@ -42,59 +42,54 @@ class QuoteProductService:
         return ctx
 
     @staticmethod
-    def evaluate(qp):
+    def build_payload(qp):
+        product = qp.modular_product
+        if product is None:
+            raise ValidationError("Quote product has no modular product to evaluate")
+        definition = get_product_definition(product)
+
+        material = qp.override_material
+        if material is None:
+            for link in definition.default_links.values():
+                if link and link.material:
+                    material = link.material
+                    break
+        if material is None:
+            raise ValidationError("No material selected for this product")
+
         context = QuoteProductService.build_context(qp)
-        # ALIGNMENT: ProductEngine.__init__ needs (product, dims, params) 
-        engine = ProductEngine(qp.product_template, context, context)
-        # The engine's 'run' method triggers the multi-quantity logic [cite: 98]
-        return engine.run()
+        parameters = {abbr: float(v) for abbr, v in definition.parameter_defaults.items()}
+        parameters.update(context)
+        return {
+            "product": product,
+            "definition": definition,
+            "product_dims": {
+                "product_length": context["product_length"],
+                "product_width": context["product_width"],
+                "product_height": context["product_height"],
+                "quantity": qp.quantity,
+            },
+            "parameters": parameters,
+            "quantities": [qp.quantity],
+            "selected_material": material,
+        }
+
+    @staticmethod
+    def evaluate(qp):
+        """Returns (engine_output, cache_hit). The output is shared; do not mutate it."""
+        result, cache_hit, _ = evaluate_cached(QuoteProductService.build_payload(qp))
+        return result, cache_hit
 
     @staticmethod
     @transaction.atomic
     def expand_to_parts(qp):
-        # FIX: Access quote status through the solution bridge 
-        if qp.solution.quote.status == "locked":
-            raise ValidationError("Quote is locked")
-
-        # Run the aligned engine
-        results = QuoteProductService.evaluate(qp)
-        
-        # ProductEngine returns quotes mapped by quantity 
-        qty_str = str(qp.quantity)
-        evaluation = results.get("quotes", {}).get(qty_str, {}).get("bom", {})
-
-        total_cp = Decimal("0.00")
-        total_sp = Decimal("0.00")
-
-        qp.parts.all().delete()
-
-        # Iterate through the engine's BOM parts 
-        for part in evaluation.get("parts", []):
-            qp_part = QuotePart.objects.create(
-                tenant=qp.tenant,
-                quote_product=qp,
-                part_template=part.get("template_obj"),
-                part_name=part["name"],
-                length_mm=part["length"],
-                width_mm=part["width"],
-                thickness_mm=part.get("thickness", 0),
-                part_qty=part["quantity"],
-                material=part.get("material_obj"),
-                total_part_cp=part.get("total_cp", 0),
-                total_part_sp=part.get("total_sp", 0)
-            )
-            total_cp += Decimal(str(qp_part.total_part_cp))
-            total_sp += Decimal(str(qp_part.total_part_sp))
-
-        # Save the 1,045.00 total to the Product level [cite: 111, 112]
-        qp.total_cp = total_cp
-        qp.total_sp = total_sp
-        qp.validated = True
-        qp.save(update_fields=["total_cp", "total_sp", "validated"])
-
-        # Trigger global recalculation
-        from quoting.services.recalculation import recalc_quote
-        recalc_quote(qp.solution.quote)
+        """
+        Writes the product's engine BOM as QuoteParts (see
+        bulk_expand.expand_products: only changed rows are written) and
+        rolls the totals up to its solution and quote.
+        """
+        from quoting.services.bulk_expand import expand_products
+        expand_products([qp])
         return qp
 
 # quoting/services/recalculation.py
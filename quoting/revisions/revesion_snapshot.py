@@ -28,11 +28,11 @@ def build_quote_snapshot(quote):
                 "products": [
                     {
                         "id": product.id,
-                        "product_name": product.product_template.name,
+                        "product_name": product.product_template.name if product.product_template else None,
                         "qty": product.quantity,
-                        "length": product.length_mm,
-                        "width": product.width_mm,
-                        "height": product.height_mm,
+                        "length": serialize_val(product.length_mm),
+                        "width": serialize_val(product.width_mm),
+                        "height": serialize_val(product.height_mm),
                         "total_sp": serialize_val(product.total_sp),
                         "parts": [
                             {
@@ -40,12 +40,12 @@ def build_quote_snapshot(quote):
                                 "part_name": part.part_name,
                                 "material_name": part.material.name if part.material else "Unknown",
                                 "qty": part.part_qty,
-                                "length": part.length_mm,
-                                "width": part.width_mm,
+                                "length": serialize_val(part.length_mm),
+                                "width": serialize_val(part.width_mm),
                                 "total_sp": serialize_val(part.total_part_sp),
                                 "hardware": [
                                     {
-                                        "name": hw.hardware.name,
+                                        "name": hw.hardware.h_name,
                                         "qty": hw.quantity,
                                         "total_sp": serialize_val(hw.total_sp)
                                     }
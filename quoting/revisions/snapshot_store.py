@@ -0,0 +1,114 @@
+import hashlib
+import json
+
+SNAPSHOT_FORMAT = "nodes-1"
+BATCH_SIZE = 500
+
+
+def node_digest(data) -> str:
+    """SHA-256 of a subtree's canonical JSON: equal content, equal digest."""
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def store_snapshot(snapshot, tenant_id):
+    """
+    Splits a build_quote_snapshot() tree into part and product nodes and
+    returns the manifest to keep on QuoteRevision.snapshot: the quote and
+    solution headers as they are, with each product replaced by its
+    digest (and each product node listing its parts' digests). Only nodes
+    the tenant does not hold yet are inserted, so a revision of a quote
+    that changed in one cabinet writes that cabinet's nodes and nothing
+    else.
+    """
+    from quoting.models import QuoteSnapshotNode
+
+    nodes = {}
+
+    def add(kind, data):
+        digest = node_digest(data)
+        nodes.setdefault(digest, (kind, data))
+        return digest
+
+    solutions = []
+    for solution in snapshot.get("solutions", []):
+        products = []
+        for product in solution.get("products", []):
+            parts = [add(QuoteSnapshotNode.KIND_PART, part) for part in product.get("parts", [])]
+            products.append(add(QuoteSnapshotNode.KIND_PRODUCT, {**product, "parts": parts}))
+        solutions.append({**solution, "products": products})
+
+    held = set(
+        QuoteSnapshotNode.objects
+        .filter(tenant_id=tenant_id, digest__in=list(nodes))
+        .values_list("digest", flat=True)
+    )
+    QuoteSnapshotNode.objects.bulk_create(
+        [
+            QuoteSnapshotNode(tenant_id=tenant_id, digest=digest, kind=kind, data=data)
+            for digest, (kind, data) in nodes.items() if digest not in held
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return {**snapshot, "format": SNAPSHOT_FORMAT, "solutions": solutions}
+
+
+def _load_nodes(keys):
+    """{(tenant id, digest): data} for the (tenant id, digest) pairs asked for, in one query."""
+    from quoting.models import QuoteSnapshotNode
+
+    if not keys:
+        return {}
+    rows = (
+        QuoteSnapshotNode.objects
+        .filter(tenant_id__in={t for t, _ in keys}, digest__in={d for _, d in keys})
+        .values_list("tenant_id", "digest", "data")
+    )
+    return {(t, d): data for t, d, data in rows}
+
+
+def materialize_snapshots(items):
+    """
+    materialize_snapshot() for many (manifest, tenant id) pairs, e.g. a
+    page of revisions, in two queries overall (products, then parts).
+    Revisions stored before nodes existed hold the full tree already and
+    are returned unchanged.
+    """
+    items = [(manifest, tenant_id) for manifest, tenant_id in items]
+    stored = [
+        (manifest, tenant_id) for manifest, tenant_id in items
+        if isinstance(manifest, dict) and manifest.get("format") == SNAPSHOT_FORMAT
+    ]
+    products = _load_nodes({
+        (tenant_id, d)
+        for manifest, tenant_id in stored
+        for solution in manifest.get("solutions", []) for d in solution.get("products", [])
+    })
+    parts = _load_nodes({(t, d) for (t, _), product in products.items() for d in product.get("parts", [])})
+
+    def tree(manifest, tenant_id):
+        if not isinstance(manifest, dict) or manifest.get("format") != SNAPSHOT_FORMAT:
+            return manifest
+        snapshot = {key: value for key, value in manifest.items() if key != "format"}
+        snapshot["solutions"] = [
+            {
+                **solution,
+                "products": [
+                    {
+                        **products[(tenant_id, d)],
+                        "parts": [parts[(tenant_id, p)] for p in products[(tenant_id, d)].get("parts", [])],
+                    }
+                    for d in solution.get("products", [])
+                ],
+            }
+            for solution in manifest.get("solutions", [])
+        ]
+        return snapshot
+
+    return [tree(manifest, tenant_id) for manifest, tenant_id in items]
+
+
+def materialize_snapshot(manifest, tenant_id):
+    """The full snapshot tree behind a manifest, in two queries (products, then parts)."""
+    return materialize_snapshots([(manifest, tenant_id)])[0]
@@ -1,10 +1,12 @@
 # quotes/serializers.py
+from django.db import models
 from rest_framework import serializers
 from decimal import Decimal
 from .models import (
     QuoteRequest, QuoteProduct, QuoteSolution, QuotePart, QuotePartHardware,OverrideLog,QuoteRevision,QuoteCommunication
 )
 from customer.serializers import ClientSerializer
+from quoting.revisions.snapshot_store import materialize_snapshots
 from quoting.services.recalculation import (
     recalc_quote_product,
     recalc_quote_solution,
@@ -20,7 +22,7 @@ from modular_calc.evaluation.part_evaluator import PartEvaluator
 # 1. HARDWARE & PARTS (BOM Layer)
 # -----------------------------
 class QuotePartHardwareSerializer(serializers.ModelSerializer):
-    hardware_name = serializers.CharField(source="hardware.name", read_only=True)
+    hardware_name = serializers.CharField(source="hardware.h_name", read_only=True)
 
     class Meta:
         model = QuotePartHardware
@@ -114,7 +116,7 @@ class QuoteWorkspaceSerializer(serializers.ModelSerializer):
         fields = [
             "id", "quote_number", "client_detail", "status", 
             "solutions", "total_sp", "tax_percentage", 
-            "tax_amount", "grand_total", "is_locked"
+            "tax_amount", "grand_total", "is_locked", "workspace_version"
         ]
 
     def get_tax_amount(self, obj):
@@ -123,6 +125,92 @@ class QuoteWorkspaceSerializer(serializers.ModelSerializer):
     def get_grand_total(self, obj):
         return obj.total_sp + self.get_tax_amount(obj) + (obj.shipping_charges or Decimal("0.00"))
 
+class QuoteWorkspaceFlatSerializer(QuoteWorkspaceSerializer):
+    """
+    The workspace as columns instead of nested objects: solutions and
+    products are {field: [values]}, parts are the same keyed by product
+    id and hardware keyed by part id. Values are read straight off the
+    (prefetched) instances, so large quotes skip the per-object field
+    machinery and repeat no keys.
+    """
+    SOLUTION_FIELDS = ("id", "name", "total_sp", "notes")
+    PRODUCT_FIELDS = (
+        "id", "solution_id", "product_name", "product_template_id", "product_variant_id", "modular_product_id",
+        "l", "w", "h", "quantity", "total_sp", "status", "config_parameters",
+    )
+    PART_FIELDS = ("id", "part_name", "length_mm", "width_mm", "thickness_mm", "part_qty", "total_part_sp", "material")
+    HARDWARE_FIELDS = ("id", "hardware_id", "hardware_name", "quantity", "unit_sp", "total_sp")
+
+    class Meta(QuoteWorkspaceSerializer.Meta):
+        fields = [f for f in QuoteWorkspaceSerializer.Meta.fields if f != "solutions"]
+
+    @staticmethod
+    def _value(value):
+        # Same wire format as the nested serializer's DecimalFields
+        return str(value) if isinstance(value, Decimal) else value
+
+    def _columns(self, names, rows):
+        columns = {name: [] for name in names}
+        for row in rows:
+            for name, value in zip(names, row):
+                columns[name].append(self._value(value))
+        return columns
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        solutions, products, parts, hardware = [], [], {}, {}
+        for solution in obj.solutions.all():
+            solutions.append((solution.id, solution.name, solution.total_sp, solution.notes))
+            for qp in solution.products.all():
+                products.append((
+                    qp.id, qp.solution_id, qp.product_template.name if qp.product_template else None,
+                    qp.product_template_id, qp.product_variant_id, qp.modular_product_id,
+                    qp.length_mm, qp.width_mm, qp.height_mm, qp.quantity, qp.total_sp, qp.status, qp.config_parameters,
+                ))
+                product_parts = []
+                for part in qp.parts.all():
+                    product_parts.append((
+                        part.id, part.part_name, part.length_mm, part.width_mm, part.thickness_mm,
+                        part.part_qty, part.total_part_sp, part.material.name if part.material else "N/A",
+                    ))
+                    rows = [
+                        (h.id, h.hardware_id, h.hardware.h_name, h.quantity, h.unit_sp, h.total_sp)
+                        for h in part.hardware.all()
+                    ]
+                    if rows:
+                        hardware[part.id] = self._columns(self.HARDWARE_FIELDS, rows)
+                parts[qp.id] = self._columns(self.PART_FIELDS, product_parts)
+        data["solutions"] = self._columns(self.SOLUTION_FIELDS, solutions)
+        data["products"] = self._columns(self.PRODUCT_FIELDS, products)
+        data["parts"] = parts
+        data["hardware"] = hardware
+        return data
+
+class QuoteSolutionSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuoteSolution
+        fields = ["id", "name", "total_sp", "notes"]
+
+class QuoteWorkspaceDeltaSerializer(QuoteWorkspaceSerializer):
+    """
+    What changed in the workspace since the client's version: the quote
+    header and solution totals (always, they are small), the changed
+    products with their parts, and the ids of products removed. Expects
+    context {"since", "products", "removed"} from workspace_changes().
+    """
+    solutions = QuoteSolutionSummarySerializer(many=True, read_only=True)
+
+    class Meta(QuoteWorkspaceSerializer.Meta):
+        fields = [f for f in QuoteWorkspaceSerializer.Meta.fields if f != "client_detail"]
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        data["delta"] = True
+        data["since"] = self.context["since"]
+        data["products"] = QuoteProductSerializer(self.context["products"], many=True).data
+        data["removed"] = self.context["removed"]
+        return data
+
 class QuoteRequestSerializer(serializers.ModelSerializer):
     """Simple serializer for List views and basic CRUD"""
     client_name = serializers.CharField(source='client.name', read_only=True)
@@ -145,15 +233,30 @@ class OverrideLogSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["changed_by", "created_at"]
 
+class QuoteRevisionListSerializer(serializers.ListSerializer):
+    """Materializes the snapshots of every revision listed in one batch of node queries."""
+
+    def to_representation(self, data):
+        revisions = list(data.all() if isinstance(data, models.Manager) else data)
+        trees = materialize_snapshots((r.snapshot, r.tenant_id) for r in revisions)
+        self.context["revision_snapshots"] = {r.pk: tree for r, tree in zip(revisions, trees)}
+        return super().to_representation(revisions)
+
 class QuoteRevisionSerializer(serializers.ModelSerializer):
     created_by_name = serializers.CharField(source="created_by.get_full_name", read_only=True)
+    snapshot = serializers.SerializerMethodField()
 
     class Meta:
         model = QuoteRevision
         fields = [
             "id", "revision_no", "snapshot", "created_at", "created_by_name"
         ]
-        read_only_fields = ["revision_no", "snapshot", "created_at"]
+        read_only_fields = ["revision_no", "created_at"]
+        list_serializer_class = QuoteRevisionListSerializer
+
+    def get_snapshot(self, obj):
+        snapshots = self.context.get("revision_snapshots", {})
+        return snapshots[obj.pk] if obj.pk in snapshots else obj.materialize()
 
 class QuoteCommunicationSerializer(serializers.ModelSerializer):
     sent_by_name = serializers.CharField(source="sent_by.get_full_name", read_only=True)
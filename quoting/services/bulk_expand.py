@@ -1,16 +1,210 @@
+from collections import defaultdict
+from decimal import ROUND_CEILING, Decimal
+from typing import Dict, List, Tuple
+
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.utils import timezone
+
+from modular_calc.evaluation.definition_cache import get_product_definition
+from quoting.models import QuotePart, QuotePartHardware, QuoteProduct
 from quoting.permissions import QuoteProductService
+from quoting.services.recalculation import propagate_deltas
+from quoting.services.workspace import record_product_changes
 
+BATCH_SIZE = 500
+TWO_PLACES = Decimal("0.01")
 
-@transaction.atomic
-def bulk_expand_products(products):
-    expanded = []
+# QuotePart columns written from the BOM; everything else on a part (edgebands, SVG path) is left alone
+PART_FIELDS = (
+    "part_template_id", "part_name", "length_mm", "width_mm", "thickness_mm",
+    "part_qty", "grain_direction", "material_id", "total_part_cp", "total_part_sp",
+)
+HARDWARE_FIELDS = ("quantity", "unit_cp", "unit_sp", "total_cp", "total_sp")
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(TWO_PLACES)
+
+
+def _pieces(quantity) -> int:
+    """Hardware is bought whole: a fractional quantity rounds up to the next piece."""
+    return int(Decimal(str(quantity)).to_integral_value(rounding=ROUND_CEILING))
+
+
+def _bom_rows(qp) -> List[Tuple[Dict, List[Dict]]]:
+    """(QuotePart fields, QuotePartHardware fields by part) for each BOM part of the product's engine run."""
+    results, cache_hit = QuoteProductService.evaluate(qp)
+    qp.cache_hit = cache_hit
+    materials = {
+        link.material.id: link.material
+        for node in get_product_definition(qp.modular_product).graph.templates
+        for link in node.whitelist if link.material
+    }
+    rows = []
+    for part in results.get("bom", {}).get("parts", []):
+        material = materials.get(part.get("material_id"))
+        fields = {
+            "part_template_id": part.get("part_template_id"),
+            "part_name": part["name"],
+            "length_mm": _money(part["finished_dims"]["l"]),
+            "width_mm": _money(part["finished_dims"]["w"]),
+            "thickness_mm": _money(getattr(material, "thickness_value", 0) or 0),
+            "part_qty": int(part["quantity"]),
+            "grain_direction": str(part.get("grain", {}).get("direction", "none")).lower(),
+            "material_id": material.id if material else None,
+            "total_part_cp": _money(part.get("cp", 0)),
+            "total_part_sp": _money(part.get("sp", 0)),
+        }
+        hardware = []
+        for item in (part.get("hardware_cost") or {}).get("items", []):
+            # Priced on the quantity stored, so quantity x unit price is the row total
+            quantity = _pieces(item["quantity"])
+            hardware.append({
+                "hardware_id": item["hardware_id"],
+                "quantity": quantity,
+                "unit_cp": _money(item["unit_cp"]),
+                "unit_sp": _money(item["unit_sp"]),
+                "total_cp": _money(Decimal(str(item["unit_cp"])) * quantity),
+                "total_sp": _money(Decimal(str(item["unit_sp"])) * quantity),
+            })
+        rows.append((fields, hardware))
+    return rows
+
+
+def _changed(instance, fields: Dict, names) -> bool:
+    changed = False
+    for name in names:
+        if getattr(instance, name) != fields[name]:
+            setattr(instance, name, fields[name])
+            changed = True
+    return changed
 
-    for qp in products.select_related("solution", "solution__quote"):
-        if qp.status == qp.STATUS_FROZEN:
-            continue
 
-        expanded_qp = QuoteProductService.expand_to_parts(qp)
-        expanded.append(expanded_qp)
+class _Writes:
+    """Rows to insert, update and delete, flushed in batches once every product is diffed."""
 
-    return expanded
+    def __init__(self):
+        self.now = timezone.now()
+        self.create_parts: List[QuotePart] = []
+        self.update_parts: List[QuotePart] = []
+        self.delete_parts: List[int] = []
+        # Hardware of new parts waits for the parts' primary keys
+        self.pending_hardware: List[Tuple[QuotePart, List[Dict]]] = []
+        self.create_hardware: List[QuotePartHardware] = []
+        self.update_hardware: List[QuotePartHardware] = []
+        self.delete_hardware: List[int] = []
+
+    def hardware(self, part: QuotePart, existing: Dict[int, QuotePartHardware], rows: List[Dict]) -> None:
+        for fields in rows:
+            row = existing.pop(fields["hardware_id"], None)
+            if row is None:
+                self.create_hardware.append(QuotePartHardware(
+                    tenant_id=part.tenant_id, quote_part=part, hardware_id=fields["hardware_id"],
+                    **{name: fields[name] for name in HARDWARE_FIELDS},
+                ))
+            elif _changed(row, fields, HARDWARE_FIELDS):
+                row.updated_at = self.now
+                self.update_hardware.append(row)
+        self.delete_hardware.extend(row.id for row in existing.values())
+
+    def flush(self) -> None:
+        if self.delete_parts:
+            QuotePart.objects.filter(id__in=self.delete_parts).delete()
+        if self.delete_hardware:
+            QuotePartHardware.objects.filter(id__in=self.delete_hardware).delete()
+        QuotePart.objects.bulk_create(self.create_parts, batch_size=BATCH_SIZE)
+        if self.update_parts:
+            QuotePart.objects.bulk_update(self.update_parts, [*PART_FIELDS, "updated_at"], batch_size=BATCH_SIZE)
+        for part, rows in self.pending_hardware:
+            self.hardware(part, {}, rows)
+        QuotePartHardware.objects.bulk_create(self.create_hardware, batch_size=BATCH_SIZE)
+        if self.update_hardware:
+            QuotePartHardware.objects.bulk_update(
+                self.update_hardware, [*HARDWARE_FIELDS, "updated_at"], batch_size=BATCH_SIZE,
+            )
+
+
+def expand_products(products: List[QuoteProduct]) -> List[QuoteProduct]:
+    """
+    Expands products into QuoteParts and QuotePartHardware. The new BOM
+    is diffed against the rows already there: a part matches an existing
+    one of the same template and name, in order; matches are updated only
+    where a column changed, the rest are created or deleted. All writes
+    go out in batches after every product is diffed, and each solution
+    and quote touched is moved by the change in its products' totals, so
+    re-expanding a quote costs a few queries per product rather than a
+    few per part.
+    """
+    products = list(products)
+    if not products:
+        return []
+    locked = [qp.id for qp in products if qp.solution.quote.status == "locked"]
+    if locked:
+        raise ValidationError("Quote is locked")
+
+    existing_parts: Dict[int, Dict[Tuple, List[QuotePart]]] = defaultdict(lambda: defaultdict(list))
+    for part in QuotePart.objects.filter(quote_product__in=products).order_by("id"):
+        existing_parts[part.quote_product_id][(part.part_template_id, part.part_name)].append(part)
+    existing_hardware: Dict[int, Dict[int, QuotePartHardware]] = defaultdict(dict)
+    for row in QuotePartHardware.objects.filter(quote_part__quote_product__in=products):
+        existing_hardware[row.quote_part_id][row.hardware_id] = row
+
+    # What the solutions and quotes count for each product: the sum of its current parts once
+    # it has been expanded, else its stored totals (re-read under a row lock, the instance may be stale)
+    counted: Dict[int, Tuple[Decimal, Decimal]] = {}
+    for product_id, by_key in existing_parts.items():
+        parts = [part for matches in by_key.values() for part in matches]
+        counted[product_id] = (
+            sum((part.total_part_cp for part in parts), Decimal("0.00")),
+            sum((part.total_part_sp for part in parts), Decimal("0.00")),
+        )
+    rows = (
+        QuoteProduct.objects.select_for_update()
+        .filter(id__in=[qp.id for qp in products if qp.id not in counted])
+        .values_list("id", "total_cp", "total_sp")
+    )
+    counted.update((pk, (cp, sp)) for pk, cp, sp in rows)
+
+    writes = _Writes()
+    deltas = []
+    for qp in products:
+        by_key = existing_parts.get(qp.id, {})
+        total_cp = total_sp = Decimal("0.00")
+        for fields, hardware in _bom_rows(qp):
+            matches = by_key.get((fields["part_template_id"], fields["part_name"]))
+            if matches:
+                part = matches.pop(0)
+                if _changed(part, fields, PART_FIELDS):
+                    part.updated_at = writes.now
+                    writes.update_parts.append(part)
+                writes.hardware(part, existing_hardware.pop(part.id, {}), hardware)
+            else:
+                part = QuotePart(tenant_id=qp.tenant_id, quote_product=qp, **fields)
+                writes.create_parts.append(part)
+                writes.pending_hardware.append((part, hardware))
+            total_cp += fields["total_part_cp"]
+            total_sp += fields["total_part_sp"]
+        writes.delete_parts.extend(part.id for parts in by_key.values() for part in parts)
+        old_cp, old_sp = counted[qp.id]
+        deltas.append((qp, total_cp - old_cp, total_sp - old_sp))
+        qp.total_cp, qp.total_sp, qp.validated = total_cp, total_sp, True
+    writes.flush()
+    QuoteProduct.objects.bulk_update(products, ["total_cp", "total_sp", "validated"], batch_size=BATCH_SIZE)
+    for qp in products:
+        qp.mark_totals_saved()
+    propagate_deltas(deltas)
+    record_product_changes(products)
+    return products
+
+
+@transaction.atomic
+def bulk_expand_products(products):
+    """Expands every editable product of the queryset in one pass; frozen products are skipped."""
+    editable = [
+        qp for qp in products.select_related(
+            "solution", "solution__quote", "modular_product", "override_material", "tenant",
+        )
+        if qp.status != qp.STATUS_FROZEN
+    ]
+    return expand_products(editable)
@@ -0,0 +1,209 @@
+# quoting/services/order_nesting.py
+from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+from modular_calc.evaluation.cutlist_cache import cutlist_cache
+from modular_calc.evaluation.cutlist_optimizer import MODE_GUILLOTINE, CutlistOptimizer, PartRect
+from modular_calc.evaluation.strip_packing import MODE_STRIP, StripCutlistOptimizer
+from modular_calc.evaluation.definition_cache import get_product_definition
+from modular_calc.evaluation.machine_time import MachineTimeEstimator
+from material.services.remnant_inventory import RemnantInventoryService
+from material.services.stock_sizes import StockSizeService
+from quoting.models import QuotePart, QuoteProduct
+
+TWO_PLACES = Decimal("0.01")
+
+
+def _sheet_size(material):
+    if not material or not material.length_mm or not material.width_mm:
+        return None
+    return Decimal(str(material.width_mm)), Decimal(str(material.length_mm))
+
+
+def collect_order_parts(quote) -> List[Dict]:
+    """
+    Every board part of a quote as {quote_product_id, name, w, h, qty,
+    grain, material, edgebands}. Expanded products contribute their
+    QuoteParts; products not expanded yet contribute their (cached)
+    engine BOM. edgebands are running_metrics rows for the edgebander.
+    """
+    from quoting.permissions import QuoteProductService
+
+    parts = []
+    expanded = set()
+    rows = (
+        QuotePart.objects
+        .filter(quote_product__solution__quote=quote, material__isnull=False)
+        .select_related("material")
+        .only(
+            "quote_product_id", "part_name", "length_mm", "width_mm", "part_qty",
+            "grain_direction", "material",
+            "edgeband_top", "edgeband_bottom", "edgeband_left", "edgeband_right",
+        )
+    )
+    for row in rows:
+        expanded.add(row.quote_product_id)
+        parts.append({
+            "quote_product_id": row.quote_product_id,
+            "name": row.part_name,
+            "w": Decimal(str(row.width_mm)),
+            "h": Decimal(str(row.length_mm)),
+            "qty": int(row.part_qty),
+            "grain": row.grain_direction or "none",
+            "material": row.material,
+            "edgebands": _edgebands(row),
+        })
+
+    pending = (
+        QuoteProduct.objects
+        .filter(solution__quote=quote, modular_product__isnull=False)
+        .exclude(id__in=expanded)
+        .select_related("modular_product", "override_material", "tenant")
+    )
+    for qp in pending:
+        result, _ = QuoteProductService.evaluate(qp)
+        materials = get_product_definition(qp.modular_product).graph.materials()
+        for p in result.get("bom", {}).get("parts", []):
+            material = materials.get(p.get("material_id"))
+            if material is None:
+                continue
+            dims = p.get("cutting_dims") or p["finished_dims"]
+            parts.append({
+                "quote_product_id": qp.id,
+                "name": p["name"],
+                "w": Decimal(str(dims["w"])),
+                "h": Decimal(str(dims["l"])),
+                "qty": int(p["quantity"]),
+                "grain": str(p.get("grain", {}).get("direction", "none")),
+                "material": material,
+                "edgebands": [p["running_metrics"]] if p.get("running_metrics") else [],
+            })
+    return parts
+
+
+def _edgebands(row) -> List[Dict]:
+    """Edges of a QuotePart by edgeband: top and bottom run its width, left and right its length."""
+    runs = {}
+    sides = (
+        (row.edgeband_top_id, row.width_mm), (row.edgeband_bottom_id, row.width_mm),
+        (row.edgeband_left_id, row.length_mm), (row.edgeband_right_id, row.length_mm),
+    )
+    for edgeband_id, length in sides:
+        if edgeband_id is None:
+            continue
+        run = runs.setdefault(edgeband_id, {"edgeband_id": edgeband_id, "total_eb_mm": 0.0, "eb_edges": 0})
+        run["total_eb_mm"] += float(length) * row.part_qty
+        run["eb_edges"] += row.part_qty
+    return list(runs.values())
+
+
+def _allocate(amount: Decimal, shares: Dict[int, Decimal]) -> Dict[int, Decimal]:
+    """Split amount by share, rounding to paise; the remainder goes to the largest share."""
+    total = sum(shares.values())
+    if not total:
+        return {key: Decimal("0.00") for key in shares}
+    allocated = {key: (amount * share / total).quantize(TWO_PLACES) for key, share in shares.items()}
+    largest = max(shares, key=shares.get)
+    allocated[largest] += amount.quantize(TWO_PLACES) - sum(allocated.values())
+    return allocated
+
+
+def nest_quote(quote, kerf_mm: float = 3.0, progress: Optional[Callable[[int, int], None]] = None,
+               time_budget_ms: Optional[float] = None, use_remnants: bool = False,
+               mode: str = MODE_GUILLOTINE, stages: int = 3) -> Dict:
+    """
+    Order-level cutlist: parts of every product in every solution of the
+    quote, grouped by board and nested together. The board cost of each
+    material is then allocated back to the products by their share of
+    that material's part area. A time_budget_ms (RELEASE_BUDGET_MS when
+    releasing to the factory) runs the optimizer's anytime search.
+    With use_remnants, offcuts in stock are cut before new boards and
+    cost their share of a board. mode="strip" lays the order out in rip
+    strips for the panel saw (2 or 3 stages) and adds its cut plan.
+    Guillotine layouts buy boards in the cheapest mix of the material's
+    stock sizes (WoodStockSize); strip layouts use its own size.
+    machine_time is the saw and edgebander time for the whole order.
+    """
+    if mode not in (MODE_GUILLOTINE, MODE_STRIP):
+        raise ValueError(f"Unknown cutlist mode '{mode}', expected '{MODE_GUILLOTINE}' or '{MODE_STRIP}'")
+    parts = collect_order_parts(quote)
+
+    rects = []
+    materials = {}
+    area = defaultdict(lambda: defaultdict(Decimal))  # material id -> quote product id -> mm²
+    skipped = []
+    for p in parts:
+        material = p["material"]
+        size = _sheet_size(material)
+        if size is None or p["qty"] <= 0:
+            skipped.append({"quote_product_id": p["quote_product_id"], "name": p["name"]})
+            continue
+        materials[material.id] = material
+        area[material.id][p["quote_product_id"]] += p["w"] * p["h"] * p["qty"]
+        rects.append(PartRect(
+            name=p["name"], width=p["w"], height=p["h"], quantity=p["qty"], grain=p["grain"],
+            material_id=material.id, sheet_width=size[0], sheet_height=size[1],
+        ))
+
+    remnants = RemnantInventoryService.store_for(quote.tenant, materials) if use_remnants else None
+    if mode == MODE_STRIP:
+        optimizer = StripCutlistOptimizer(kerf_mm=kerf_mm, stages=stages, remnants=remnants)
+    else:
+        stock = StockSizeService.catalog_for(quote.tenant, materials)
+        optimizer = CutlistOptimizer(kerf_mm=kerf_mm, remnants=remnants, stock=stock if len(stock) else None)
+    cutlist = cutlist_cache.optimize(optimizer, rects, progress=progress, time_budget_ms=time_budget_ms)
+
+    machine_time = MachineTimeEstimator(kerf_mm=kerf_mm).estimate(
+        cutlist, [{"running_metrics": run} for p in parts for run in p["edgebands"]],
+    )
+
+    sheets_by_material = defaultdict(int)
+    boards_by_material = defaultdict(Decimal)
+    cost_by_material = defaultdict(Decimal)
+    for group in cutlist["materials"]:
+        material_id = group["material_id"]
+        if not group["remnant"]:
+            sheets_by_material[material_id] += group["sheets"]
+        boards = Decimal(str(group["boards"]))
+        boards_by_material[material_id] += boards
+        # Stock-size boards carry their own price; the rest cost the material's panel price
+        price = group.get("sheet_price")
+        if price is None:
+            price = materials[material_id].sell_price_panel or 0
+        cost_by_material[material_id] += Decimal(str(price)) * boards
+
+    allocation = defaultdict(Decimal)
+    material_rows = []
+    for material_id, boards in boards_by_material.items():
+        sheets = sheets_by_material[material_id]
+        price = Decimal(str(materials[material_id].sell_price_panel or 0))
+        cost = cost_by_material[material_id]
+        for qp_id, share in _allocate(cost, area[material_id]).items():
+            allocation[qp_id] += share
+        material_rows.append({
+            "material_id": material_id,
+            "material_name": materials[material_id].name,
+            "sheets": sheets,
+            "boards": float(boards),
+            "sheet_price": price.quantize(TWO_PLACES),
+            "sheet_cp": cost.quantize(TWO_PLACES),
+        })
+
+    return {
+        "quote_id": quote.id,
+        "total_sheets": cutlist["total_sheets"],
+        "total_waste_percent": cutlist["total_waste_percent"],
+        "materials": material_rows,
+        "products": [
+            {"quote_product_id": qp_id, "sheet_cp": cp}
+            for qp_id, cp in sorted(allocation.items())
+        ],
+        "skipped_parts": skipped,
+        "search_stats": cutlist.get("search_stats"),
+        "saw_cycles": cutlist.get("saw_cycles"),
+        "machine_time": machine_time,
+        "remnants_used": cutlist["remnants_used"],
+        "offcuts": cutlist["offcuts"],
+        "cutlist": cutlist,
+    }
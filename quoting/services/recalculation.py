@@ -1,36 +1,122 @@
-from django.db.models import Sum
+from collections import defaultdict
+from django.db.models import F, Sum
 from decimal import Decimal
 
-def recalc_quote_product(qp):
-    # 1. Update each Part's total first (Material + its own Hardware)
-    for part in qp.parts.all():
-        hw_totals = part.hardware.aggregate(sp=Sum("total_sp"), cp=Sum("total_cp"))
-        # We assume material cost is already in total_part_sp from the Service Layer
-        # If not, add material calculation logic here
-        part.save() # Ensure part is fresh
-
-    # 2. Now sum the "Complete" parts
-    part_totals = qp.parts.aggregate(
-        cp=Sum("total_part_cp"),
-        sp=Sum("total_part_sp"),
-    )
+ZERO = Decimal("0.00")
+
+
+def _bump(model, pk, cp, sp) -> None:
+    """Adds the difference to a row's totals in the database, without reading it first."""
+    model.objects.filter(pk=pk).update(total_cp=F("total_cp") + cp, total_sp=F("total_sp") + sp)
+
+
+def propagate_totals(qp, cp_delta, sp_delta, include_product=True):
+    """
+    Moves a product's totals, its solution's and its quote's by the same
+    difference: at most three UPDATEs, whatever the size of the quote.
+    Leave the product out when its own row already holds the new totals.
+    """
+    from quoting.models import QuoteProduct, QuoteRequest, QuoteSolution
+
+    cp_delta, sp_delta = Decimal(str(cp_delta)), Decimal(str(sp_delta))
+    if not cp_delta and not sp_delta:
+        return
+    if include_product:
+        _bump(QuoteProduct, qp.pk, cp_delta, sp_delta)
+    if qp.solution_id is None:
+        return
+    _bump(QuoteSolution, qp.solution_id, cp_delta, sp_delta)
+    _bump(QuoteRequest, qp.solution.quote_id, cp_delta, sp_delta)
+
+
+def bump_quote(quote_id, cp_delta, sp_delta):
+    """Moves a quote's totals by a line item's or removed solution's difference: one UPDATE."""
+    from quoting.models import QuoteRequest
+
+    cp_delta, sp_delta = Decimal(str(cp_delta)), Decimal(str(sp_delta))
+    if quote_id is not None and (cp_delta or sp_delta):
+        _bump(QuoteRequest, quote_id, cp_delta, sp_delta)
 
-    total_cp = (part_totals["cp"] or 0)
-    total_sp = (part_totals["sp"] or 0)
 
-    # 3. Apply Adjustment (e.g., Waste Factor or Profit Margin)
+def propagate_part_totals(part, cp_delta, sp_delta):
+    """Moves a part's product, solution and quote by the change in the part's totals."""
+    qp = part.quote_product
     factor = getattr(qp, 'adjustment_factor', Decimal('1.00'))
-    qp.total_cp = Decimal(total_cp) * factor
-    qp.total_sp = Decimal(total_sp) * factor
-    
-    qp.validated = True
+    propagate_totals(qp, Decimal(str(cp_delta)) * factor, Decimal(str(sp_delta)) * factor)
+
+
+def propagate_product_update(old, qp):
+    """
+    After a product edit: moves its solution and quote by the change in its
+    stored totals, or takes it off its old solution and onto the new one
+    when the edit moved it. old is the product row as read (locked) before
+    the edit, with its solution.
+    """
+    qp.refresh_totals()
+    if old.solution_id == qp.solution_id:
+        propagate_totals(qp, qp.total_cp - old.total_cp, qp.total_sp - old.total_sp, include_product=False)
+        return
+    propagate_totals(old, -old.total_cp, -old.total_sp, include_product=False)
+    propagate_totals(qp, qp.total_cp, qp.total_sp, include_product=False)
+
+
+def propagate_deltas(products_with_deltas):
+    """
+    propagate_totals for many products whose rows are already written:
+    one UPDATE per solution and per quote they belong to.
+    """
+    from quoting.models import QuoteRequest, QuoteSolution
+
+    solutions = defaultdict(lambda: [ZERO, ZERO])
+    quotes = defaultdict(lambda: [ZERO, ZERO])
+    for qp, cp_delta, sp_delta in products_with_deltas:
+        if qp.solution_id is None:
+            continue
+        for totals in (solutions[qp.solution_id], quotes[qp.solution.quote_id]):
+            totals[0] += cp_delta
+            totals[1] += sp_delta
+    for model, rows in ((QuoteSolution, solutions), (QuoteRequest, quotes)):
+        for pk, (cp, sp) in rows.items():
+            if cp or sp:
+                _bump(model, pk, cp, sp)
+
+
+def set_product_totals(qp, total_cp, total_sp):
+    """Writes a product's new totals and propagates the change, reading its stored totals under a row lock."""
+    from quoting.models import QuoteProduct
+
+    old_cp, old_sp = (
+        QuoteProduct.objects.select_for_update().filter(pk=qp.pk).values_list("total_cp", "total_sp").get()
+    )
+    qp.total_cp, qp.total_sp, qp.validated = Decimal(str(total_cp)), Decimal(str(total_sp)), True
     qp.save(update_fields=["total_cp", "total_sp", "validated"])
+    propagate_totals(qp, qp.total_cp - old_cp, qp.total_sp - old_sp, include_product=False)
     return qp
 
+
+def _product_totals_from_parts(qp):
+    totals = qp.parts.aggregate(cp=Sum("total_part_cp"), sp=Sum("total_part_sp"))
+    # Adjustment (e.g. waste factor or profit margin)
+    factor = getattr(qp, 'adjustment_factor', Decimal('1.00'))
+    return Decimal(totals["cp"] or 0) * factor, Decimal(totals["sp"] or 0) * factor
+
+
+def recalc_quote_product(qp):
+    """
+    Re-totals a product from its parts (one aggregate) and moves its
+    solution and quote by the difference. Products without parts (standard
+    catalogue items) keep their own totals.
+    """
+    if not qp.parts.exists():
+        return qp
+    total_cp, total_sp = _product_totals_from_parts(qp)
+    return set_product_totals(qp, total_cp, total_sp)
+
+
 def recalc_quote_solution(solution):
     """
-    Step 2: Aggregates all products in a room/solution.
-    Required to fix the ImportError in your Serializer.
+    Full recomputation of a room/solution from its products; the
+    reconciler's view of what the incremental totals should be.
     """
     totals = solution.products.aggregate(
         cp=Sum("total_cp"),
@@ -41,15 +127,73 @@ def recalc_quote_solution(solution):
     solution.save(update_fields=["total_cp", "total_sp"])
     return solution
 
+
 def recalc_quote(quote):
     """
-    Step 3: Grand Total (Standard + Modular).
+    Full recomputation of the grand total (Standard + Modular).
     """
     standard = quote.items.aggregate(sp=Sum("line_total_sp"), cp=Sum("line_total_cp"))
     modular = quote.solutions.aggregate(sp=Sum("total_sp"), cp=Sum("total_cp"))
 
     quote.total_sp = (standard["sp"] or Decimal("0.00")) + (modular["sp"] or Decimal("0.00"))
     quote.total_cp = (standard["cp"] or Decimal("0.00")) + (modular["cp"] or Decimal("0.00"))
-    
+
     quote.save(update_fields=["total_sp", "total_cp"])
-    return quote
\ No newline at end of file
+    return quote
+
+
+def reconcile_quote(quote, fix=False):
+    """
+    Checks the incrementally kept totals of a quote against a recount from
+    parts, products, solutions and line items, bottom up. Returns one
+    {"model", "id", "field", "stored", "expected"} row per total that
+    drifted; with fix=True the recount is also written back.
+    """
+    from quoting.models import QuotePart, QuoteProduct, QuoteSolution
+
+    drift = []
+    # Totals move by UPDATEs, so the instance passed in may be stale
+    quote.refresh_from_db(fields=["total_cp", "total_sp"])
+
+    def check(obj, expected_cp, expected_sp):
+        expected_cp, expected_sp = Decimal(expected_cp).quantize(ZERO), Decimal(expected_sp).quantize(ZERO)
+        wrong = []
+        for field, expected in (("total_cp", expected_cp), ("total_sp", expected_sp)):
+            stored = getattr(obj, field)
+            if stored != expected:
+                drift.append({
+                    "model": type(obj).__name__, "id": obj.pk, "field": field, "stored": stored, "expected": expected,
+                })
+                wrong.append(field)
+                setattr(obj, field, expected)
+        if fix and wrong:
+            obj.save(update_fields=wrong)
+
+    part_totals = {
+        row["quote_product_id"]: row
+        for row in (
+            QuotePart.objects
+            .filter(quote_product__solution__quote=quote)
+            .values("quote_product_id")
+            .annotate(cp=Sum("total_part_cp"), sp=Sum("total_part_sp"))
+        )
+    }
+    solution_totals = defaultdict(lambda: [ZERO, ZERO])
+    for qp in QuoteProduct.objects.filter(solution__quote=quote):
+        parts = part_totals.get(qp.pk)
+        if parts is not None:
+            factor = getattr(qp, 'adjustment_factor', Decimal('1.00'))
+            check(qp, Decimal(parts["cp"] or 0) * factor, Decimal(parts["sp"] or 0) * factor)
+        solution_totals[qp.solution_id][0] += qp.total_cp
+        solution_totals[qp.solution_id][1] += qp.total_sp
+
+    modular_cp = modular_sp = ZERO
+    for solution in QuoteSolution.objects.filter(quote=quote):
+        cp, sp = solution_totals[solution.pk]
+        check(solution, cp, sp)
+        modular_cp += solution.total_cp
+        modular_sp += solution.total_sp
+
+    standard = quote.items.aggregate(sp=Sum("line_total_sp"), cp=Sum("line_total_cp"))
+    check(quote, (standard["cp"] or ZERO) + modular_cp, (standard["sp"] or ZERO) + modular_sp)
+    return drift
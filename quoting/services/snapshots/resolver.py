@@ -15,7 +15,7 @@ def resolve_quote_view(quote, revision_no=None):
         return {
             "mode": "REVISION",
             "revision_no": rev.revision_no,
-            "data": rev.snapshot  # Immutable JSON
+            "data": rev.materialize()  # Immutable JSON
         }
 
     # 2. Locked Quote: Force the latest Snapshot
@@ -25,7 +25,7 @@ def resolve_quote_view(quote, revision_no=None):
             return {
                 "mode": "LOCKED",
                 "revision_no": rev.revision_no,
-                "data": rev.snapshot
+                "data": rev.materialize()
             }
 
     # 3. Live Mode (Draft/Edit): Dynamic Calculation
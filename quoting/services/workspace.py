@@ -0,0 +1,117 @@
+# quoting/services/workspace.py
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+from django.db.models import F, Prefetch
+
+from quoting.models import (
+    QuotePart, QuotePartHardware, QuoteProduct, QuoteRequest, QuoteSolution, QuoteWorkspaceChange,
+)
+
+# Clients further behind than this get the full workspace; the change log keeps about this many versions
+MAX_DELTA_VERSIONS = 50
+
+# Columns the workspace serializers read, per level; anything else stays in the database
+SOLUTION_COLUMNS = ("id", "quote_id", "name", "notes", "total_sp")
+PRODUCT_COLUMNS = (
+    "id", "solution_id", "product_template_id", "product_template__name", "product_variant_id",
+    "modular_product_id", "length_mm", "width_mm", "height_mm", "quantity", "total_sp", "status",
+    "config_parameters",
+)
+PART_COLUMNS = (
+    "id", "quote_product_id", "part_name", "length_mm", "width_mm", "thickness_mm", "part_qty",
+    "total_part_sp", "material_id", "material__name",
+)
+HARDWARE_COLUMNS = ("id", "quote_part_id", "hardware_id", "hardware__h_name", "quantity", "unit_sp", "total_sp")
+
+
+def workspace_products():
+    """Products with their parts and hardware prefetched, as the workspace serializers read them."""
+    hardware = QuotePartHardware.objects.select_related("hardware").only(*HARDWARE_COLUMNS).order_by("id")
+    parts = (
+        QuotePart.objects.select_related("material").only(*PART_COLUMNS).order_by("id")
+        .prefetch_related(Prefetch("hardware", queryset=hardware))
+    )
+    return (
+        QuoteProduct.objects.select_related("product_template").only(*PRODUCT_COLUMNS).order_by("id")
+        .prefetch_related(Prefetch("parts", queryset=parts))
+    )
+
+
+def workspace_prefetches():
+    """
+    Prefetch for solutions -> products -> parts -> hardware, each level
+    one query with its foreign keys joined and only the columns above.
+    """
+    solutions = (
+        QuoteSolution.objects.only(*SOLUTION_COLUMNS).order_by("id")
+        .prefetch_related(Prefetch("products", queryset=workspace_products()))
+    )
+    return Prefetch("solutions", queryset=solutions)
+
+
+def workspace_queryset(queryset):
+    """
+    Quotes ready for QuoteWorkspaceSerializer or its flat variant: the
+    whole tree loads in five queries however many products and parts the
+    quote holds, instead of one query per solution, product and part.
+    """
+    return queryset.select_related("client").prefetch_related(workspace_prefetches())
+
+
+def record_changes(quote: QuoteRequest, changed: Iterable[int] = (), removed: Iterable[int] = ()) -> int:
+    """
+    Moves the quote to its next workspace_version and logs the products
+    changed or removed at it. Returns the new version. Every
+    MAX_DELTA_VERSIONS versions the log is trimmed to that window.
+    """
+    QuoteRequest.objects.filter(pk=quote.pk).update(workspace_version=F("workspace_version") + 1)
+    version = QuoteRequest.objects.filter(pk=quote.pk).values_list("workspace_version", flat=True).get()
+    quote.workspace_version = version
+    rows = [
+        QuoteWorkspaceChange(
+            tenant_id=quote.tenant_id, quote_id=quote.pk, version=version, quote_product_id=pk, removed=gone,
+        )
+        for ids, gone in ((changed, False), (removed, True)) for pk in ids
+    ]
+    QuoteWorkspaceChange.objects.bulk_create(rows)
+    if version % MAX_DELTA_VERSIONS == 0:
+        QuoteWorkspaceChange.objects.filter(quote_id=quote.pk, version__lte=version - MAX_DELTA_VERSIONS).delete()
+    return version
+
+
+def record_product_changes(products: Iterable[QuoteProduct], removed: bool = False) -> None:
+    """record_changes for products of any number of quotes: one version per quote touched."""
+    by_quote = defaultdict(list)
+    quotes = {}
+    for qp in products:
+        if qp.solution_id is None:
+            continue
+        quote = qp.solution.quote
+        quotes[quote.pk] = quote
+        by_quote[quote.pk].append(qp.pk)
+    for pk, ids in by_quote.items():
+        if removed:
+            record_changes(quotes[pk], removed=ids)
+        else:
+            record_changes(quotes[pk], changed=ids)
+
+
+def workspace_changes(quote: QuoteRequest, since: int) -> Optional[Tuple[List[QuoteProduct], List[int]]]:
+    """
+    (changed products, prefetched like the workspace; removed product ids)
+    since the client's version, or None when the client is too far
+    behind (or ahead) for a delta and needs the full workspace.
+    """
+    if since > quote.workspace_version or quote.workspace_version - since > MAX_DELTA_VERSIONS:
+        return None
+    latest = {}
+    for pk, gone in (
+        QuoteWorkspaceChange.objects.filter(quote=quote, version__gt=since)
+        .order_by("version", "id").values_list("quote_product_id", "removed")
+    ):
+        latest[pk] = gone
+    removed = sorted(pk for pk, gone in latest.items() if gone)
+    changed_ids = [pk for pk, gone in latest.items() if not gone]
+    changed = list(workspace_products().filter(id__in=changed_ids, solution__quote=quote)) if changed_ids else []
+    return changed, removed
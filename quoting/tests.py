@@ -1,3 +1,391 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from customer.models import Client
+from material.models import WoodRemnant, WoodStockSize
+from material.services.remnant_inventory import RemnantInventoryService
+from modular_calc.evaluation.definition_cache import definition_cache
+from modular_calc.evaluation.result_cache import result_cache
+from modular_calc.models import PartHardwareRule
+from modular_calc.tests import EngineFixtureMixin
+from quoting.logic.versioning import create_quote_revision
+from quoting.models import (
+    QuotePart, QuotePartHardware, QuoteRequest, QuoteRevision, QuoteSnapshotNode, QuoteSolution, QuoteProduct,
+    QuoteWorkspaceChange,
+)
+from quoting.revisions.revesion_snapshot import build_quote_snapshot
+from quoting.revisions.snapshot_store import store_snapshot
+from quoting.services.bulk_expand import bulk_expand_products
+from quoting.services.order_nesting import nest_quote
+from quoting.serializers import (
+    QuoteRevisionSerializer, QuoteWorkspaceDeltaSerializer, QuoteWorkspaceFlatSerializer, QuoteWorkspaceSerializer,
+)
+from quoting.services.recalculation import propagate_part_totals, recalc_quote_product, reconcile_quote
+from quoting.services.workspace import (
+    MAX_DELTA_VERSIONS, record_changes, record_product_changes, workspace_changes, workspace_queryset,
+)
+
+
+class QuoteFixtureMixin(EngineFixtureMixin):
+    """A draft quote with one solution; products are added per test."""
+
+    def setUp(self):
+        definition_cache.clear()
+        result_cache.clear()
+        client = Client.objects.create(tenant=self.tenant, name="Anita")
+        self.quote = QuoteRequest.objects.create(
+            tenant=self.tenant, client=client, customer_display_name="Anita", quote_number=f"Q-{self.id()[-20:]}",
+        )
+        self.solution = QuoteSolution.objects.create(tenant=self.tenant, quote=self.quote, name="Kitchen")
+
+    def add_product(self, product, quantity=1):
+        return QuoteProduct.objects.create(
+            tenant=self.tenant, solution=self.solution, modular_product=product,
+            length_mm=600, width_mm=500, height_mm=720, quantity=quantity,
+            config_parameters={"side_thickness": 18},
+        )
+
+
+class OrderNestingTests(QuoteFixtureMixin, TestCase):
+
+    def test_products_share_sheets_of_the_same_board(self):
+        product = self.build_product("Base 2", 2)
+        first, second = self.add_product(product), self.add_product(product)
+
+        report = nest_quote(self.quote)
+
+        # Each cabinet alone needs a sheet; nested together four panels fit on one
+        self.assertEqual(report["total_sheets"], 1)
+        self.assertEqual(report["materials"][0]["material_id"], self.material.id)
+        price = Decimal(str(self.material.sell_price_panel)).quantize(Decimal("0.01"))
+        allocated = {row["quote_product_id"]: row["sheet_cp"] for row in report["products"]}
+        self.assertEqual(set(allocated), {first.id, second.id})
+        self.assertEqual(sum(allocated.values()), price)
+        self.assertEqual(allocated[first.id], allocated[second.id])
+
+    def test_expanded_products_are_nested_from_their_parts(self):
+        from quoting.permissions import QuoteProductService
+
+        qp = self.add_product(self.build_product("Base 3", 3), quantity=2)
+        QuoteProductService.expand_to_parts(qp)
+
+        report = nest_quote(self.quote)
+        placed = sum(len(sheet["parts"]) for sheet in report["cutlist"]["sheets"])
+        self.assertEqual(placed, 6)
+        self.assertEqual(report["skipped_parts"], [])
+
+    def test_boards_are_bought_in_the_cheapest_stock_size(self):
+        WoodStockSize.objects.create(
+            tenant=self.tenant, material=self.material, width_mm=1220, length_mm=1220, sell_price_panel=1000,
+        )
+        qp = self.add_product(self.build_product("Base 1", 1))
+
+        report = nest_quote(self.quote)
+        self.assertEqual(report["cutlist"]["materials"][0]["raw_dims"], {"w": 1220.0, "h": 1220.0})
+        self.assertEqual(report["products"], [{"quote_product_id": qp.id, "sheet_cp": Decimal("1000.00")}])
+
+    def test_strip_mode_adds_the_saw_plan(self):
+        self.add_product(self.build_product("Base 2", 2), quantity=2)
+
+        report = nest_quote(self.quote, mode="strip")
+        self.assertEqual(report["total_sheets"], 1)
+        self.assertEqual(report["saw_cycles"], len(report["cutlist"]["cut_plan"][0]["cuts"]))
+        self.assertEqual(report["machine_time"]["saw"]["sheets"], 1)
+        with self.assertRaises(ValueError):
+            nest_quote(self.quote, mode="nested")
+
+
+class RemnantReleaseTests(QuoteFixtureMixin, TestCase):
+
+    def test_release_consumes_offcuts_and_stocks_new_ones(self):
+        offcut = WoodRemnant.objects.create(tenant=self.tenant, material=self.material, width_mm=1100, length_mm=1300)
+        self.add_product(self.build_product("Base 1", 1))
+
+        report = nest_quote(self.quote, use_remnants=True)
+        self.assertEqual(report["total_sheets"], 0)
+        self.assertEqual(report["remnants_used"], [offcut.id])
+        self.assertLess(report["products"][0]["sheet_cp"], Decimal(str(self.material.sell_price_panel)))
+
+        inventory = RemnantInventoryService.record_cut_job(self.tenant, report["cutlist"], source=self.quote.quote_number)
+        offcut.refresh_from_db()
+        self.assertFalse(offcut.is_available)
+        self.assertEqual(len(inventory["created"]), len(report["offcuts"]))
+        with self.assertRaises(ValidationError):
+            RemnantInventoryService.record_cut_job(self.tenant, report["cutlist"])
+
+
+class BulkExpandTests(QuoteFixtureMixin, TestCase):
+
+    def expand(self, qps):
+        return bulk_expand_products(QuoteProduct.objects.filter(id__in=[qp.id for qp in qps]))
+
+    def test_reexpanding_keeps_unchanged_parts(self):
+        qp = self.add_product(self.build_product("Base 3", 3), quantity=2)
+        self.expand([qp])
+        parts = dict(qp.parts.values_list("id", "length_mm"))
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(QuotePartHardware.objects.filter(quote_part__quote_product=qp).count(), 3)
+        self.assertTrue(all(h.quantity == 2 for h in QuotePartHardware.objects.filter(quote_part__quote_product=qp)))
+
+        qp.height_mm = 800
+        qp.save()
+        self.expand([qp])
+        resized = dict(qp.parts.values_list("id", "length_mm"))
+        self.assertEqual(set(resized), set(parts))
+        self.assertTrue(all(resized[pk] == parts[pk] + 80 for pk in parts))
+
+        qp.refresh_from_db()
+        self.quote.refresh_from_db()
+        self.assertEqual(qp.total_sp, sum(p.total_part_sp for p in qp.parts.all()))
+        self.assertEqual(self.quote.total_sp, qp.total_sp)
+
+    def test_fractional_hardware_rounds_up_before_pricing(self):
+        product = self.build_product("Base 1", 1)
+        PartHardwareRule.objects.filter(part_template__product=product).update(quantity_equation="1.5")
+        qp = self.add_product(product)
+        self.expand([qp])
+        row = QuotePartHardware.objects.get(quote_part__quote_product=qp)
+        self.assertEqual(row.quantity, 2)
+        self.assertEqual(row.total_sp, row.unit_sp * 2)
+        self.assertEqual(row.total_cp, row.unit_cp * 2)
+
+    def test_reexpansion_queries_do_not_grow_with_parts(self):
+        counts = []
+        for part_count in (2, 6):
+            product = self.build_product(f"Base {part_count}", part_count)
+            qps = [self.add_product(product) for _ in range(3)]
+            self.expand(qps)
+            QuotePart.objects.filter(quote_product=qps[0]).update(total_part_sp=0)
+            with CaptureQueriesContext(connection) as queries:
+                self.expand(qps)
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_locked_quotes_are_not_expanded(self):
+        qp = self.add_product(self.build_product("Base 1", 1))
+        self.quote.status = "locked"
+        self.quote.save()
+        with self.assertRaises(ValidationError):
+            self.expand([qp])
+
+
+class IncrementalTotalsTests(QuoteFixtureMixin, TestCase):
+
+    def expand(self, qps):
+        return bulk_expand_products(QuoteProduct.objects.filter(id__in=[qp.id for qp in qps]))
+
+    def test_part_edit_moves_every_level_in_constant_writes(self):
+        qp = self.add_product(self.build_product("Base 3", 3))
+        self.expand([qp])
+        part = qp.parts.select_related("quote_product__solution").first()
+        part.total_part_sp += Decimal("10.00")
+        part.save(update_fields=["total_part_sp"])
+        with CaptureQueriesContext(connection) as queries:
+            propagate_part_totals(part, 0, Decimal("10.00"))
+        self.assertEqual(len(queries.captured_queries), 3)
+        self.assertEqual(reconcile_quote(self.quote), [])
+
+    def test_recalc_moves_parents_by_the_difference(self):
+        qps = [self.add_product(self.build_product("Base 2", 2)) for _ in range(2)]
+        self.expand(qps)
+        QuotePart.objects.filter(quote_product=qps[0]).update(total_part_sp=Decimal("5.00"))
+        recalc_quote_product(qps[0])
+        self.quote.refresh_from_db()
+        qps[1].refresh_from_db()
+        self.assertEqual(self.quote.total_sp, Decimal("10.00") + qps[1].total_sp)
+        self.assertEqual(reconcile_quote(self.quote), [])
+
+    def test_plain_save_leaves_the_totals_alone(self):
+        qp = self.add_product(self.build_product("Base 2", 2))
+        stale = QuoteProduct.objects.get(pk=qp.pk)
+        self.expand([qp])
+        stale.height_mm = 800
+        stale.save()
+        self.expand([stale])
+        self.assertEqual(reconcile_quote(self.quote), [])
+
+    def test_plain_save_refuses_changed_totals(self):
+        qp = self.add_product(self.build_product("Base 1", 1))
+        self.expand([qp])
+        qp = QuoteProduct.objects.get(pk=qp.pk)
+        qp.total_sp += Decimal("5.00")
+        with self.assertRaises(ValueError):
+            qp.save()
+
+        qp.refresh_totals()
+        qp.height_mm = 800
+        qp.save()
+        self.assertEqual(reconcile_quote(self.quote), [])
+
+    def test_reconciler_reports_and_fixes_drift(self):
+        qp = self.add_product(self.build_product("Base 1", 1))
+        self.expand([qp])
+        QuoteSolution.objects.filter(pk=self.solution.pk).update(total_sp=Decimal("1.00"))
+        drift = reconcile_quote(self.quote)
+        self.assertEqual([(d["model"], d["field"], d["stored"]) for d in drift], [("QuoteSolution", "total_sp", Decimal("1.00"))])
+        reconcile_quote(self.quote, fix=True)
+        self.assertEqual(reconcile_quote(QuoteRequest.objects.get(pk=self.quote.pk)), [])
+
+
+class WorkspaceLoadingTests(QuoteFixtureMixin, TestCase):
+
+    def workspace_queries(self, serializer_class):
+        with CaptureQueriesContext(connection) as queries:
+            quote = workspace_queryset(QuoteRequest.objects.all()).get(pk=self.quote.pk)
+            data = serializer_class(quote).data
+        return data, len(queries.captured_queries)
+
+    def test_queries_do_not_grow_with_the_quote(self):
+        product = self.build_product("Base 3", 3)
+        bulk_expand_products(QuoteProduct.objects.filter(id=self.add_product(product).id))
+        _, small = self.workspace_queries(QuoteWorkspaceSerializer)
+
+        wardrobe = QuoteSolution.objects.create(tenant=self.tenant, quote=self.quote, name="Wardrobe")
+        qps = [self.add_product(product) for _ in range(4)]
+        QuoteProduct.objects.filter(id__in=[qp.id for qp in qps[2:]]).update(solution=wardrobe)
+        bulk_expand_products(QuoteProduct.objects.filter(id__in=[qp.id for qp in qps]))
+        data, large = self.workspace_queries(QuoteWorkspaceSerializer)
+
+        self.assertEqual(small, large)
+        self.assertEqual(sum(len(item["parts"]) for s in data["solutions"] for item in s["items"]), 15)
+
+    def test_flat_layout_matches_the_nested_one(self):
+        product = self.build_product("Base 3", 3)
+        qps = [self.add_product(product) for _ in range(2)]
+        bulk_expand_products(QuoteProduct.objects.filter(id__in=[qp.id for qp in qps]))
+        nested, nested_queries = self.workspace_queries(QuoteWorkspaceSerializer)
+        flat, flat_queries = self.workspace_queries(QuoteWorkspaceFlatSerializer)
+
+        self.assertEqual(flat_queries, nested_queries)
+        self.assertEqual(flat["total_sp"], nested["total_sp"])
+        self.assertEqual(flat["products"]["id"], [item["id"] for s in nested["solutions"] for item in s["items"]])
+        for item in nested["solutions"][0]["items"]:
+            columns = flat["parts"][item["id"]]
+            self.assertEqual(columns["part_name"], [p["part_name"] for p in item["parts"]])
+            self.assertEqual(columns["total_part_sp"], [p["total_part_sp"] for p in item["parts"]])
+            self.assertEqual(columns["material"], [p["description"]["mat"] for p in item["parts"]])
+
+
+class WorkspaceDeltaTests(QuoteFixtureMixin, TestCase):
+
+    def expand(self, qps):
+        return bulk_expand_products(QuoteProduct.objects.filter(id__in=[qp.id for qp in qps]))
+
+    def delta(self, since):
+        quote = QuoteRequest.objects.get(pk=self.quote.pk)
+        changes = workspace_changes(quote, since)
+        if changes is None:
+            return None
+        products, removed = changes
+        return QuoteWorkspaceDeltaSerializer(quote, context={"since": since, "products": products, "removed": removed}).data
+
+    def test_delta_holds_only_the_changed_products(self):
+        product = self.build_product("Base 2", 2)
+        qps = [self.add_product(product) for _ in range(3)]
+        self.expand(qps)
+        seen = QuoteRequest.objects.get(pk=self.quote.pk).workspace_version
+
+        qps[1].height_mm = 800
+        qps[1].save()
+        self.expand([qps[1]])
+        data = self.delta(seen)
+        self.assertEqual(data["workspace_version"], seen + 1)
+        self.assertEqual([p["id"] for p in data["products"]], [qps[1].id])
+        self.assertEqual(len(data["products"][0]["parts"]), 2)
+        self.assertEqual(data["removed"], [])
+        self.assertEqual(data["total_sp"], str(QuoteRequest.objects.get(pk=self.quote.pk).total_sp))
+
+        removed_id = qps[2].id
+        record_product_changes([qps[2]], removed=True)
+        qps[2].delete()
+        data = self.delta(seen)
+        self.assertEqual([p["id"] for p in data["products"]], [qps[1].id])
+        self.assertEqual(data["removed"], [removed_id])
+        self.assertEqual(self.delta(data["workspace_version"])["products"], [])
+
+    def test_clients_too_far_behind_get_no_delta(self):
+        qp = self.add_product(self.build_product("Base 1", 1))
+        quote = QuoteRequest.objects.get(pk=self.quote.pk)
+        for _ in range(MAX_DELTA_VERSIONS + 1):
+            record_changes(quote, changed=[qp.id])
+        self.assertIsNone(self.delta(0))
+        self.assertIsNone(self.delta(quote.workspace_version + 1))
+        self.assertIsNotNone(self.delta(quote.workspace_version - MAX_DELTA_VERSIONS))
+        self.assertEqual(
+            QuoteWorkspaceChange.objects.filter(quote=quote, version__lte=quote.workspace_version - MAX_DELTA_VERSIONS).count(), 1,
+        )
+
+
+class RevisionStorageTests(QuoteFixtureMixin, TestCase):
+
+    def expand(self, qps):
+        return bulk_expand_products(QuoteProduct.objects.filter(id__in=[qp.id for qp in qps]))
+
+    def snapshot(self):
+        quote = workspace_queryset(QuoteRequest.objects.all()).get(pk=self.quote.pk)
+        return build_quote_snapshot(quote)
+
+    def test_next_revision_stores_only_changed_subtrees(self):
+        product = self.build_product("Base 3", 3)
+        qps = [self.add_product(product) for _ in range(4)]
+        self.expand(qps)
+        first = store_snapshot(self.snapshot(), self.tenant.id)
+        stored = QuoteSnapshotNode.objects.count()
+        self.assertEqual(stored, 4 + 12)
+
+        qps[0].height_mm = 800
+        qps[0].save()
+        self.expand([qps[0]])
+        second = store_snapshot(self.snapshot(), self.tenant.id)
+        # One product node and its three resized parts; the other products are shared
+        self.assertEqual(QuoteSnapshotNode.objects.count(), stored + 4)
+        self.assertEqual(first["solutions"][0]["products"][1:], second["solutions"][0]["products"][1:])
+        self.assertNotEqual(first["solutions"][0]["products"][0], second["solutions"][0]["products"][0])
+
+    def test_materialize_restores_the_tree(self):
+        qp = self.add_product(self.build_product("Base 2", 2))
+        self.expand([qp])
+        snapshot = self.snapshot()
+        revision = QuoteRevision.objects.create(
+            tenant=self.tenant, quote=self.quote, revision_no=1, snapshot=store_snapshot(snapshot, self.tenant.id),
+        )
+        self.assertEqual(revision.materialize(), snapshot)
+        legacy = QuoteRevision.objects.create(tenant=self.tenant, quote=self.quote, revision_no=2, snapshot=snapshot)
+        self.assertEqual(legacy.materialize(), snapshot)
+
+    def test_listing_revisions_does_not_query_per_revision(self):
+        qp = self.add_product(self.build_product("Base 2", 2))
+        self.expand([qp])
+        snapshot = self.snapshot()
+        counts = []
+        for revision_no in range(1, 5):
+            QuoteRevision.objects.create(
+                tenant=self.tenant, quote=self.quote, revision_no=revision_no,
+                snapshot=store_snapshot(snapshot, self.tenant.id),
+            )
+            with CaptureQueriesContext(connection) as queries:
+                data = QuoteRevisionSerializer(QuoteRevision.objects.all(), many=True).data
+            counts.append(len(queries.captured_queries))
+            self.assertTrue(all(item["snapshot"] == snapshot for item in data))
+        self.assertEqual(len(set(counts)), 1)
 
-# Create your tests here.
+    def test_cloning_a_revision_uses_bulk_inserts(self):
+        counts = []
+        for part_count in (2, 6):
+            product = self.build_product(f"Base {part_count}", part_count)
+            self.expand([self.add_product(product) for _ in range(3)])
+            with CaptureQueriesContext(connection) as queries:
+                clone = create_quote_revision(self.quote.pk)
+            counts.append(len(queries.captured_queries))
+            self.assertEqual(clone.revision_number, self.quote.revision_number + 1)
+            self.assertEqual(
+                QuotePart.objects.filter(quote_product__solution__quote=clone).count(),
+                QuotePart.objects.filter(quote_product__solution__quote=self.quote).count(),
+            )
+            self.assertEqual(reconcile_quote(clone), [])
+            clone.delete()
+        self.assertEqual(counts[0], counts[1])
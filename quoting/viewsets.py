@@ -8,9 +8,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q  
+from django.db.models import Q, prefetch_related_objects
+from django.core.exceptions import ValidationError
 import logging
 from quoting.revisions.revesion_snapshot import build_quote_snapshot
+from quoting.revisions.snapshot_store import store_snapshot
 from accounts.mixins import TenantSafeMixin
 from modular_calc.models import ModularProduct
 from material.models.wood import WoodMaterial
@@ -18,8 +20,15 @@ from quoting.models import QuoteProduct,QuoteCommunication,QuotePartHardware,Quo
 from quoting.serializers import QuoteRevisionSerializer
 from quoting.permissions import QuoteProductService
 from quoting.services.bulk_expand import bulk_expand_products
+from quoting.services.order_nesting import nest_quote
+from quoting.services.workspace import (
+    record_changes, record_product_changes, workspace_changes, workspace_prefetches, workspace_queryset,
+)
+from modular_calc.evaluation.cutlist_optimizer import MODE_GUILLOTINE, RELEASE_BUDGET_MS
+from modular_calc.evaluation.cutlist_export import CONTENT_TYPES, KIND_CUTTING_LIST, KIND_SVG, KIND_ZIP, CutlistExporter
+from material.services.remnant_inventory import RemnantInventoryService
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import pdfkit
 from django.shortcuts import render, get_object_or_404
 from accounts.mixins import TenantSafeViewSetMixin
@@ -30,6 +39,8 @@ from .serializers import (
     QuoteProductSerializer,
     QuoteCommunicationSerializer,
     QuoteWorkspaceSerializer,
+    QuoteWorkspaceFlatSerializer,
+    QuoteWorkspaceDeltaSerializer,
     QuotePartSerializer,
     OverrideLogSerializer,
     MarketplaceQuoteSerializer,
@@ -37,9 +48,12 @@ from .serializers import (
     QuoteSolutionSerializer,
 )
 from quoting.services.recalculation import (
+    bump_quote,
+    propagate_part_totals,
+    propagate_product_update,
+    propagate_totals,
     recalc_quote_product,
-    recalc_quote_solution,
-    recalc_quote,
+    reconcile_quote,
 )
 from quoting.pdf import QuotePDFSerializer
 
@@ -96,10 +110,35 @@ class QuoteRequestViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
         THE DISPATCHER: This solves your 404.
         Returns the 'Source of Truth' for the Alpine.js workspace.
         """
-        quote = self.get_object()
-        # We use a specialized serializer that nests Solutions -> Products -> Parts
-        serializer = QuoteWorkspaceSerializer(quote) 
-        return Response(serializer.data)
+        params = request.query_params
+        return Response(self.workspace_data(pk, since=params.get("since"), layout=params.get("layout")))
+
+    def get_workspace(self, pk):
+        """The quote with its whole workspace tree prefetched (a fixed number of queries)."""
+        quote = get_object_or_404(workspace_queryset(self.get_queryset()), pk=pk)
+        self.check_object_permissions(self.request, quote)
+        return quote
+
+    def workspace_data(self, pk, since=None, layout=None):
+        """
+        Only what changed since the client's workspace_version (since=) when
+        the change log still covers it, else the whole workspace: nested
+        Solutions -> Products -> Parts, or layout=flat for columns keyed by id.
+        """
+        try:
+            since = int(since) if since not in (None, "") else None
+        except (TypeError, ValueError):
+            since = None
+        if since is not None:
+            quote = self.get_object()
+            changes = workspace_changes(quote, since)
+            if changes is not None:
+                products, removed = changes
+                context = {"since": since, "products": products, "removed": removed}
+                return QuoteWorkspaceDeltaSerializer(quote, context=context).data
+        quote = self.get_workspace(pk)
+        serializer_class = QuoteWorkspaceFlatSerializer if layout == "flat" else QuoteWorkspaceSerializer
+        return {**serializer_class(quote).data, "delta": False}
 
     @action(detail=True, methods=['patch'], url_path='evaluate-product/(?P<product_id>[^/.]+)')
     @transaction.atomic
@@ -116,17 +155,102 @@ class QuoteRequestViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
         product.save()
 
         try:
-            # Step 1: Regenerate BOM
+            # Regenerate the BOM; totals bubble up to the solution and quote
             QuoteProductService.expand_to_parts(product)
-            # Step 2: Bubble up prices
-            recalc_quote_product(product)
-            recalc_quote_solution(product.solution)
-            recalc_quote(quote)
         except ValidationError as e:
             return Response({"detail": str(e)}, status=422)
 
-        # Return the full workspace state so Alpine.js stays synced
-        return Response(QuoteWorkspaceSerializer(quote).data)
+        # Return the workspace state so Alpine.js stays synced: only the changes when it sent its version
+        since = request.data.get("since", request.query_params.get("since"))
+        data = self.workspace_data(pk, since=since, layout=request.query_params.get("layout"))
+        data["cache_hit"] = getattr(product, "cache_hit", False)
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def nesting(self, request, pk=None):
+        """
+        Order-level cutlist: all products of the quote nested together per
+        board, with sheet CP allocated back to each product by area share.
+        The sheet layouts are included with ?detail=full; ?budget_ms=30000
+        searches for a better layout for up to that long; ?remnants=1 cuts
+        offcuts in stock first (preview only, stock is not touched);
+        ?mode=strip&stages=3 lays it out in rip strips for the panel saw.
+        """
+        quote = self.get_object()
+        try:
+            report = self._nest(quote, request.query_params, use_remnants=request.query_params.get("remnants") == "1")
+        except (ValidationError, ValueError) as e:
+            return Response({"detail": str(e)}, status=422)
+        if request.query_params.get("detail") != "full":
+            report.pop("cutlist")
+        return Response(report)
+
+    @action(detail=True, methods=['post'], url_path='release-cutlist')
+    @transaction.atomic
+    def release_cutlist(self, request, pk=None):
+        """
+        Nests the quote for the factory using offcuts in stock, then
+        consumes the offcuts it cut and stocks the usable new ones.
+        """
+        quote = self.get_object()
+        try:
+            report = self._nest(quote, request.data, use_remnants=True)
+            report["inventory"] = RemnantInventoryService.record_cut_job(
+                quote.tenant, report["cutlist"], source=quote.quote_number,
+            )
+        except (ValidationError, ValueError) as e:
+            return Response({"detail": str(e)}, status=422)
+        return Response(report)
+
+    @action(detail=True, methods=['get'], url_path='cutlist-export')
+    def cutlist_export(self, request, pk=None):
+        """
+        Streams the order cutlist for the factory: ?kind=cutting_list (CSV,
+        the default), labels (CSV, one per piece), optimizer (interchange
+        text), svg with &sheet=N, or zip with all of them and every sheet.
+        Nesting params are as for `nesting`.
+        """
+        quote = self.get_object()
+        params = request.query_params
+        kind = params.get("kind", KIND_CUTTING_LIST)
+        try:
+            report = self._nest(quote, params, use_remnants=params.get("remnants") == "1")
+            exporter = CutlistExporter(
+                report["cutlist"], {row["material_id"]: row["material_name"] for row in report["materials"]},
+                reference=quote.quote_number,
+            )
+            chunks = exporter.export(kind, sheet_index=int(params.get("sheet", 1)) - 1)
+        except (ValidationError, ValueError) as e:
+            return Response({"detail": str(e)}, status=422)
+
+        extension = {KIND_SVG: "svg", KIND_ZIP: "zip"}.get(kind, "csv" if CONTENT_TYPES[kind] == "text/csv" else "txt")
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[kind])
+        response["Content-Disposition"] = f'attachment; filename="Cutlist-{quote.quote_number}-{kind}.{extension}"'
+        return response
+
+    @staticmethod
+    def _nest(quote, params, use_remnants=False):
+        kerf = float(params.get("kerf", 3.0))
+        budget = params.get("budget_ms")
+        budget = min(float(budget), RELEASE_BUDGET_MS) if budget else None
+        return nest_quote(
+            quote, kerf_mm=kerf, time_budget_ms=budget, use_remnants=use_remnants,
+            mode=params.get("mode", MODE_GUILLOTINE), stages=int(params.get("stages", 3)),
+        )
+
+    @action(detail=True, methods=['post'], url_path='reconcile-totals')
+    @transaction.atomic
+    def reconcile_totals(self, request, pk=None):
+        """
+        Recounts the quote's totals from its parts, products, solutions and
+        line items and reports any that drifted from the incrementally kept
+        ones; ?fix=1 writes the recount back.
+        """
+        quote = self.get_object()
+        fix = str(request.query_params.get("fix", "")).lower() in ("1", "true", "yes")
+        drift = reconcile_quote(quote, fix=fix)
+        return Response({"drift": drift, "fixed": fix and bool(drift)})
+
     @action(detail=True, methods=["post"])
     @transaction.atomic
     def approve(self, request, pk=None):
@@ -165,7 +289,14 @@ class QuoteRequestViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
         quote.locked_by = request.user
         quote.save(update_fields=["status", "locked_at", "locked_by"])
 
-        snapshot = build_quote_snapshot(quote)
+        # The revision must carry the true totals, whatever drift crept in
+        drift = reconcile_quote(quote, fix=True)
+        if drift:
+            logger.warning("Quote %s totals drifted before locking: %s", quote.pk, drift)
+
+        # Whole tree in a fixed number of queries; unchanged products reuse their stored nodes
+        prefetch_related_objects([quote], workspace_prefetches())
+        snapshot = store_snapshot(build_quote_snapshot(quote), quote.tenant_id)
         last_rev = (
             quote.revisions
             .select_for_update()
@@ -197,7 +328,7 @@ class QuoteRequestViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
                 quote=quote,
                 revision_no=revision_no,
             )
-            data = revision.snapshot
+            data = revision.materialize()
             filename = f"Quote-{quote.quote_number}-R{revision_no}.pdf"
         else:
             if quote.status != "locked":
@@ -236,8 +367,8 @@ class QuoteRequestViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
             return Response({"detail": "No previous revision"})
 
         diff = diff_revisions(
-            prev.snapshot,
-            revision.snapshot
+            prev.materialize(),
+            revision.materialize()
         )
 
         return Response({
@@ -521,13 +652,16 @@ class QuoteProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
                 source_type="template"
             )
         
-        recalc_quote_product(instance) 
+        # A new product counts towards its solution and quote from the start
+        propagate_totals(instance, instance.total_cp, instance.total_sp, include_product=False)
+        record_product_changes([instance])
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     @action(detail=True, methods=["post"])
     @transaction.atomic
     def evaluate(self, request, pk=None):
         qp = self.get_object()
-        return Response(QuoteProductService.evaluate(qp))
+        result, cache_hit = QuoteProductService.evaluate(qp)
+        return Response({**result, "cache_hit": cache_hit})
 
     @action(detail=True, methods=["post"])
     @transaction.atomic
@@ -539,11 +673,8 @@ class QuoteProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
     @transaction.atomic
     def freeze(self, request, pk=None):
         qp = QuoteProductService.freeze(self.get_object())
-
         recalc_quote_product(qp)
-        recalc_quote_solution(qp.solution)
-        recalc_quote(qp.solution.quote)
-
+        record_product_changes([qp])
         return Response(self.get_serializer(qp).data)
     @action(detail=False, methods=["post"])
     @transaction.atomic
@@ -551,7 +682,7 @@ class QuoteProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
         ids = request.data.get("product_ids", [])
 
         qs = self.get_queryset().filter(id__in=ids)
-        expanded = bulk_expand_products(list(qs))
+        expanded = bulk_expand_products(qs)
 
         serializer = QuoteProductSerializer(expanded, many=True)
         return Response(serializer.data)
@@ -563,6 +694,7 @@ class QuoteProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
 
         frozen = []
         skipped = []
+        changed = []
 
         for qp in products.select_for_update():
             if qp.is_frozen:
@@ -571,6 +703,9 @@ class QuoteProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
 
             QuoteProductService.freeze(qp)
             frozen.append(qp.id)
+            changed.append(qp)
+
+        record_product_changes(changed)
 
         return Response({
             "frozen": frozen,
@@ -582,17 +717,26 @@ class QuoteProductViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
         ids = request.data.get("product_ids", [])
         products = self.get_queryset().filter(id__in=ids)
 
-        affected_quotes = set()
-
+        products = list(products.select_related("solution__quote"))
         for qp in products:
             recalc_quote_product(qp)
-            affected_quotes.add(qp.solution.quote_id)
-
-        for qid in affected_quotes:
-            recalc_quote(qid)
+        record_product_changes(products)
 
         return Response({"status": "recalculated"})
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old = QuoteProduct.objects.select_for_update().select_related("solution").get(pk=serializer.instance.pk)
+        qp = serializer.save()
+        propagate_product_update(old, qp)
+        record_product_changes([qp])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        propagate_totals(instance, -instance.total_cp, -instance.total_sp, include_product=False)
+        record_product_changes([instance], removed=True)
+        instance.delete()
+
 
 class QuotePartViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -612,6 +756,38 @@ class QuotePartViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
             .prefetch_related("hardware__hardware")
         )
 
+    # Part edits move the product, solution and quote by the part's change
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        part = serializer.instance
+        propagate_part_totals(part, part.total_part_cp, part.total_part_sp)
+        record_product_changes([part.quote_product])
+
+    @staticmethod
+    def _stored_totals(part):
+        """The part's totals as the row holds them, locked until the edit commits."""
+        return (
+            QuotePart.objects.select_for_update()
+            .filter(pk=part.pk)
+            .values_list("total_part_cp", "total_part_sp")
+            .get()
+        )
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_cp, old_sp = self._stored_totals(serializer.instance)
+        part = serializer.save()
+        propagate_part_totals(part, part.total_part_cp - old_cp, part.total_part_sp - old_sp)
+        record_product_changes([part.quote_product])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        old_cp, old_sp = self._stored_totals(instance)
+        propagate_part_totals(instance, -old_cp, -old_sp)
+        record_product_changes([instance.quote_product])
+        instance.delete()
+
 class OverrideLogViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
     """
     Audit Trail ViewSet. 
@@ -734,4 +910,13 @@ class QuoteSolutionViewSet(TenantSafeViewSetMixin, viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Explicit tenant isolation via the mixin or manual filter
-        return QuoteSolution.objects.filter(tenant=self.request.user.tenant)
\ No newline at end of file
+        return QuoteSolution.objects.filter(tenant=self.request.user.tenant)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # The quote loses the room's products with it
+        bump_quote(instance.quote_id, -instance.total_cp, -instance.total_sp)
+        removed = list(instance.products.values_list("id", flat=True))
+        if removed:
+            record_changes(instance.quote, removed=removed)
+        instance.delete()